@@ -16,6 +16,7 @@ from fastapi import FastAPI, HTTPException, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
+import asyncio
 import os
 import tempfile
 from pathlib import Path
@@ -25,10 +26,13 @@ from dotenv import load_dotenv
 # Charger les variables d'environnement
 load_dotenv()
 
-from src.semantic_search import SemanticSearchEngine
-from src.embeddings import EmbeddingGenerator
-from src.supabase_client_v2 import SupabaseUploaderV2
-from src.azure_ocr import AzureOCRProcessor
+from src.clients import (
+    get_embedding_generator,
+    get_ocr_processor,
+    get_search_engine,
+    get_supabase_uploader_v2,
+)
+from src.file_processor import list_directory, read_text_prefix
 
 # Configuration du logging
 logging.basicConfig(
@@ -55,9 +59,10 @@ app.add_middleware(
 
 # Initialiser les composants
 try:
-    search_engine = SemanticSearchEngine()
-    embedding_gen = EmbeddingGenerator()
-    uploader_v2 = SupabaseUploaderV2()
+    # Clients partagés (src.clients): connexions OpenAI/Supabase réutilisées
+    search_engine = get_search_engine()
+    embedding_gen = get_embedding_generator()
+    uploader_v2 = get_supabase_uploader_v2()
     logger.info("✅ Composants de recherche et upload initialisés")
 except Exception as e:
     logger.error(f"❌ Erreur initialisation: {e}")
@@ -67,7 +72,7 @@ except Exception as e:
 
 # Azure OCR (optionnel)
 try:
-    ocr_processor = AzureOCRProcessor()
+    ocr_processor = get_ocr_processor()
     logger.info("✅ Azure OCR initialisé")
 except Exception as e:
     logger.warning(f"⚠️ Azure OCR non disponible: {e}")
@@ -206,6 +211,8 @@ async def upload_document(request: UploadDocumentRequest):
         )
 
         if result["status"] == "success":
+            # Nouveau contenu: recherches en cache périmées
+            search_engine.cache.clear()
             return {
                 "success": True,
                 "file_name": result["file_name"],
@@ -238,19 +245,14 @@ async def read_file(request: ReadFileRequest):
     ```
     """
     try:
-        if not os.path.exists(request.file_path):
+        # Lecture bornée (max_chars), hors de la boucle asyncio
+        try:
+            content, truncated, file_size = await asyncio.to_thread(
+                read_text_prefix, request.file_path, request.max_chars
+            )
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail=f"Fichier non trouvé: {request.file_path}")
 
-        with open(request.file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-
-        truncated = False
-        if len(content) > request.max_chars:
-            content = content[:request.max_chars]
-            truncated = True
-
-        file_size = os.path.getsize(request.file_path)
-
         return {
             "success": True,
             "file_name": Path(request.file_path).name,
@@ -322,46 +324,26 @@ async def list_files(request: ListFilesRequest):
     ```
     """
     try:
-        if not os.path.exists(request.directory):
+        # Parcours os.scandir (un stat par fichier), hors de la boucle asyncio
+        try:
+            entries = await asyncio.to_thread(
+                list_directory, request.directory, request.pattern, request.recursive
+            )
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail=f"Dossier non trouvé: {request.directory}")
-
-        if not os.path.isdir(request.directory):
+        except NotADirectoryError:
             raise HTTPException(status_code=400, detail=f"Le chemin n'est pas un dossier: {request.directory}")
 
-        import fnmatch
-        files = []
-        dir_path = Path(request.directory)
-
-        if request.recursive:
-            for root, dirs, filenames in os.walk(request.directory):
-                for filename in filenames:
-                    if fnmatch.fnmatch(filename, request.pattern):
-                        full_path = os.path.join(root, filename)
-                        rel_path = os.path.relpath(full_path, request.directory)
-                        try:
-                            size = os.path.getsize(full_path)
-                            files.append({
-                                "name": filename,
-                                "relative_path": rel_path,
-                                "full_path": full_path,
-                                "size_bytes": size
-                            })
-                        except:
-                            pass
-        else:
-            for item in dir_path.iterdir():
-                if item.is_file() and fnmatch.fnmatch(item.name, request.pattern):
-                    try:
-                        size = os.path.getsize(str(item))
-                        files.append({
-                            "name": item.name,
-                            "relative_path": item.name,
-                            "full_path": str(item),
-                            "size_bytes": size
-                        })
-                    except:
-                        pass
-
+        files = [
+            {
+                "name": os.path.basename(rel_path),
+                "relative_path": rel_path,
+                "full_path": os.path.join(request.directory, rel_path),
+                "size_bytes": size
+            }
+            for rel_path, size in entries
+            if size is not None
+        ]
         files.sort(key=lambda x: x["name"])
 
         return {
@@ -20,7 +20,9 @@ import csv
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+import httpx
+import orjson
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -55,19 +57,106 @@ class SupabaseExporter:
             )
 
         self.client: Client = create_client(self.url, self.key)
+        # Client HTTP persistant (HTTP/2, keep-alive) pour les lectures en masse :
+        # évite la couche supabase-py sur les chemins chauds
+        self.http = httpx.Client(
+            base_url=f"{self.url.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": self.key,
+                "Authorization": f"Bearer {self.key}",
+                "Accept": "application/json",
+            },
+            http2=True,
+            timeout=30,
+        )
         self.output_dir = Path(output_dir)
+        self._chunk_fields_without_embedding: Optional[str] = None
 
         # Créer le dossier de sortie
         self.output_dir.mkdir(exist_ok=True)
         logger.info(f"✅ Client Supabase initialisé")
         logger.info(f"📁 Dossier d'export: {self.output_dir.absolute()}")
 
+    def _get_rows(
+        self,
+        table_name: str,
+        params: Dict[str, str],
+        offset: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Lit des lignes via PostgREST avec le client HTTP persistant.
+
+        Args:
+            table_name: Nom de la table
+            params: Paramètres PostgREST (select, filtres, order)
+            offset: Première ligne à lire (pagination via l'en-tête Range)
+            limit: Nombre de lignes à lire
+
+        Returns:
+            Liste des lignes décodées
+        """
+        headers = {}
+        if offset is not None and limit is not None:
+            headers["Range-Unit"] = "items"
+            headers["Range"] = f"{offset}-{offset + limit - 1}"
+        response = self.http.get(f"/{table_name}", params=params, headers=headers)
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+    def _chunk_fields(self, include_embeddings: bool) -> str:
+        """
+        Colonnes de document_chunks à exporter.
+
+        Sans embeddings: toutes les colonnes de la table sauf `embedding` (la
+        plus lourde), lues sur une ligne de la table car le schéma varie selon
+        les migrations appliquées (context_before, section_title, page_number,
+        importance_score...).
+
+        Args:
+            include_embeddings: Inclure la colonne embedding
+
+        Returns:
+            Valeur du paramètre PostgREST `select`
+        """
+        if include_embeddings:
+            return "*"
+        if self._chunk_fields_without_embedding is None:
+            sample = self._get_rows('document_chunks', {"select": "*", "limit": "1"})
+            # Table vide: rien de lourd à exporter, "*" suffit
+            self._chunk_fields_without_embedding = (
+                ",".join(column for column in sample[0] if column != "embedding")
+                if sample else "*"
+            )
+        return self._chunk_fields_without_embedding
+
+    def _count_rows(self, table_name: str) -> Optional[int]:
+        """
+        Compte les lignes d'une table (requête HEAD avec count=exact).
+
+        Args:
+            table_name: Nom de la table
+
+        Returns:
+            Nombre de lignes, ou None si le serveur ne le fournit pas
+        """
+        response = self.http.head(
+            f"/{table_name}",
+            params={"select": "*"},
+            headers={"Prefer": "count=exact", "Range-Unit": "items", "Range": "0-0"}
+        )
+        response.raise_for_status()
+        # Content-Range: "0-0/1234" ou "*/0"
+        total = response.headers.get("content-range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+
     def export_table(
         self,
         table_name: str,
         batch_size: int = 1000,
         select_fields: str = "*",
-        format: str = "json"
+        format: str = "json",
+        now: Optional[datetime] = None
     ) -> Dict[str, Any]:
         """
         Exporte une table complète en JSON ou CSV.
@@ -77,29 +166,34 @@ class SupabaseExporter:
             batch_size: Taille des batches pour la pagination
             select_fields: Champs à sélectionner
             format: Format d'export ("json" ou "csv")
+            now: Horodatage de l'export (partagé par export_all)
 
         Returns:
             Dict avec les métadonnées de l'export
         """
         logger.info(f"📥 Début de l'export de la table '{table_name}'...")
 
-        all_data = []
+        # Compter une seule fois pour préallouer la liste de résultats
+        total_expected = self._count_rows(table_name) or 0
+        all_data: List[Any] = [None] * total_expected
         offset = 0
         total_fetched = 0
 
         while True:
             try:
                 # Récupérer un batch
-                response = self.client.table(table_name)\
-                    .select(select_fields)\
-                    .range(offset, offset + batch_size - 1)\
-                    .execute()
+                batch = self._get_rows(
+                    table_name,
+                    {"select": select_fields},
+                    offset=offset,
+                    limit=batch_size
+                )
 
-                if not response.data:
+                if not batch:
                     break
 
-                batch_count = len(response.data)
-                all_data.extend(response.data)
+                batch_count = len(batch)
+                all_data[offset:offset + batch_count] = batch
                 total_fetched += batch_count
 
                 logger.info(
@@ -117,8 +211,13 @@ class SupabaseExporter:
                 logger.error(f"❌ Erreur lors de l'export: {e}")
                 raise
 
+        # La table a pu rétrécir entre le comptage et la lecture
+        if total_fetched < len(all_data):
+            del all_data[total_fetched:]
+
         # Sauvegarder les données
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = now or datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
 
         if format.lower() == "csv":
             output_file = self.output_dir / f"{table_name}_{timestamp}.csv"
@@ -127,7 +226,7 @@ class SupabaseExporter:
             output_file = self.output_dir / f"{table_name}_{timestamp}.json"
             export_data = {
                 "table": table_name,
-                "export_date": datetime.now().isoformat(),
+                "export_date": now.isoformat(),
                 "total_records": len(all_data),
                 "data": all_data
             }
@@ -183,12 +282,17 @@ class SupabaseExporter:
 
                 writer.writerow(csv_row)
 
-    def export_all(self, format: str = "json") -> Dict[str, Any]:
+    def export_all(
+        self,
+        format: str = "json",
+        include_embeddings: bool = True
+    ) -> Dict[str, Any]:
         """
         Exporte toutes les tables.
 
         Args:
             format: Format d'export ("json" ou "csv")
+            include_embeddings: Inclure la colonne embedding des chunks
 
         Returns:
             Dict avec les statistiques d'export
@@ -196,12 +300,18 @@ class SupabaseExporter:
         logger.info(f"🚀 Début de l'export complet de Supabase (format: {format})...")
 
         results = {}
+        now = datetime.now()
 
         # Exporter documents_full
-        results['documents_full'] = self.export_table('documents_full', format=format)
+        results['documents_full'] = self.export_table(
+            'documents_full', format=format, now=now
+        )
 
         # Exporter document_chunks
-        results['document_chunks'] = self.export_table('document_chunks', format=format)
+        chunk_fields = self._chunk_fields(include_embeddings)
+        results['document_chunks'] = self.export_table(
+            'document_chunks', select_fields=chunk_fields, format=format, now=now
+        )
 
         # Récupérer les statistiques
         try:
@@ -213,11 +323,11 @@ class SupabaseExporter:
             results['stats'] = None
 
         # Sauvegarder un résumé de l'export
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         summary_file = self.output_dir / f"export_summary_{timestamp}.json"
 
         summary = {
-            "export_date": datetime.now().isoformat(),
+            "export_date": now.isoformat(),
             "supabase_url": self.url,
             "tables": results,
             "total_files": len([k for k in results.keys() if k != 'stats'])
@@ -230,58 +340,66 @@ class SupabaseExporter:
 
         return results
 
-    def export_documents_with_chunks(self) -> Dict[str, Any]:
+    def export_documents_with_chunks(
+        self,
+        include_embeddings: bool = True
+    ) -> Dict[str, Any]:
         """
         Exporte les documents avec leurs chunks associés (structure hiérarchique).
 
+        Args:
+            include_embeddings: Inclure la colonne embedding des chunks
+
         Returns:
             Dict avec les métadonnées de l'export
         """
         logger.info("📥 Export des documents avec leurs chunks...")
 
         # Récupérer tous les documents
-        docs_response = self.client.table('documents_full')\
-            .select('*')\
-            .execute()
+        documents = self._get_rows('documents_full', {"select": "*"})
 
-        if not docs_response.data:
+        if not documents:
             logger.warning("⚠️  Aucun document trouvé")
             return {"documents": 0, "file": None}
 
-        documents = docs_response.data
         logger.info(f"  ↳ {len(documents)} documents récupérés")
 
         # Pour chaque document, récupérer ses chunks
         enriched_documents = []
+        chunk_fields = self._chunk_fields(include_embeddings)
 
         for doc in documents:
             doc_id = doc['id']
 
             # Récupérer les chunks du document
-            chunks_response = self.client.table('document_chunks')\
-                .select('*')\
-                .eq('document_id', doc_id)\
-                .order('chunk_index')\
-                .execute()
+            chunks = self._get_rows(
+                'document_chunks',
+                {
+                    "select": chunk_fields,
+                    "document_id": f"eq.{doc_id}",
+                    "order": "chunk_index"
+                }
+            )
 
             # Ajouter les chunks au document
             doc_with_chunks = doc.copy()
-            doc_with_chunks['chunks'] = chunks_response.data or []
-            doc_with_chunks['chunks_count'] = len(chunks_response.data or [])
+            doc_with_chunks['chunks'] = chunks or []
+            doc_with_chunks['chunks_count'] = len(chunks or [])
 
             enriched_documents.append(doc_with_chunks)
 
             logger.info(
                 f"  ↳ Document '{doc['file_name']}': "
-                f"{len(chunks_response.data or [])} chunks"
+                f"{len(chunks or [])} chunks"
             )
 
         # Sauvegarder
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         output_file = self.output_dir / f"documents_with_chunks_{timestamp}.json"
 
         export_data = {
-            "export_date": datetime.now().isoformat(),
+            "export_date": now.isoformat(),
             "total_documents": len(enriched_documents),
             "documents": enriched_documents
         }
@@ -328,6 +446,14 @@ def main():
         action='store_true',
         help='Export complet (tables séparées + hiérarchique)'
     )
+    parser.add_argument(
+        '--no-embeddings',
+        action='store_true',
+        help=(
+            'Exporter toutes les colonnes des chunks sauf embedding, liste lue '
+            'sur la table document_chunks (export beaucoup plus léger)'
+        )
+    )
 
     args = parser.parse_args()
 
@@ -337,8 +463,12 @@ def main():
         if args.all:
             # Export complet
             logger.info(f"📦 Mode: Export complet (format: {args.format})")
-            results = exporter.export_all(format=args.format)
-            hierarchical_result = exporter.export_documents_with_chunks()
+            results = exporter.export_all(
+                format=args.format, include_embeddings=not args.no_embeddings
+            )
+            hierarchical_result = exporter.export_documents_with_chunks(
+                include_embeddings=not args.no_embeddings
+            )
 
             logger.info("\n" + "="*60)
             logger.info(f"✅ EXPORT COMPLET TERMINÉ ({args.format.upper()})")
@@ -353,7 +483,9 @@ def main():
             if args.format == 'csv':
                 logger.warning("⚠️  Mode hiérarchique uniquement disponible en JSON")
             logger.info("📦 Mode: Export hiérarchique")
-            result = exporter.export_documents_with_chunks()
+            result = exporter.export_documents_with_chunks(
+                include_embeddings=not args.no_embeddings
+            )
 
             logger.info("\n" + "="*60)
             logger.info("✅ EXPORT HIÉRARCHIQUE TERMINÉ (JSON)")
@@ -365,7 +497,9 @@ def main():
         else:
             # Export par défaut (tables séparées)
             logger.info(f"📦 Mode: Export par tables (format: {args.format})")
-            results = exporter.export_all(format=args.format)
+            results = exporter.export_all(
+                format=args.format, include_embeddings=not args.no_embeddings
+            )
 
             logger.info("\n" + "="*60)
             logger.info(f"✅ EXPORT PAR TABLES TERMINÉ ({args.format.upper()})")
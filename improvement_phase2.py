@@ -18,6 +18,10 @@ This script leverages the cleaned entity layer (produced by
         property_insights_preview.json
         stakeholder_insights_preview.json
 
+Documents and their entity mentions are read pre-joined, page by page, from
+the ``build_phase2_feed()`` SQL function defined in
+supabase_migration_phase2_feed.sql (also printed by --print-sql).
+
 Usage:
     python improvement_phase2.py --upsert
 
@@ -31,29 +35,30 @@ Arguments:
 Environment variables:
     SUPABASE_URL
     SUPABASE_SERVICE_KEY (service role, required for upserts)
+    DATABASE_URL (optional; enables COPY-based bulk upserts over Postgres)
 """
 
 from __future__ import annotations
 
 import argparse
-import json
+import asyncio
 import logging
 import os
 import re
 import sys
 import unicodedata
 from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from functools import lru_cache
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
-SUPABASE_DEFAULT_URL = "https://ugbfpxjpgtbxvcmimsap.supabase.co"
-SUPABASE_DEFAULT_SERVICE_KEY = (
-    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9."
-    "eyJpc3MiOiJzdXBhYmFzZSIsInJlZiI6InVnYmZweGpwZ3RieHZjbWltc2FwIiwicm9sZSI6InNlcnZpY2Vfcm9sZSIsImlhdCI6MTc2MjkyMjAzOCwiZXhwIjoyMDc4NDk4MDM4fQ."
-    "aTAMaBHhOqSb8mQsAOEeT7d4k21kmlLliM7moUNAkLY"
-)
+import httpx
+import numpy as np
+import orjson
+import pandas as pd
 
 try:
     from supabase import Client, create_client
@@ -63,12 +68,25 @@ except ImportError as exc:  # pragma: no cover
         "[ERROR] Python package 'supabase' is required. Install with 'pip install supabase'"
     ) from exc
 
+try:  # Optional dependency for the stop-marker scan (regex fallback below)
+    import ahocorasick
+except ImportError:  # pragma: no cover - falls back to a compiled alternation
+    ahocorasick = None
+
+try:  # Optional dependency for direct Postgres bulk loads
+    import psycopg
+    from psycopg import sql
+except ImportError:  # pragma: no cover - falls back to PostgREST upserts
+    psycopg = None
+    sql = None
+
 
 # --------------------------------------------------------------------------- #
 # Logging & helpers
 # --------------------------------------------------------------------------- #
 
 LOG_PATH = Path("improvement_phase2.log")
+JSON_DUMP_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
 
 
 def setup_logging() -> None:
@@ -83,23 +101,51 @@ def setup_logging() -> None:
     )
 
 
+def write_json(path: Path, payload: Any) -> None:
+    # orjson returns UTF-8 bytes directly: no intermediate str, no re-encode.
+    path.write_bytes(orjson.dumps(payload, option=JSON_DUMP_OPTIONS))
+
+
 def iso_now() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
+_RE_CONTROL_WS = re.compile(r"[\r\n\t]+")
+_RE_MULTI_SPACE = re.compile(r"\s{2,}")
+_RE_NUMERO = re.compile(r"\b(?:n°|no|numero|numéro)\b.*", re.IGNORECASE)
+_RE_PUNCT_TAIL = re.compile(r"[,:;].*$")
+_RE_CANTON_DE = re.compile(r"\bcanton\s+de\s+", re.IGNORECASE)
+_RE_DIGITS = re.compile(r"[0-9]")
+_RE_COMMUNE_SEPARATORS = re.compile(r"[0-9\-_/]")
+_RE_NONALNUM = re.compile(r"[^a-z0-9]+")
+_RE_CHF = re.compile(r"CHF", re.IGNORECASE)
+
+
+# The cleaners below are pure on their string input and the same addresses and
+# names recur across many documents, so their results are memoised.
+@lru_cache(maxsize=131072)
 def normalise_text(value: Optional[str]) -> str:
     if value is None:
         return ""
     value = unicodedata.normalize("NFKC", value)
     value = value.replace("\u00a0", " ")
-    value = re.sub(r"[\r\n\t]+", " ", value)
-    value = re.sub(r"\s{2,}", " ", value)
+    value = _RE_CONTROL_WS.sub(" ", value)
+    value = _RE_MULTI_SPACE.sub(" ", value)
     return value.strip()
 
 
+@lru_cache(maxsize=1)
+def _combining_table() -> Dict[int, None]:
+    # Built on first use (~0.1s) rather than at import.
+    return {cp: None for cp in range(sys.maxunicode + 1) if unicodedata.combining(chr(cp))}
+
+
+@lru_cache(maxsize=65536)
 def strip_accents(value: str) -> str:
-    normalized = unicodedata.normalize("NFD", value)
-    return "".join(c for c in normalized if not unicodedata.combining(c))
+    if value.isascii():
+        return value
+    # NFKD also folds compatibility forms (ligatures, full-width letters).
+    return unicodedata.normalize("NFKD", value).translate(_combining_table())
 
 
 ADDRESS_STOP_MARKERS = [
@@ -209,94 +255,145 @@ COMMUNE_NOISE_TOKENS = {
 
 POSTAL_REGEX = re.compile(r"\b(\d{4})\b")
 
+_COMMUNE_REJECT = frozenset(COMMUNE_STOPWORDS | ADDRESS_PREFIXES | COMMUNE_NOISE_TOKENS)
+
+# One leftmost scan for every stop marker instead of one find() per marker.
+_RE_STOP = re.compile("|".join(map(re.escape, ADDRESS_STOP_MARKERS)))
+_STOP_MAX_LEN = max(len(marker) for marker in ADDRESS_STOP_MARKERS)
+
+if ahocorasick is not None:
+    _STOP_AC = ahocorasick.Automaton()
+    for _marker in ADDRESS_STOP_MARKERS:
+        _STOP_AC.add_word(_marker, _marker)
+    _STOP_AC.make_automaton()
+else:
+    _STOP_AC = None
+
+
+def _stop_marker_index(lowered: str) -> int:
+    """Start index of the leftmost stop marker in ``lowered``, or -1."""
+    if _STOP_AC is None:
+        match = _RE_STOP.search(lowered)
+        return match.start() if match else -1
+    best = -1
+    # Hits arrive ordered by end position; stop once no later hit can start earlier.
+    for end, marker in _STOP_AC.iter(lowered):
+        if best != -1 and end - _STOP_MAX_LEN + 1 > best:
+            break
+        start = end - len(marker) + 1
+        if best == -1 or start < best:
+            best = start
+    return best
 
-def clean_address_fragment(value: Optional[str]) -> str:
-    if not value:
-        return ""
-    text = normalise_text(value)
+
+# The ``_from_normalised`` helpers expect text already passed through
+# ``normalise_text`` so ``normalise_address`` only normalises each part once.
+
+
+def _address_from_normalised(text: str) -> str:
     match = ADDRESS_REGEX.search(text)
     if match:
         text = match.group(0)
-    lowered = text.lower()
-    for marker in ADDRESS_STOP_MARKERS:
-        idx = lowered.find(marker)
-        if idx != -1:
-            text = text[:idx]
-            lowered = text.lower()
-    text = re.sub(r"\b(n°|no|numero|numéro)\b.*", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"[,:;].*$", "", text)
+    stop = _stop_marker_index(text.lower())
+    if stop != -1:
+        text = text[:stop]
+    text = _RE_NUMERO.sub("", text)
+    text = _RE_PUNCT_TAIL.sub("", text)
     text = text.strip(" -_,")
     return text
 
 
-def clean_commune_name(value: Optional[str]) -> Optional[str]:
-    if not value:
-        return None
-    text = normalise_text(value)
-    if not text:
-        return None
+def _commune_from_normalised(text: str) -> Optional[str]:
     matches = COMMUNE_REGEX.findall(text)
     for match in reversed(matches):
         lower = match.lower()
-        if lower in COMMUNE_STOPWORDS:
-            continue
-        if lower in ADDRESS_PREFIXES or lower in COMMUNE_NOISE_TOKENS:
+        if lower in _COMMUNE_REJECT:
             continue
         if len(lower) <= 1:
             continue
         return match
-    text = re.sub(r"[0-9\-_/]", " ", text)
+    text = _RE_COMMUNE_SEPARATORS.sub(" ", text)
     tokens = [tok for tok in text.split() if tok.isalpha()]
     for tok in tokens:
         lowered = tok.lower()
-        if lowered in COMMUNE_STOPWORDS or lowered in ADDRESS_PREFIXES or lowered in COMMUNE_NOISE_TOKENS:
+        if lowered in _COMMUNE_REJECT:
             continue
         if len(tok) > 1:
             return tok.title()
     return None
 
 
-def clean_canton_name(value: Optional[str]) -> Optional[str]:
+def _canton_from_normalised(text: str) -> Optional[str]:
+    text = _RE_CANTON_DE.sub("", text)
+    text = _RE_DIGITS.sub("", text).strip(" -_,")
+    if not text:
+        return None
+    if len(text) > 20:
+        text = text[:20]
+    return text.title()
+
+
+def _postal_from_normalised(text: str) -> Optional[str]:
+    match = POSTAL_REGEX.search(text)
+    return match.group(1) if match else None
+
+
+@lru_cache(maxsize=65536)
+def clean_address_fragment(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    return _address_from_normalised(normalise_text(value))
+
+
+@lru_cache(maxsize=65536)
+def clean_commune_name(value: Optional[str]) -> Optional[str]:
     if not value:
         return None
     text = normalise_text(value)
     if not text:
         return None
-    text = re.sub(r"(?i)\bcanton\s+de\s+", "", text)
-    text = re.sub(r"[0-9]", "", text).strip(" -_,")
+    return _commune_from_normalised(text)
+
+
+@lru_cache(maxsize=65536)
+def clean_canton_name(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    text = normalise_text(value)
     if not text:
         return None
-    if len(text) > 20:
-        text = text[:20]
-    return text.title()
+    return _canton_from_normalised(text)
+
+
+@lru_cache(maxsize=65536)
+def _postal_code_of(text: str) -> Optional[str]:
+    return _postal_from_normalised(normalise_text(text))
 
 
 def extract_postal_code(*values: Optional[Any]) -> Optional[str]:
     for value in values:
         if value is None:
             continue
-        text = normalise_text(str(value))
-        match = POSTAL_REGEX.search(text)
-        if match:
-            return match.group(1)
+        postal = _postal_code_of(str(value))
+        if postal:
+            return postal
     return None
 
 
 def _slugify_parts(parts: List[Optional[str]]) -> str:
+    # One accent strip and one regex split over all parts; "|" never survives
+    # the split, so part boundaries tokenise exactly as before.
+    joined = strip_accents("|".join(part for part in parts if part).lower())
     tokens: List[str] = []
-    for part in parts:
-        if not part:
-            continue
-        normalized = strip_accents(part.lower())
-        normalized = re.sub(r"[^a-z0-9]+", "-", normalized)
-        for tok in normalized.split("-"):
-            if tok and (not tokens or tok != tokens[-1]):
-                tokens.append(tok)
-    if len(tokens) > 8:
-        tokens = tokens[:8]
+    for tok in _RE_NONALNUM.split(joined):
+        if tok and (not tokens or tok != tokens[-1]):
+            tokens.append(tok)
+            if len(tokens) == 8:
+                break
     return "-".join(tokens)
 
 
+@lru_cache(maxsize=65536)
 def normalise_address(*parts: Optional[str]) -> str:
     address_candidate: Optional[str] = None
     commune_candidate: Optional[str] = None
@@ -310,28 +407,28 @@ def normalise_address(*parts: Optional[str]) -> str:
         text = normalise_text(str(raw))
         if not text:
             continue
+        postal = _postal_from_normalised(text)
 
         if not address_candidate:
-            candidate = clean_address_fragment(text)
+            candidate = _address_from_normalised(text)
             if candidate:
                 address_candidate = candidate
-                postal_candidate = postal_candidate or extract_postal_code(text)
+                postal_candidate = postal_candidate or postal
                 continue
 
         if not commune_candidate:
-            commune = clean_commune_name(text)
+            commune = _commune_from_normalised(text)
             if commune:
                 commune_candidate = commune
                 continue
 
         if not postal_candidate:
-            postal = extract_postal_code(text)
             if postal:
                 postal_candidate = postal
                 continue
 
         if not canton_candidate:
-            canton = clean_canton_name(text)
+            canton = _canton_from_normalised(text)
             if canton:
                 canton_candidate = canton
                 continue
@@ -344,23 +441,29 @@ def normalise_address(*parts: Optional[str]) -> str:
     return _slugify_parts(fallback_parts)
 
 
+# Drops thousands separators and maps the decimal comma in a single pass.
+_MONEY_TABLE = str.maketrans({"'": None, " ": None, "\u00a0": None, ",": "."})
+
+
 def safe_float(value: Any) -> Optional[float]:
     if value is None:
         return None
     if isinstance(value, (int, float)):
         return float(value)
-    cleaned = str(value)
-    cleaned = cleaned.replace("'", "").replace(" ", "").replace("\u00a0", "")
-    cleaned = cleaned.replace("CHF", "").replace("chf", "")
-    cleaned = cleaned.replace(",", ".")
+    cleaned = str(value).translate(_MONEY_TABLE)
+    cleaned = _RE_CHF.sub("", cleaned)
     try:
         return float(cleaned)
     except ValueError:
         return None
 
 
+TENANT_ENTITY_TYPES = frozenset({"tenant", "locataire"})
+LANDLORD_ENTITY_TYPES = frozenset({"landlord", "owner", "bailleur"})
 INVALID_NAME_TOKENS = {"vacant", "résilié", "resilie", "inconnu", "resilié"}
 DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}(?: 00:00:00)?$")
+_RE_DIGITS_PUNCT_ONLY = re.compile(r"[\d .:/\-]+")
+_RE_TWO_LETTERS = re.compile(r"[^\W\d_].*[^\W\d_]", re.DOTALL)
 
 
 def is_valid_stakeholder_name(name: str) -> bool:
@@ -374,9 +477,9 @@ def is_valid_stakeholder_name(name: str) -> bool:
         return False
     if DATE_PATTERN.fullmatch(name):
         return False
-    if all(ch.isdigit() or ch in " .:/-" for ch in name):
+    if _RE_DIGITS_PUNCT_ONLY.fullmatch(name):
         return False
-    if len([ch for ch in name if ch.isalpha()]) < 2:
+    if not _RE_TWO_LETTERS.search(name):
         return False
     return True
 
@@ -386,6 +489,10 @@ def chunked(iterable: List[Any], size: int) -> Iterable[List[Any]]:
         yield iterable[idx : idx + size]
 
 
+def _sorted_values(values: Set[Any]) -> List[Any]:
+    return list(values) if len(values) < 2 else sorted(values)
+
+
 # --------------------------------------------------------------------------- #
 # Data classes
 # --------------------------------------------------------------------------- #
@@ -423,8 +530,10 @@ class PropertyAggregate:
     rent_total: float = 0.0
     rent_principal: float = 0.0
     document_dates: List[str] = field(default_factory=list)
+    _record: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
 
     def register_document(self, doc: DocumentSnapshot) -> None:
+        self._record = None
         self.document_ids.add(doc.document_id)
         if doc.document_type:
             self.document_types[doc.document_type] += 1
@@ -439,12 +548,11 @@ class PropertyAggregate:
         if doc.when:
             self.document_dates.append(doc.when)
 
-        for tenant in doc.tenants:
-            self.tenants[tenant] += 1
-        for landlord in doc.landlords:
-            self.landlords[landlord] += 1
-        for org in doc.organisations:
-            self.organisations[org] += 1
+        # Snapshot sets are already deduplicated per document; Counter.update
+        # counts them in C rather than one Python-level += per name.
+        self.tenants.update(doc.tenants)
+        self.landlords.update(doc.landlords)
+        self.organisations.update(doc.organisations)
 
         if doc.montant_total:
             self.rent_total += doc.montant_total
@@ -452,15 +560,17 @@ class PropertyAggregate:
             self.rent_principal += doc.montant_principal
 
     def as_record(self) -> Dict[str, Any]:
-        dates_sorted = sorted(d for d in self.document_dates if d)
-        last_seen = dates_sorted[-1] if dates_sorted else None
-        return {
+        # Built once per aggregate; register_document invalidates it.
+        if self._record is not None:
+            return self._record
+        last_seen = max((d for d in self.document_dates if d), default=None)
+        self._record = {
             "property_key": self.property_key,
-            "addresses": sorted(self.addresses),
-            "cantons": sorted(self.cantons),
-            "communes": sorted(self.communes),
-            "postal_codes": sorted(self.postal_codes),
-            "document_ids": sorted(self.document_ids),
+            "addresses": _sorted_values(self.addresses),
+            "cantons": _sorted_values(self.cantons),
+            "communes": _sorted_values(self.communes),
+            "postal_codes": _sorted_values(self.postal_codes),
+            "document_ids": _sorted_values(self.document_ids),
             "document_types": dict(self.document_types),
             "tenants": self.tenants.most_common(20),
             "landlords": self.landlords.most_common(20),
@@ -471,6 +581,7 @@ class PropertyAggregate:
             "last_document_date": last_seen,
             "updated_at": iso_now(),
         }
+        return self._record
 
 
 @dataclass
@@ -506,115 +617,193 @@ class StakeholderAggregate:
 # --------------------------------------------------------------------------- #
 
 
-def get_supabase_client() -> Client:
-    url = os.getenv("SUPABASE_URL") or SUPABASE_DEFAULT_URL
-    key = (
-        os.getenv("SUPABASE_SERVICE_KEY")
-        or os.getenv("SUPABASE_KEY")
-        or SUPABASE_DEFAULT_SERVICE_KEY
-    )
+def get_supabase_credentials() -> Tuple[str, str]:
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_KEY")
     if not url or not key:
         raise SystemExit(
             "[ERROR] Missing SUPABASE_URL or SUPABASE_SERVICE_KEY environment variables."
         )
+    return url, key
+
+
+@lru_cache(maxsize=1)
+def get_supabase_client() -> Client:
+    url, key = get_supabase_credentials()
     return create_client(url, key)
 
 
-def fetch_documents(
-    client: Client, limit: Optional[int], batch_size: int
+FETCH_CONCURRENCY = 32
+POSTGREST_MAX_ROWS = 1000  # Supabase default for db-max-rows
+
+
+def get_rest_client(url: str, key: str) -> httpx.AsyncClient:
+    """Async PostgREST client used for the concurrent bulk reads."""
+    return httpx.AsyncClient(
+        base_url=f"{url.rstrip('/')}/rest/v1",
+        headers={"apikey": key, "Authorization": f"Bearer {key}"},
+        http2=True,
+        limits=httpx.Limits(max_connections=FETCH_CONCURRENCY),
+        timeout=60,
+    )
+
+
+async def _count_rows(http: httpx.AsyncClient, table: str) -> int:
+    resp = await http.head(
+        f"/{table}",
+        params={"select": "*"},
+        headers={"Prefer": "count=exact", "Range-Unit": "items", "Range": "0-0"},
+    )
+    resp.raise_for_status()
+    content_range = resp.headers.get("content-range", "")
+    total = content_range.rpartition("/")[2]
+    if not total.isdigit():
+        raise RuntimeError(f"No exact row count for {table} (Content-Range: {content_range!r})")
+    return int(total)
+
+
+async def _fetch_table(
+    http: httpx.AsyncClient,
+    table: str,
+    select: str,
+    order: str,
+    batch_size: int,
+    limit: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
+    """Fetch a whole table with every page requested concurrently."""
+    # PostgREST silently truncates larger pages to its max-rows setting
+    batch_size = max(1, min(batch_size, POSTGREST_MAX_ROWS))
+    total = await _count_rows(http, table)
+    if limit is not None:
+        total = min(total, limit)
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch_page(offset: int) -> List[Dict[str, Any]]:
+        size = min(batch_size, total - offset)
+        async with semaphore:
+            resp = await http.get(
+                f"/{table}",
+                params={"select": select, "order": order, "offset": offset, "limit": size},
+            )
+        resp.raise_for_status()
+        page = orjson.loads(resp.content)
+        if len(page) != size:
+            raise RuntimeError(
+                f"Short page from {table} at offset {offset}: {len(page)} rows, expected {size}"
+            )
+        return page
+
+    pages = await asyncio.gather(*(fetch_page(o) for o in range(0, total, batch_size)))
+    return [row for page in pages for row in page]
+
+
+async def fetch_documents(
+    http: httpx.AsyncClient, limit: Optional[int], batch_size: int
+) -> List[Dict[str, Any]]:
+    """
+    Documents with their resolved entity mentions, joined server-side.
+
+    Pages are read with keyset pagination (``id > last id``) so each call of
+    ``build_phase2_feed`` only joins the mentions of its own page.
+    """
+    page_size = max(1, min(batch_size, POSTGREST_MAX_ROWS))
     documents: List[Dict[str, Any]] = []
-    offset = 0
-    while True:
-        end = offset + batch_size - 1
-        resp = (
-            client.table("documents_full")
-            .select("id, file_name, metadata")
-            .range(offset, end)
-            .execute()
+    last_id = 0
+    while limit is None or len(documents) < limit:
+        size = page_size if limit is None else min(page_size, limit - len(documents))
+        resp = await http.get(
+            "/rpc/build_phase2_feed", params={"after_id": last_id, "page_size": size}
         )
-        batch = resp.data or []
-        documents.extend(batch)
-        if len(batch) < batch_size:
-            break
-        offset += batch_size
-        if limit is not None and len(documents) >= limit:
-            documents = documents[:limit]
+        resp.raise_for_status()
+        page = orjson.loads(resp.content)
+        documents.extend(page)
+        if len(page) < size:
             break
-    logging.info("Fetched %s documents", len(documents))
+        last_id = page[-1]["id"]
+
+    logging.info(
+        "Fetched %s documents with %s entity mentions",
+        len(documents),
+        sum(len(doc.get("mentions") or []) for doc in documents),
+    )
     return documents
 
 
-def fetch_entities(client: Client) -> Dict[int, Dict[str, Any]]:
-    entities: Dict[int, Dict[str, Any]] = {}
-    offset = 0
-    batch_size = 1000
-    while True:
-        resp = (
-            client.table("entities")
-            .select("id, entity_type, entity_value, entity_normalized")
-            .range(offset, offset + batch_size - 1)
-            .execute()
-        )
-        batch = resp.data or []
-        for row in batch:
-            entities[row["id"]] = row
-        if len(batch) < batch_size:
-            break
-        offset += batch_size
-    logging.info("Fetched %s entities", len(entities))
-    return entities
-
-
-def fetch_mentions(client: Client, batch_size: int = 2000) -> List[Dict[str, Any]]:
-    mentions: List[Dict[str, Any]] = []
-    offset = 0
-    while True:
-        resp = (
-            client.table("entity_mentions")
-            .select("entity_id, document_id, mention_text, created_at")
-            .range(offset, offset + batch_size - 1)
-            .execute()
-        )
-        batch = resp.data or []
-        mentions.extend(batch)
-        if len(batch) < batch_size:
-            break
-        offset += batch_size
-    logging.info("Fetched %s entity mentions", len(mentions))
-    return mentions
-
-
-def fetch_etats_locatifs(client: Client, batch_size: int = 500) -> List[Dict[str, Any]]:
-    etats: List[Dict[str, Any]] = []
-    offset = 0
-    while True:
-        resp = (
-            client.table("etats_locatifs")
-            .select(
-                "id, document_id, immeuble_ref, immeuble_nom, immeuble_adresse, immeuble_ville, immeuble_canton, proprietaire, unites_locatives, loyer_annuel_total"
-            )
-            .range(offset, offset + batch_size - 1)
-            .execute()
-        )
-        batch = resp.data or []
-        etats.extend(batch)
-        if len(batch) < batch_size:
-            break
-        offset += batch_size
+async def fetch_etats_locatifs(
+    http: httpx.AsyncClient, batch_size: int = 500
+) -> List[Dict[str, Any]]:
+    etats = await _fetch_table(
+        http,
+        "etats_locatifs",
+        "id,document_id,immeuble_ref,immeuble_nom,immeuble_adresse,immeuble_ville,"
+        "immeuble_canton,proprietaire,unites_locatives,loyer_annuel_total",
+        "id",
+        batch_size,
+    )
     logging.info("Fetched %s etats locatifs", len(etats))
     return etats
 
 
+async def fetch_all(
+    limit: Optional[int], batch_size: int
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Fetch the document feed and the etats locatifs in parallel."""
+    url, key = get_supabase_credentials()
+    async with get_rest_client(url, key) as http:
+        return await asyncio.gather(
+            fetch_documents(http, limit, batch_size),
+            fetch_etats_locatifs(http),
+        )
+
+
 # --------------------------------------------------------------------------- #
 # Core aggregation
 # --------------------------------------------------------------------------- #
 
 
+def normalise_series(series: pd.Series) -> pd.Series:
+    """Vectorised ``normalise_text`` over a Series of strings."""
+    return (
+        series.str.normalize("NFKC")
+        .str.replace("\u00a0", " ", regex=False)
+        .str.replace(_RE_CONTROL_WS, " ", regex=True)
+        .str.replace(_RE_MULTI_SPACE, " ", regex=True)
+        .str.strip()
+    )
+
+
+def _attach_mentions(
+    snap_map: Dict[int, DocumentSnapshot], documents: List[Dict[str, Any]]
+) -> None:
+    """Normalise and group the feed's mentions in one frame, then merge per document."""
+    rows = [
+        (doc["id"], mention.get("entity_type"), mention.get("value"))
+        for doc in documents
+        for mention in doc.get("mentions") or ()
+    ]
+    if not rows:
+        return
+    df = pd.DataFrame(rows, columns=["document_id", "entity_type", "value"])
+    df = df[df["value"].notna() & (df["value"] != "")]
+    if df.empty:
+        return
+
+    df = df.assign(cleaned=normalise_series(df["value"].astype(object)))
+    df = df[df["cleaned"].str.len() > 0]
+    df = df.assign(
+        role=np.where(
+            df["entity_type"].isin(TENANT_ENTITY_TYPES),
+            "tenants",
+            np.where(df["entity_type"].isin(LANDLORD_ENTITY_TYPES), "landlords", "organisations"),
+        )
+    )
+
+    for (doc_id, role), cleaned in df.groupby(["document_id", "role"], sort=False)["cleaned"]:
+        getattr(snap_map[doc_id], role).update(cleaned)
+
+
 def build_document_snapshots(
     documents: List[Dict[str, Any]],
-    entity_lookup: Dict[int, Dict[str, Any]],
-    mentions: List[Dict[str, Any]],
 ) -> Tuple[List[DocumentSnapshot], Dict[int, DocumentSnapshot]]:
     snap_map: Dict[int, DocumentSnapshot] = {}
 
@@ -654,31 +843,7 @@ def build_document_snapshots(
         )
         snap_map[doc_id] = snapshot
 
-    for mention in mentions:
-        doc_id = mention.get("document_id")
-        entity_id = mention.get("entity_id")
-        if doc_id is None or entity_id is None:
-            continue
-        snapshot = snap_map.get(doc_id)
-        if not snapshot:
-            continue
-        entity = entity_lookup.get(entity_id)
-        if not entity:
-            continue
-        value = entity.get("entity_value") or mention.get("mention_text")
-        if not value:
-            continue
-        cleaned = normalise_text(value)
-        if not cleaned:
-            continue
-
-        etype = entity.get("entity_type")
-        if etype in {"tenant", "locataire"}:
-            snapshot.tenants.add(cleaned)
-        elif etype in {"landlord", "owner", "bailleur"}:
-            snapshot.landlords.add(cleaned)
-        else:
-            snapshot.organisations.add(cleaned)
+    _attach_mentions(snap_map, documents)
 
     snapshots = list(snap_map.values())
     logging.info("Built %s document snapshots", len(snapshots))
@@ -691,13 +856,49 @@ def aggregate_properties(snapshots: List[DocumentSnapshot]) -> Dict[str, Propert
         key = normalise_address(snap.address, snap.commune, snap.canton, snap.postal_code)
         if not key:
             key = f"doc-{snap.document_id}"
-        if key not in properties:
-            properties[key] = PropertyAggregate(property_key=key)
-        properties[key].register_document(snap)
+        aggregate = properties.get(key)
+        if aggregate is None:
+            aggregate = properties[key] = PropertyAggregate(property_key=key)
+        aggregate.register_document(snap)
     logging.info("Aggregated %s property profiles", len(properties))
     return properties
 
 
+def _stakeholder(
+    stakeholders: Dict[Tuple[str, str], StakeholderAggregate], name: str, stakeholder_type: str
+) -> StakeholderAggregate:
+    key = (name, stakeholder_type)
+    aggregate = stakeholders.get(key)
+    if aggregate is None:
+        aggregate = stakeholders[key] = StakeholderAggregate(
+            name=name, stakeholder_type=stakeholder_type
+        )
+    return aggregate
+
+
+def parse_units(raw: Any) -> List[Any]:
+    """Decode ``unites_locatives``, which may be a list, JSON, or JSON-encoded JSON."""
+    if not raw:
+        return []
+    if isinstance(raw, list):
+        return raw
+    if not isinstance(raw, str):
+        return []
+    raw = raw.lstrip()
+    # Only arrays are useful; a leading quote marks the doubly-encoded case.
+    # Anything else is skipped without paying for a parse.
+    try:
+        if raw.startswith("["):
+            units = orjson.loads(raw)
+        elif raw.startswith('"'):
+            units = orjson.loads(orjson.loads(raw))
+        else:
+            return []
+    except (orjson.JSONDecodeError, TypeError):
+        return []
+    return units if isinstance(units, list) else []
+
+
 def aggregate_stakeholders(
     properties: Dict[str, PropertyAggregate],
     snapshot_map: Dict[int, DocumentSnapshot],
@@ -716,10 +917,7 @@ def aggregate_stakeholders(
             for tenant in snapshot.tenants:
                 if not is_valid_stakeholder_name(tenant):
                     continue
-                key = (tenant, "tenant")
-                if key not in stakeholders:
-                    stakeholders[key] = StakeholderAggregate(name=tenant, stakeholder_type="tenant")
-                stakeholders[key].register(prop_key, doc_id, rent)
+                _stakeholder(stakeholders, tenant, "tenant").register(prop_key, doc_id, rent)
 
     # Intégrer les informations issues des états locatifs
     for etat in etats_locatifs:
@@ -748,27 +946,14 @@ def aggregate_stakeholders(
             if not is_valid_stakeholder_name(owner_name):
                 owner_name = ""
         if owner_name:
-            key = (owner_name, "landlord")
-            if key not in stakeholders:
-                stakeholders[key] = StakeholderAggregate(
-                    name=owner_name, stakeholder_type="landlord"
-                )
-            stakeholders[key].register(
+            _stakeholder(stakeholders, owner_name, "landlord").register(
                 property_key,
                 doc_id,
                 safe_float(etat.get("loyer_annuel_total")),
             )
 
-        units = etat.get("unites_locatives") or []
-        if isinstance(units, str):
-            try:
-                units = json.loads(units)
-                if isinstance(units, str):
-                    units = json.loads(units)
-            except json.JSONDecodeError:
-                units = []
-
-        if not isinstance(units, list):
+        units = parse_units(etat.get("unites_locatives"))
+        if not units:
             continue
 
         for unit in units:
@@ -807,12 +992,9 @@ def aggregate_stakeholders(
                 if unit_rent and unit_rent < 500:
                     unit_rent *= 12
 
-            key = (tenant_name, "tenant")
-            if key not in stakeholders:
-                stakeholders[key] = StakeholderAggregate(
-                    name=tenant_name, stakeholder_type="tenant"
-                )
-            stakeholders[key].register(property_key, doc_id, unit_rent)
+            _stakeholder(stakeholders, tenant_name, "tenant").register(
+                property_key, doc_id, unit_rent
+            )
 
     logging.info("Aggregated %s stakeholder profiles", len(stakeholders))
     return stakeholders
@@ -843,6 +1025,9 @@ CREATE TABLE IF NOT EXISTS public.property_insights (
 );
 """
 
+# Read only by --print-sql, so importing the module does no file I/O
+FEED_SQL_PATH = Path(__file__).with_name("supabase_migration_phase2_feed.sql")
+
 STAKEHOLDER_SQL = """
 CREATE TABLE IF NOT EXISTS public.stakeholder_insights (
     stakeholder_name TEXT,
@@ -857,12 +1042,89 @@ CREATE TABLE IF NOT EXISTS public.stakeholder_insights (
 """
 
 
+PROPERTY_CONFLICT_KEYS = ("property_key",)
+STAKEHOLDER_CONFLICT_KEYS = ("stakeholder_name", "stakeholder_type")
+
+
+UPSERT_WORKERS = 4
+
+
 def upsert_records(
-    client: Client, table: str, records: List[Dict[str, Any]], batch_size: int = 500
+    client: Client, table: str, records: List[Dict[str, Any]], batch_size: int = 10_000
 ) -> None:
-    for batch in chunked(records, batch_size):
+    def send(batch: List[Dict[str, Any]]) -> None:
         client.table(table).upsert(batch).execute()
 
+    batches = list(chunked(records, batch_size))
+    if len(batches) <= 1:
+        for batch in batches:
+            send(batch)
+        return
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor:
+        # list() re-raises the first failed batch.
+        list(executor.map(send, batches))
+
+
+def get_database_url() -> Optional[str]:
+    return os.getenv("DATABASE_URL") or os.getenv("SUPABASE_DATABASE_URL")
+
+
+def _copy_value(value: Any) -> Any:
+    # JSONB columns are sent as pre-encoded text so COPY never re-encodes them.
+    if isinstance(value, (dict, list, tuple)):
+        return orjson.dumps(value).decode("utf-8")
+    return value
+
+
+def bulk_upsert_copy(
+    dsn: str,
+    table: str,
+    records: List[Dict[str, Any]],
+    conflict_keys: Sequence[str],
+) -> None:
+    """Upsert records with one COPY into a temp table and one INSERT … ON CONFLICT."""
+    if psycopg is None:
+        raise RuntimeError(
+            "psycopg is required for COPY upserts. Install with 'pip install psycopg[binary]'"
+        )
+    if not records:
+        return
+
+    columns = list(records[0].keys())
+    tmp_table = sql.Identifier(f"tmp_{table}")
+    target = sql.Identifier("public", table)
+    column_list = sql.SQL(", ").join(sql.Identifier(col) for col in columns)
+    updates = sql.SQL(", ").join(
+        sql.SQL("{col} = EXCLUDED.{col}").format(col=sql.Identifier(col))
+        for col in columns
+        if col not in conflict_keys
+    )
+
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                sql.SQL(
+                    "CREATE TEMP TABLE {tmp} (LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP"
+                ).format(tmp=tmp_table, target=target)
+            )
+            with cur.copy(
+                sql.SQL("COPY {tmp} ({cols}) FROM STDIN").format(tmp=tmp_table, cols=column_list)
+            ) as copy:
+                for record in records:
+                    copy.write_row([_copy_value(record.get(col)) for col in columns])
+            cur.execute(
+                sql.SQL(
+                    "INSERT INTO {target} ({cols}) SELECT {cols} FROM {tmp} "
+                    "ON CONFLICT ({keys}) DO UPDATE SET {updates}"
+                ).format(
+                    target=target,
+                    cols=column_list,
+                    tmp=tmp_table,
+                    keys=sql.SQL(", ").join(sql.Identifier(key) for key in conflict_keys),
+                    updates=updates,
+                )
+            )
+
 
 # --------------------------------------------------------------------------- #
 # CLI
@@ -884,40 +1146,45 @@ def main() -> None:
     setup_logging()
 
     if args.print_sql:
+        print(FEED_SQL_PATH.read_text(encoding="utf-8").strip())
+        print()
         print(PROPERTY_SQL.strip())
         print()
         print(STAKEHOLDER_SQL.strip())
         if not args.upsert and not args.dry_run:
             return
 
-    client = get_supabase_client()
-
     try:
-        documents = fetch_documents(client, args.limit, args.batch_size)
-        entities = fetch_entities(client)
-        mentions = fetch_mentions(client)
-        etats_locatifs = fetch_etats_locatifs(client)
+        documents, etats_locatifs = asyncio.run(fetch_all(args.limit, args.batch_size))
 
-        snapshots, snapshot_map = build_document_snapshots(documents, entities, mentions)
+        snapshots, snapshot_map = build_document_snapshots(documents)
         properties = aggregate_properties(snapshots)
         stakeholders = aggregate_stakeholders(properties, snapshot_map, etats_locatifs)
 
         property_records = [prop.as_record() for prop in properties.values()]
         stakeholder_records = [st.as_record() for st in stakeholders.values()]
 
-        Path("property_insights_preview.json").write_text(
-            json.dumps(property_records[:200], ensure_ascii=False, indent=2), encoding="utf-8"
-        )
-        Path("stakeholder_insights_preview.json").write_text(
-            json.dumps(stakeholder_records[:200], ensure_ascii=False, indent=2), encoding="utf-8"
-        )
+        write_json(Path("property_insights_preview.json"), property_records[:200])
+        write_json(Path("stakeholder_insights_preview.json"), stakeholder_records[:200])
         logging.info("Wrote JSON previews (first 200 records).")
 
         if not args.dry_run and args.upsert:
-            logging.info("Upserting %s property records …", len(property_records))
-            upsert_records(client, "property_insights", property_records)
-            logging.info("Upserting %s stakeholder records …", len(stakeholder_records))
-            upsert_records(client, "stakeholder_insights", stakeholder_records)
+            dsn = get_database_url()
+            if dsn and psycopg is not None:
+                logging.info("Bulk upserting %s property records (COPY) …", len(property_records))
+                bulk_upsert_copy(dsn, "property_insights", property_records, PROPERTY_CONFLICT_KEYS)
+                logging.info(
+                    "Bulk upserting %s stakeholder records (COPY) …", len(stakeholder_records)
+                )
+                bulk_upsert_copy(
+                    dsn, "stakeholder_insights", stakeholder_records, STAKEHOLDER_CONFLICT_KEYS
+                )
+            else:
+                logging.info("Upserting %s property records …", len(property_records))
+                client = get_supabase_client()
+                upsert_records(client, "property_insights", property_records)
+                logging.info("Upserting %s stakeholder records …", len(stakeholder_records))
+                upsert_records(client, "stakeholder_insights", stakeholder_records)
 
         summary = {
             "timestamp": iso_now(),
@@ -927,12 +1194,10 @@ def main() -> None:
             "dry_run": args.dry_run,
             "upserted": args.upsert and not args.dry_run,
         }
-        Path("improvement_phase2_summary.json").write_text(
-            json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
+        write_json(Path("improvement_phase2_summary.json"), summary)
         logging.info("Summary written to improvement_phase2_summary.json")
 
-    except PostgrestAPIError as exc:
+    except (PostgrestAPIError, httpx.HTTPError) as exc:
         logging.error("Supabase error: %s", exc)
         raise
 
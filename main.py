@@ -9,53 +9,98 @@ Ce script orchestre:
 """
 
 import os
+import sys
 import argparse
-import json
+import asyncio
+from dataclasses import dataclass
+from functools import cache
+import orjson
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 from tqdm import tqdm
 
 from src.logger import setup_logger
-from src.azure_ocr import AzureOCRProcessor
-from src.embeddings import EmbeddingGenerator
-from src.supabase_client import SupabaseUploader
-
-
-def load_config():
-    """Charge la configuration depuis le fichier .env"""
-    load_dotenv()
-
-    config = {
-        # Azure
-        "azure_endpoint": os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT"),
-        "azure_key": os.getenv("AZURE_FORM_RECOGNIZER_KEY"),
-
-        # OpenAI
-        "openai_key": os.getenv("OPENAI_API_KEY"),
-        "embedding_model": os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+from src.azure_ocr import AzureOCRProcessor, iter_supported
+from src.embeddings import EmbeddingGenerator, approx_tokens, save_embeddings
+from src.clients import get_ocr_processor, get_embedding_generator, get_supabase_uploader
+from src.supabase_client import EmbeddingUploadStream
+from src.pg_uploader import PGUploader, get_database_url, pg_upload_available
+
+
+# Pipeline: taille visée d'un lot d'embeddings et attente max avant de l'envoyer
+EMBED_BATCH_TOKENS = 200_000
+EMBED_IDLE_SECONDS = 0.1
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Configuration du traitement, lue une fois depuis le fichier .env"""
+
+    # Azure
+    azure_endpoint: Optional[str] = None
+    azure_key: Optional[str] = None
+
+    # OpenAI
+    openai_key: Optional[str] = None
+    embedding_model: str = "text-embedding-3-small"
+
+    # Supabase
+    supabase_url: Optional[str] = None
+    supabase_key: Optional[str] = None
+    database_url: Optional[str] = None
+    # "vector" (float32) ou "halfvec" (float16, voir supabase_migration_halfvec.sql)
+    vector_type: str = "vector"
+
+    # Configuration de traitement
+    batch_size: int = 100
+    chunk_size: int = 1000
+    max_workers: int = 4
+
+    @classmethod
+    @cache
+    def from_env(cls) -> "Config":
+        """Charge la configuration depuis le fichier .env (une seule fois)"""
+        load_dotenv()
+
+        return cls(
+            azure_endpoint=os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT"),
+            azure_key=os.getenv("AZURE_FORM_RECOGNIZER_KEY"),
+            openai_key=os.getenv("OPENAI_API_KEY"),
+            embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+            supabase_url=os.getenv("SUPABASE_URL"),
+            supabase_key=os.getenv("SUPABASE_KEY"),
+            database_url=get_database_url(),
+            vector_type=os.getenv("EMBEDDING_VECTOR_TYPE", "vector"),
+            batch_size=int(os.getenv("BATCH_SIZE", "100")),
+            chunk_size=int(os.getenv("CHUNK_SIZE", "1000")),
+            max_workers=int(os.getenv("MAX_WORKERS", "4"))
+        )
 
-        # Supabase
-        "supabase_url": os.getenv("SUPABASE_URL"),
-        "supabase_key": os.getenv("SUPABASE_KEY"),
 
-        # Configuration de traitement
-        "batch_size": int(os.getenv("BATCH_SIZE", "100")),
-        "chunk_size": int(os.getenv("CHUNK_SIZE", "1000")),
-        "max_workers": int(os.getenv("MAX_WORKERS", "4"))
-    }
+def create_uploader(config: Config, logger):
+    """
+    Crée l'uploader: connexion Postgres directe si DATABASE_URL est défini
+    (et psycopg installé), sinon le client REST Supabase.
+    """
+    if pg_upload_available(config.database_url):
+        logger.info("Upload direct via Postgres (psycopg)")
+        return PGUploader(database_url=config.database_url)
 
-    return config
+    return get_supabase_uploader(
+        url=config.supabase_url,
+        key=config.supabase_key
+    )
 
 
-def process_single_file(
+async def process_single_file_async(
     file_path: str,
     ocr_processor: AzureOCRProcessor,
     embedding_generator: EmbeddingGenerator,
     logger
 ) -> List[Dict[str, Any]]:
     """
-    Traite un fichier unique: OCR -> Embeddings.
+    Traite un fichier unique: OCR -> Embeddings (clients asynchrones).
 
     Args:
         file_path: Chemin du fichier
@@ -70,14 +115,18 @@ def process_single_file(
 
     # Étape 1: OCR
     try:
-        ocr_result = ocr_processor.process_file(file_path)
+        ocr_result = await ocr_processor.process_file_async(file_path)
     except Exception as e:
         logger.error(f"Erreur OCR pour {file_path}: {e}")
         return []
 
     # Étape 2: Embeddings
     try:
-        embeddings_data = embedding_generator.process_ocr_result(ocr_result)
+        chunks = embedding_generator.chunk_ocr_result(ocr_result)
+        if not chunks:
+            return []
+        embeddings = await embedding_generator.embed_texts_batch_async(chunks)
+        embeddings_data = embedding_generator.build_results(ocr_result, chunks, embeddings)
     except Exception as e:
         logger.error(f"Erreur embeddings pour {file_path}: {e}")
         return []
@@ -85,17 +134,125 @@ def process_single_file(
     return embeddings_data
 
 
+async def run_pipeline(
+    files: List[str],
+    ocr_processor: AzureOCRProcessor,
+    embedding_generator: EmbeddingGenerator,
+    concurrency: int,
+    on_document: Callable[[str, List[Dict[str, Any]]], None],
+    logger
+) -> None:
+    """
+    Pipeline OCR -> découpage -> embeddings en producteurs/consommateur.
+
+    `concurrency` tâches OCR alimentent une file; un consommateur regroupe les
+    documents prêts et les encode par lots (~200k tokens, ou dès que la file
+    reste vide 100 ms). Azure et OpenAI travaillent ainsi en même temps.
+
+    Args:
+        files: Fichiers à traiter
+        ocr_processor: Processeur OCR
+        embedding_generator: Générateur d'embeddings
+        concurrency: Nombre d'analyses Azure simultanées
+        on_document: Appelé avec (fichier, résultats) pour chaque document encodé
+        logger: Logger
+    """
+    file_q: asyncio.Queue = asyncio.Queue()
+    for file_path in files:
+        file_q.put_nowait(file_path)
+
+    # None signale la fin des producteurs
+    ocr_q: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)
+
+    progress = tqdm(
+        total=len(files),
+        desc="Traitement des fichiers",
+        # Pas de barre hors terminal (CI, sortie redirigée)
+        disable=not sys.stderr.isatty(),
+        mininterval=0.5
+    )
+
+    async with ocr_processor.async_client() as ocr_client, \
+            embedding_generator.async_client() as openai_client:
+
+        async def ocr_worker() -> None:
+            while not file_q.empty():
+                file_path = file_q.get_nowait()
+                try:
+                    ocr_result = await ocr_processor.process_file_async(file_path, ocr_client)
+                    chunks = embedding_generator.chunk_ocr_result(ocr_result)
+                    if chunks:
+                        await ocr_q.put((file_path, ocr_result, chunks))
+                except Exception as e:
+                    logger.error(f"Erreur OCR pour {file_path}: {e}")
+                progress.update(1)
+
+        async def embed(pending: List[Tuple[str, Dict[str, Any], List[str]]]) -> None:
+            # Pas de déduplication ici: embed_texts_batch_async (_plan_batches)
+            # n'encode déjà qu'une fois les chunks identiques du lot
+            texts = [chunk for _, _, chunks in pending for chunk in chunks]
+            vectors = await embedding_generator.embed_texts_batch_async(texts, client=openai_client)
+
+            offset = 0
+            for file_path, ocr_result, chunks in pending:
+                embeddings_data = embedding_generator.build_results(
+                    ocr_result, chunks, vectors[offset:offset + len(chunks)]
+                )
+                offset += len(chunks)
+                on_document(file_path, embeddings_data)
+
+        async def embed_batcher() -> None:
+            finished = False
+            while not finished:
+                item = await ocr_q.get()
+                if item is None:
+                    break
+
+                pending = [item]
+                tokens = sum(approx_tokens(chunk) for chunk in item[2])
+
+                # Compléter le lot tant que des documents arrivent
+                while tokens < EMBED_BATCH_TOKENS:
+                    if ocr_q.empty():
+                        await asyncio.sleep(EMBED_IDLE_SECONDS)
+                        if ocr_q.empty():
+                            break
+                    item = ocr_q.get_nowait()
+                    if item is None:
+                        finished = True
+                        break
+                    pending.append(item)
+                    tokens += sum(approx_tokens(chunk) for chunk in item[2])
+
+                await embed(pending)
+
+        async with asyncio.TaskGroup() as pipeline:
+            pipeline.create_task(embed_batcher())
+
+            async with asyncio.TaskGroup() as producers:
+                for _ in range(min(concurrency, len(files)) or 1):
+                    producers.create_task(ocr_worker())
+
+            await ocr_q.put(None)
+
+    progress.close()
+
+
 def process_directory(
     input_dir: str,
     output_dir: str,
     table_name: str,
     upload_to_supabase: bool,
-    config: Dict[str, Any],
-    logger
+    config: Config,
+    logger,
+    per_file_json: bool = False
 ):
     """
     Traite tous les fichiers d'un répertoire.
 
+    Les résultats sont écrits dans un seul fichier `embeddings.ndjson`
+    (un chunk par ligne) dans le répertoire de sortie.
+
     Args:
         input_dir: Répertoire d'entrée
         output_dir: Répertoire de sortie
@@ -103,81 +260,88 @@ def process_directory(
         upload_to_supabase: Si True, upload vers Supabase
         config: Configuration
         logger: Logger
+        per_file_json: Si True, écrit aussi `{nom}.meta.json` + `{nom}.vecs.npz` par fichier
     """
     # Initialiser les processeurs
     logger.info("Initialisation des processeurs...")
 
-    ocr_processor = AzureOCRProcessor(
-        endpoint=config["azure_endpoint"],
-        key=config["azure_key"]
+    ocr_processor = get_ocr_processor(
+        endpoint=config.azure_endpoint,
+        key=config.azure_key
     )
 
-    embedding_generator = EmbeddingGenerator(
-        api_key=config["openai_key"],
-        model=config["embedding_model"]
+    embedding_generator = get_embedding_generator(
+        api_key=config.openai_key,
+        model=config.embedding_model
     )
 
     if upload_to_supabase:
-        supabase_uploader = SupabaseUploader(
-            url=config["supabase_url"],
-            key=config["supabase_key"]
-        )
+        supabase_uploader = create_uploader(config, logger)
 
     # Trouver tous les fichiers
-    input_path = Path(input_dir)
-    supported_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'}
-    files = [
-        f for f in input_path.rglob('*')
-        if f.is_file() and f.suffix.lower() in supported_extensions
-    ]
+    files = list(iter_supported(input_dir))
 
     logger.info(f"Trouvé {len(files)} fichiers à traiter")
 
-    # Traiter chaque fichier
-    all_embeddings = []
-
-    for file_path in tqdm(files, desc="Traitement des fichiers"):
-        embeddings_data = process_single_file(
-            str(file_path),
-            ocr_processor,
-            embedding_generator,
-            logger
+    # Upload progressif: les fichiers partent par batches à la fin de chaque lot d'embeddings
+    upload_stream = None
+    if upload_to_supabase:
+        upload_stream = EmbeddingUploadStream(
+            supabase_uploader,
+            table_name,
+            batch_size=config.batch_size,
+            vector_type=config.vector_type
         )
 
-        if embeddings_data:
-            all_embeddings.extend(embeddings_data)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    ndjson_file = Path(output_dir) / "embeddings.ndjson"
+    totals = {"files": 0, "chunks": 0}
 
-            # Sauvegarder le résultat localement
-            output_file = Path(output_dir) / f"{file_path.stem}_embeddings.json"
-            output_file.parent.mkdir(parents=True, exist_ok=True)
+    # Un seul fichier NDJSON écrit séquentiellement (sérialisation orjson)
+    with open(ndjson_file, 'wb', buffering=1 << 20) as out:
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(embeddings_data, f, ensure_ascii=False, indent=2)
+        def save(file_path: str, embeddings_data: List[Dict[str, Any]]) -> None:
+            totals["files"] += 1
+            totals["chunks"] += len(embeddings_data)
 
-            logger.info(f"Résultats sauvegardés dans {output_file}")
+            if upload_stream is not None:
+                upload_stream.add(embeddings_data)
 
-    # Upload vers Supabase si demandé
-    if upload_to_supabase and all_embeddings:
-        logger.info(f"Upload de {len(all_embeddings)} embeddings vers Supabase...")
+            for record in embeddings_data:
+                out.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY))
 
-        try:
-            results = supabase_uploader.upload_embeddings(
-                table_name=table_name,
-                embeddings_data=all_embeddings,
-                batch_size=config["batch_size"]
-            )
+            if per_file_json:
+                meta_file, vecs_file = save_embeddings(output_dir, Path(file_path).stem, embeddings_data)
 
-            logger.info(f"Upload terminé: {len(results)} entrées dans Supabase")
+                logger.debug(f"Résultats sauvegardés dans {meta_file} et {vecs_file}")
 
-            # Afficher les statistiques
-            stats = supabase_uploader.get_table_stats(table_name)
-            logger.info(f"Statistiques de la table: {stats}")
+            # Un résumé tous les 100 fichiers plutôt qu'une ligne par fichier
+            if totals["files"] % 100 == 0:
+                logger.info(f"{totals['files']}/{len(files)} fichiers sauvegardés ({totals['chunks']} chunks)")
 
-        except Exception as e:
-            logger.error(f"Erreur lors de l'upload vers Supabase: {e}")
+        # OCR, embeddings et sauvegarde se chevauchent
+        asyncio.run(run_pipeline(
+            files,
+            ocr_processor,
+            embedding_generator,
+            config.max_workers,
+            save,
+            logger
+        ))
+
+    logger.info(f"Résultats sauvegardés dans {ndjson_file}")
+
+    # Terminer l'upload vers Supabase si demandé
+    if upload_stream is not None:
+        uploaded = upload_stream.flush()
+        logger.info(f"Upload terminé: {uploaded} entrées dans Supabase")
+
+        # Afficher les statistiques
+        stats = supabase_uploader.get_table_stats(table_name)
+        logger.info(f"Statistiques de la table: {stats}")
 
     logger.info("Traitement terminé!")
-    logger.info(f"Total d'embeddings générés: {len(all_embeddings)}")
+    logger.info(f"Total d'embeddings générés: {totals['chunks']}")
 
 
 def main():
@@ -210,6 +374,12 @@ def main():
         help="Upload les résultats vers Supabase"
     )
 
+    parser.add_argument(
+        "--per-file-json",
+        action="store_true",
+        help="Écrit aussi les résultats par document: {nom}.meta.json + {nom}.vecs.npz (mode répertoire)"
+    )
+
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -227,22 +397,23 @@ def main():
     # Setup logger
     logger = setup_logger(
         level=getattr(__import__('logging'), args.log_level),
-        log_file=args.log_file
+        log_file=args.log_file,
+        use_queue=True
     )
 
     # Charger la configuration
-    config = load_config()
+    config = Config.from_env()
 
     # Vérifier les paramètres requis
-    if not config["azure_endpoint"] or not config["azure_key"]:
+    if not config.azure_endpoint or not config.azure_key:
         logger.error("Configuration Azure manquante! Vérifiez votre fichier .env")
         return
 
-    if not config["openai_key"]:
+    if not config.openai_key:
         logger.error("Configuration OpenAI manquante! Vérifiez votre fichier .env")
         return
 
-    if args.upload and (not config["supabase_url"] or not config["supabase_key"]):
+    if args.upload and not config.database_url and (not config.supabase_url or not config.supabase_key):
         logger.error("Configuration Supabase manquante! Vérifiez votre fichier .env")
         return
 
@@ -252,43 +423,37 @@ def main():
     if input_path.is_file():
         logger.info("Mode fichier unique")
 
-        ocr_processor = AzureOCRProcessor(
-            endpoint=config["azure_endpoint"],
-            key=config["azure_key"]
+        ocr_processor = get_ocr_processor(
+            endpoint=config.azure_endpoint,
+            key=config.azure_key
         )
 
-        embedding_generator = EmbeddingGenerator(
-            api_key=config["openai_key"],
-            model=config["embedding_model"]
+        embedding_generator = get_embedding_generator(
+            api_key=config.openai_key,
+            model=config.embedding_model
         )
 
-        embeddings_data = process_single_file(
+        embeddings_data = asyncio.run(process_single_file_async(
             str(input_path),
             ocr_processor,
             embedding_generator,
             logger
-        )
+        ))
 
         # Sauvegarder
-        output_file = Path(args.output) / f"{input_path.stem}_embeddings.json"
-        output_file.parent.mkdir(parents=True, exist_ok=True)
+        meta_file, vecs_file = save_embeddings(args.output, input_path.stem, embeddings_data)
 
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(embeddings_data, f, ensure_ascii=False, indent=2)
-
-        logger.info(f"Résultats sauvegardés dans {output_file}")
+        logger.info(f"Résultats sauvegardés dans {meta_file} et {vecs_file}")
 
         # Upload si demandé
         if args.upload and embeddings_data:
-            supabase_uploader = SupabaseUploader(
-                url=config["supabase_url"],
-                key=config["supabase_key"]
-            )
+            supabase_uploader = create_uploader(config, logger)
 
             results = supabase_uploader.upload_embeddings(
                 table_name=args.table,
                 embeddings_data=embeddings_data,
-                batch_size=config["batch_size"]
+                batch_size=config.batch_size,
+                vector_type=config.vector_type
             )
 
             logger.info(f"Upload terminé: {len(results)} entrées")
@@ -302,7 +467,8 @@ def main():
             table_name=args.table,
             upload_to_supabase=args.upload,
             config=config,
-            logger=logger
+            logger=logger,
+            per_file_json=args.per_file_json
         )
 
     else:
@@ -5,6 +5,7 @@ VERSION SANS EMBEDDINGS (pour quand OpenAI n'est pas configuré)
 """
 
 import os
+import sys
 import argparse
 import json
 from pathlib import Path
@@ -12,7 +13,7 @@ from dotenv import load_dotenv
 from tqdm import tqdm
 
 from src.logger import setup_logger
-from src.azure_ocr import AzureOCRProcessor
+from src.azure_ocr import AzureOCRProcessor, iter_supported
 from src.supabase_client import SupabaseUploader
 
 
@@ -127,20 +128,22 @@ def main():
         logger.info(f"Mode répertoire: {input_path}")
 
         # Trouver tous les fichiers
-        supported_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'}
-        files = [
-            f for f in input_path.rglob('*')
-            if f.is_file() and f.suffix.lower() in supported_extensions
-        ]
+        files = list(iter_supported(str(input_path)))
 
         logger.info(f"Trouvé {len(files)} fichiers à traiter")
 
         all_results = []
 
-        for file_path in tqdm(files, desc="Traitement des fichiers"):
+        for file_name in tqdm(
+            files,
+            desc="Traitement des fichiers",
+            disable=not sys.stderr.isatty(),
+            mininterval=0.5
+        ):
+            file_path = Path(file_name)
             try:
                 # OCR
-                ocr_result = ocr_processor.process_file(str(file_path))
+                ocr_result = ocr_processor.process_file(file_name)
 
                 # Sauvegarder localement
                 output_file = Path(args.output) / f"{file_path.stem}_ocr.json"
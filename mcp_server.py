@@ -8,9 +8,11 @@ client compatible MCP.
 """
 
 import asyncio
+import io
 import logging
-import json
-from typing import Any, Sequence
+import orjson
+from functools import lru_cache, partial
+from typing import Any, List, Optional, Sequence
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -29,11 +31,17 @@ from mcp.types import (
     LoggingLevel
 )
 
+from src.clients import (
+    get_embedding_generator,
+    get_ocr_processor,
+    get_supabase_uploader,
+    get_supabase_uploader_v2,
+)
 from src.semantic_search import SemanticSearchEngine
-from src.supabase_client import SupabaseUploader
-from src.embeddings import EmbeddingGenerator
-from src.supabase_client_v2 import SupabaseUploaderV2
-from src.azure_ocr import AzureOCRProcessor
+from src.semantic_cache import ContextCache, SemanticCache
+from src.embedding_batcher import EmbeddingBatcher
+from src.file_processor import indent_lines, list_directory, read_text_prefix, write_text_atomic
+from src.stale_cache import stale_while_revalidate
 
 # Configuration du logging
 logging.basicConfig(
@@ -42,28 +50,223 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialiser le moteur de recherche
-search_engine = SemanticSearchEngine()
-supabase = SupabaseUploader()
+# Initialiser le moteur de recherche (clients partagés: un seul client
+# OpenAI et un seul client Supabase par processus, connexions réutilisées)
+search_engine = SemanticSearchEngine(
+    embedding_generator=get_embedding_generator(),
+    supabase_uploader=get_supabase_uploader()
+)
+supabase = get_supabase_uploader()
 
 # Initialiser les composants pour l'upload
 try:
-    embedding_gen = EmbeddingGenerator()
-    uploader_v2 = SupabaseUploaderV2()
+    embedding_gen = get_embedding_generator()
+    uploader_v2 = get_supabase_uploader_v2()
     logger.info("✅ Générateur d'embeddings et uploader V2 initialisés")
 except Exception as e:
     logger.warning(f"⚠️ Impossible d'initialiser l'uploader: {e}")
     embedding_gen = None
     uploader_v2 = None
 
+# Pipeline d'upload (importé une fois; process_v2 lit la configuration de chunking)
+try:
+    from process_v2 import process_single_file
+except Exception as e:
+    logger.warning(f"⚠️ Pipeline d'upload indisponible: {e}")
+    process_single_file = None
+
 # Azure OCR (optionnel)
 try:
-    ocr_processor = AzureOCRProcessor()
+    ocr_processor = get_ocr_processor()
     logger.info("✅ Azure OCR initialisé")
 except Exception as e:
     logger.warning(f"⚠️ Azure OCR non disponible: {e}")
     ocr_processor = None
 
+# Caches des recherches (exactes + requêtes sémantiquement proches)
+_search_cache = SemanticCache(maxsize=512, similarity=0.95, ttl=300)
+# Cache disque des contextes RAG: optionnel (dossier de cache non inscriptible)
+try:
+    _context_cache: Optional[ContextCache] = ContextCache()
+except Exception as e:
+    logger.warning(f"⚠️ Cache des contextes RAG désactivé: {e}")
+    _context_cache = None
+SEARCH_CACHE_MAX_LIMIT = 50
+_inflight_searches: dict = {}
+
+# Batcher d'embeddings partagé par les upload_document concurrents
+EMBED_BATCH_MAX_ITEMS = 128
+EMBED_BATCH_WINDOW = 0.02
+_embed_batcher = EmbeddingBatcher(
+    lambda texts: embedding_gen.generate_embeddings_batch(texts, len(texts)),
+    max_items=EMBED_BATCH_MAX_ITEMS,
+    window=EMBED_BATCH_WINDOW
+)
+
+
+@stale_while_revalidate(ttl=60, max_stale=600)
+def _database_stats() -> dict:
+    """Statistiques de la base (stale-while-revalidate: 60 s / 10 min)."""
+    return uploader_v2.get_database_stats()
+
+
+def _cached_search(
+    query: str,
+    limit: int,
+    threshold: float,
+    query_embedding: Optional[List[float]] = None
+) -> list:
+    """
+    Recherche sémantique avec cache à deux niveaux: requête identique, puis
+    requête dont l'embedding est quasi identique (cosinus >= 0.95). Un hit
+    évite l'appel OpenAI (niveau exact) et la requête pgvector (deux niveaux).
+    `query_embedding` évite de recalculer un embedding déjà connu.
+    """
+    if limit > SEARCH_CACHE_MAX_LIMIT:
+        return search_engine.search(query=query, limit=limit, threshold=threshold)
+
+    scope = (limit, round(threshold, 2))
+    key = (query, *scope)
+
+    results = _search_cache.get(key)
+    if results is not None:
+        return results
+
+    if query_embedding is None:
+        query_embedding = search_engine.embedding_generator.generate_embedding(query)
+    if not query_embedding:
+        return []
+
+    results = _search_cache.get_similar(query_embedding, scope)
+    if results is not None:
+        logger.info(f"♻️ Résultat réutilisé (requête similaire) pour: {query}")
+        _search_cache.put(key, results)
+        return results
+
+    results = search_engine.search_by_embedding(query_embedding, limit=limit, threshold=threshold)
+    if results:
+        _search_cache.put(key, results, query_embedding, scope)
+    return results
+
+
+def _rag_context(query: str, limit: int, threshold: float) -> str:
+    """
+    Contexte RAG formaté, servi si possible depuis le cache disque (signature
+    LSH de l'embedding de la requête, confirmée par le cosinus): un hit évite
+    la recherche pgvector et le formatage.
+    """
+    if limit > SEARCH_CACHE_MAX_LIMIT:
+        return search_engine.format_context(_cached_search(query, limit, threshold))
+
+    # Requête identique déjà servie: résultats en mémoire, sans appel OpenAI
+    results = _search_cache.get((query, limit, round(threshold, 2)))
+    if results is not None:
+        return search_engine.format_context(results)
+
+    query_embedding = search_engine.embedding_generator.generate_embedding(query)
+    if not query_embedding:
+        return search_engine.format_context([])
+
+    context = _context_cache.get(query_embedding, limit, threshold) if _context_cache else None
+    if context is not None:
+        logger.info(f"♻️ Contexte RAG réutilisé pour: {query}")
+        return context
+
+    results = _cached_search(query, limit, threshold, query_embedding)
+    context = search_engine.format_context(results)
+    if results and _context_cache:
+        _context_cache.put(query_embedding, limit, threshold, context)
+    return context
+
+
+async def _coalesced(func, *args):
+    """
+    Exécute func(*args) dans un thread, en partageant une même exécution entre
+    les appels identiques simultanés (un seul appel embedding + pgvector).
+    """
+    key = (func, *args)
+    task = _inflight_searches.get(key)
+
+    if task is None:
+        task = asyncio.create_task(asyncio.to_thread(func, *args))
+        _inflight_searches[key] = task
+        task.add_done_callback(lambda _: _inflight_searches.pop(key, None))
+
+    # shield: l'annulation d'un appelant n'interrompt pas la recherche des autres
+    return await asyncio.shield(task)
+
+
+_SEARCH_RESULT_TEMPLATE = (
+    "\n#{rank} - {file_name}\n"
+    "   Similarité: {similarity:.2%}\n"
+    "   Chunk: {chunk_index}\n"
+    "\n   Contenu:\n"
+)
+_SEPARATOR = "=" * 70
+
+
+def _format_search_results(query: str, results: list) -> str:
+    """Formate les résultats de search_documents dans un seul tampon."""
+    buf = io.StringIO()
+    buf.write(f"🔍 Requête: {query}\n📊 {len(results)} résultats trouvés\n\n{_SEPARATOR}\n")
+
+    for result in results:
+        buf.write(_SEARCH_RESULT_TEMPLATE.format_map(result))
+
+        # Limiter l'affichage du contenu
+        content = result['content']
+        if len(content) > 800:
+            content = content[:800] + "..."
+
+        # Indenter le contenu (lignes vides retirées)
+        content = indent_lines(content, normalise_breaks=False)
+        if content:
+            buf.write(content + "\n")
+
+        buf.write("\n")
+
+    # Pas de saut de ligne final
+    return buf.getvalue()[:-1]
+
+
+def _format_file_listing(directory: str, pattern: str, recursive: bool, files: list) -> str:
+    """Formate le résultat de list_files dans un seul tampon."""
+    buf = io.StringIO()
+    buf.write(
+        f"📂 CONTENU DU DOSSIER\n{_SEPARATOR}\n"
+        f"📍 Dossier: {directory}\n"
+        f"🔍 Pattern: {pattern}\n"
+        f"🔄 Récursif: {'Oui' if recursive else 'Non'}\n"
+        f"📊 Fichiers trouvés: {len(files)}\n"
+        f"{_SEPARATOR}\n\n"
+    )
+
+    if not files:
+        buf.write("(Aucun fichier trouvé)\n")
+
+    for rel_path, size in files:
+        if size is not None:
+            buf.write(f"📄 {rel_path} ({size / 1024:.2f} KB)\n")
+        else:
+            buf.write(f"📄 {rel_path}\n")
+
+    return buf.getvalue()[:-1]
+
+
+_STATS_RESOURCE_DESCRIPTION = "Statistics about the documents database. Total: {} documents, {} chunks"
+
+
+@lru_cache(maxsize=8)
+def _stats_resource(total_documents: int, total_chunks: int) -> Resource:
+    """Ressource de statistiques, réutilisée tant que les totaux ne changent pas."""
+    return Resource(
+        uri="supabase://documents/stats",
+        name="Database Statistics",
+        mimeType="application/json",
+        description=_STATS_RESOURCE_DESCRIPTION.format(total_documents, total_chunks)
+    )
+
+
 # Créer le serveur MCP
 app = Server("documents-search-server")
 
@@ -76,18 +279,11 @@ async def list_resources() -> list[Resource]:
     try:
         # Utiliser uploader_v2 pour accéder à documents_full (nouvelle architecture)
         if uploader_v2:
-            stats = uploader_v2.get_database_stats()
+            stats = await asyncio.to_thread(_database_stats)
         else:
             stats = {"total_documents": 0, "total_chunks": 0}
 
-        return [
-            Resource(
-                uri="supabase://documents/stats",
-                name="Database Statistics",
-                mimeType="application/json",
-                description=f"Statistics about the documents database. Total: {stats.get('total_documents', 0)} documents, {stats.get('total_chunks', 0)} chunks"
-            )
-        ]
+        return [_stats_resource(stats.get('total_documents', 0), stats.get('total_chunks', 0))]
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des ressources: {e}")
         return []
@@ -102,191 +298,203 @@ async def read_resource(uri: str) -> str:
         try:
             # Utiliser uploader_v2 pour accéder à documents_full (nouvelle architecture)
             if uploader_v2:
-                stats = uploader_v2.get_database_stats()
+                stats = await asyncio.to_thread(_database_stats)
             else:
                 stats = {"total_documents": 0, "total_chunks": 0, "error": "Uploader V2 non initialisé"}
-            return json.dumps(stats, indent=2)
+            return orjson.dumps(stats, option=orjson.OPT_INDENT_2).decode()
         except Exception as e:
             logger.error(f"Erreur lecture ressource: {e}")
-            return json.dumps({"error": str(e)})
+            return orjson.dumps({"error": str(e)}).decode()
 
-    return json.dumps({"error": "Resource not found"})
+    return orjson.dumps({"error": "Resource not found"}).decode()
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """
-    Liste les outils disponibles (fonctions de recherche).
-    """
-    return [
-        Tool(
-            name="search_documents",
-            description=(
-                "Recherche sémantique dans la base de données de documents. "
-                "Utilise les embeddings pour trouver les passages les plus pertinents "
-                "par rapport à une question ou requête. "
-                "Retourne les meilleurs résultats avec leur score de similarité."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Question ou requête de recherche"
-                    },
-                    "limit": {
-                        "type": "integer",
-                        "description": "Nombre maximum de résultats (défaut: 5)",
-                        "default": 5
-                    },
-                    "threshold": {
-                        "type": "number",
-                        "description": "Seuil de similarité entre 0 et 1 (défaut: 0.7)",
-                        "default": 0.7
-                    }
+# Outils exposés: construits une seule fois à l'import (list_tools est appelé à chaque connexion)
+_TOOLS: list[Tool] = [
+    Tool(
+        name="search_documents",
+        description=(
+            "Recherche sémantique dans la base de données de documents. "
+            "Utilise les embeddings pour trouver les passages les plus pertinents "
+            "par rapport à une question ou requête. "
+            "Retourne les meilleurs résultats avec leur score de similarité."
+        ),
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Question ou requête de recherche"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Nombre maximum de résultats (défaut: 5)",
+                    "default": 5
                 },
-                "required": ["query"]
-            }
+                "threshold": {
+                    "type": "number",
+                    "description": "Seuil de similarité entre 0 et 1 (défaut: 0.7)",
+                    "default": 0.7
+                }
+            },
+            "required": ["query"]
+        }
+    ),
+    Tool(
+        name="get_context_for_rag",
+        description=(
+            "Récupère le contexte pertinent pour RAG (Retrieval Augmented Generation). "
+            "Recherche les passages les plus pertinents et les retourne sous forme de "
+            "contexte formaté, prêt à être utilisé dans un prompt pour un LLM."
         ),
-        Tool(
-            name="get_context_for_rag",
-            description=(
-                "Récupère le contexte pertinent pour RAG (Retrieval Augmented Generation). "
-                "Recherche les passages les plus pertinents et les retourne sous forme de "
-                "contexte formaté, prêt à être utilisé dans un prompt pour un LLM."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Question ou sujet de recherche"
-                    },
-                    "limit": {
-                        "type": "integer",
-                        "description": "Nombre de chunks à récupérer (défaut: 5)",
-                        "default": 5
-                    },
-                    "threshold": {
-                        "type": "number",
-                        "description": "Seuil de similarité (défaut: 0.7)",
-                        "default": 0.7
-                    }
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Question ou sujet de recherche"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Nombre de chunks à récupérer (défaut: 5)",
+                    "default": 5
                 },
-                "required": ["query"]
-            }
+                "threshold": {
+                    "type": "number",
+                    "description": "Seuil de similarité (défaut: 0.7)",
+                    "default": 0.7
+                }
+            },
+            "required": ["query"]
+        }
+    ),
+    Tool(
+        name="get_database_stats",
+        description=(
+            "Récupère les statistiques de la base de données: "
+            "nombre total de documents, nombre de fichiers uniques, etc."
         ),
-        Tool(
-            name="get_database_stats",
-            description=(
-                "Récupère les statistiques de la base de données: "
-                "nombre total de documents, nombre de fichiers uniques, etc."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    ),
+    Tool(
+        name="upload_document",
+        description=(
+            "Upload un document vers la base de données. "
+            "Le document sera traité (extraction de texte, chunking, embeddings) "
+            "puis uploadé dans Supabase. "
+            "Supporte les formats: PDF, TXT, MD, CSV. "
+            "Pour les PDFs scannés, utilise Azure OCR automatiquement."
         ),
-        Tool(
-            name="upload_document",
-            description=(
-                "Upload un document vers la base de données. "
-                "Le document sera traité (extraction de texte, chunking, embeddings) "
-                "puis uploadé dans Supabase. "
-                "Supporte les formats: PDF, TXT, MD, CSV. "
-                "Pour les PDFs scannés, utilise Azure OCR automatiquement."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "Chemin absolu du fichier à uploader"
-                    }
-                },
-                "required": ["file_path"]
-            }
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": {
+                    "type": "string",
+                    "description": "Chemin absolu du fichier à uploader"
+                }
+            },
+            "required": ["file_path"]
+        }
+    ),
+    Tool(
+        name="read_file",
+        description=(
+            "Lit le contenu d'un fichier local. "
+            "Supporte: TXT, MD, CSV, JSON, Python, etc. "
+            "Pour les fichiers PDF, affiche un résumé (utilisez upload_document pour traiter complètement)."
         ),
-        Tool(
-            name="read_file",
-            description=(
-                "Lit le contenu d'un fichier local. "
-                "Supporte: TXT, MD, CSV, JSON, Python, etc. "
-                "Pour les fichiers PDF, affiche un résumé (utilisez upload_document pour traiter complètement)."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "Chemin absolu du fichier à lire"
-                    },
-                    "max_chars": {
-                        "type": "integer",
-                        "description": "Nombre maximum de caractères à retourner (défaut: 10000)",
-                        "default": 10000
-                    }
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": {
+                    "type": "string",
+                    "description": "Chemin absolu du fichier à lire"
                 },
-                "required": ["file_path"]
-            }
+                "max_chars": {
+                    "type": "integer",
+                    "description": "Nombre maximum de caractères à retourner (défaut: 10000)",
+                    "default": 10000
+                }
+            },
+            "required": ["file_path"]
+        }
+    ),
+    Tool(
+        name="write_file",
+        description=(
+            "Crée ou modifie un fichier local. "
+            "Si le fichier existe, il sera écrasé. "
+            "Supporte tous les formats texte: TXT, MD, CSV, JSON, Python, etc."
         ),
-        Tool(
-            name="write_file",
-            description=(
-                "Crée ou modifie un fichier local. "
-                "Si le fichier existe, il sera écrasé. "
-                "Supporte tous les formats texte: TXT, MD, CSV, JSON, Python, etc."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "Chemin absolu du fichier à créer/modifier"
-                    },
-                    "content": {
-                        "type": "string",
-                        "description": "Contenu à écrire dans le fichier"
-                    },
-                    "encoding": {
-                        "type": "string",
-                        "description": "Encodage du fichier (défaut: utf-8)",
-                        "default": "utf-8"
-                    }
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": {
+                    "type": "string",
+                    "description": "Chemin absolu du fichier à créer/modifier"
+                },
+                "content": {
+                    "type": "string",
+                    "description": "Contenu à écrire dans le fichier"
                 },
-                "required": ["file_path", "content"]
-            }
+                "encoding": {
+                    "type": "string",
+                    "description": "Encodage du fichier (défaut: utf-8)",
+                    "default": "utf-8"
+                }
+            },
+            "required": ["file_path", "content"]
+        }
+    ),
+    Tool(
+        name="list_files",
+        description=(
+            "Liste les fichiers d'un dossier. "
+            "Utile pour explorer la structure de fichiers avant de lire/écrire. "
+            "Peut filtrer par extension."
         ),
-        Tool(
-            name="list_files",
-            description=(
-                "Liste les fichiers d'un dossier. "
-                "Utile pour explorer la structure de fichiers avant de lire/écrire. "
-                "Peut filtrer par extension."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "directory": {
-                        "type": "string",
-                        "description": "Chemin du dossier à lister"
-                    },
-                    "pattern": {
-                        "type": "string",
-                        "description": "Pattern de filtre (ex: '*.pdf', '*.txt')",
-                        "default": "*"
-                    },
-                    "recursive": {
-                        "type": "boolean",
-                        "description": "Recherche récursive dans les sous-dossiers",
-                        "default": False
-                    }
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "directory": {
+                    "type": "string",
+                    "description": "Chemin du dossier à lister"
                 },
-                "required": ["directory"]
-            }
-        )
-    ]
+                "pattern": {
+                    "type": "string",
+                    "description": "Pattern de filtre (ex: '*.pdf', '*.txt')",
+                    "default": "*"
+                },
+                "recursive": {
+                    "type": "boolean",
+                    "description": "Recherche récursive dans les sous-dossiers",
+                    "default": False
+                }
+            },
+            "required": ["directory"]
+        }
+    )
+]
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """
+    Liste les outils disponibles (fonctions de recherche).
+    """
+    return _TOOLS
+
+
+def _tc(text: str) -> List[TextContent]:
+    """
+    Réponse texte d'un outil. type="text" est constant et text est toujours
+    une chaîne: model_construct évite la validation Pydantic à chaque retour.
+    """
+    return [TextContent.model_construct(type="text", text=text)]
 
 
 @app.call_tool()
@@ -303,46 +511,12 @@ async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
             logger.info(f"🔍 Recherche: {query} (limit={limit}, threshold={threshold})")
 
             # Effectuer la recherche
-            results = search_engine.search(
-                query=query,
-                limit=limit,
-                threshold=threshold
-            )
+            results = await _coalesced(_cached_search, query, limit, threshold)
 
             if not results:
-                return [TextContent(
-                    type="text",
-                    text="Aucun résultat trouvé pour cette requête."
-                )]
-
-            # Formater les résultats
-            output = []
-            output.append(f"🔍 Requête: {query}")
-            output.append(f"📊 {len(results)} résultats trouvés\n")
-            output.append("=" * 70)
-
-            for result in results:
-                output.append(f"\n#{result['rank']} - {result['file_name']}")
-                output.append(f"   Similarité: {result['similarity']:.2%}")
-                output.append(f"   Chunk: {result['chunk_index']}")
-                output.append(f"\n   Contenu:")
-
-                # Limiter l'affichage du contenu
-                content = result['content']
-                if len(content) > 800:
-                    content = content[:800] + "..."
-
-                # Indenter le contenu
-                for line in content.split('\n'):
-                    if line.strip():
-                        output.append(f"   {line}")
+                return _tc("Aucun résultat trouvé pour cette requête.")
 
-                output.append("")
-
-            return [TextContent(
-                type="text",
-                text="\n".join(output)
-            )]
+            return _tc(_format_search_results(query, results))
 
         elif name == "get_context_for_rag":
             query = arguments.get("query")
@@ -351,29 +525,19 @@ async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
 
             logger.info(f"📚 Contexte RAG pour: {query}")
 
-            # Récupérer le contexte
-            context = search_engine.get_context_for_rag(
-                query=query,
-                limit=limit,
-                threshold=threshold
-            )
+            # Récupérer le contexte (recherche mise en cache)
+            context = await _coalesced(_rag_context, query, limit, threshold)
 
-            return [TextContent(
-                type="text",
-                text=context
-            )]
+            return _tc(context)
 
         elif name == "get_database_stats":
             logger.info("📊 Récupération des statistiques")
 
             # Utiliser uploader_v2 pour accéder à documents_full (nouvelle architecture)
             if uploader_v2:
-                stats = uploader_v2.get_database_stats()
+                stats = await asyncio.to_thread(_database_stats)
             else:
-                return [TextContent(
-                    type="text",
-                    text="❌ Erreur: Uploader V2 non initialisé. Impossible de récupérer les statistiques."
-                )]
+                return _tc("❌ Erreur: Uploader V2 non initialisé. Impossible de récupérer les statistiques.")
 
             output = []
             output.append("📊 STATISTIQUES DE LA BASE DE DONNÉES")
@@ -384,44 +548,41 @@ async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
             output.append(f"📏 Taille moyenne chunk: {stats.get('avg_chunk_size', 0):.0f} caractères")
             output.append(f"🕐 Date: {stats.get('timestamp', 'N/A')}")
 
-            return [TextContent(
-                type="text",
-                text="\n".join(output)
-            )]
+            return _tc("\n".join(output))
 
         elif name == "upload_document":
             file_path = arguments.get("file_path")
 
             if not file_path:
-                return [TextContent(
-                    type="text",
-                    text="❌ Erreur: file_path est requis"
-                )]
+                return _tc("❌ Erreur: file_path est requis")
 
             # Vérifier que les composants sont initialisés
-            if embedding_gen is None or uploader_v2 is None:
-                return [TextContent(
-                    type="text",
-                    text="❌ Erreur: Les composants d'upload ne sont pas initialisés"
-                )]
+            if embedding_gen is None or uploader_v2 is None or process_single_file is None:
+                return _tc("❌ Erreur: Les composants d'upload ne sont pas initialisés")
 
             logger.info(f"📤 Upload du document: {file_path}")
 
             try:
-                # Importer la fonction de traitement
-                from process_v2 import process_single_file
-
-                # Traiter le fichier
-                result = process_single_file(
+                # Traiter le fichier (OCR et upload hors de la boucle asyncio);
+                # les embeddings passent par le batcher partagé
+                result = await asyncio.to_thread(
+                    process_single_file,
                     file_path=file_path,
                     embedding_gen=embedding_gen,
                     uploader=uploader_v2,
                     ocr_processor=ocr_processor,
-                    upload=True
+                    upload=True,
+                    embed_texts=partial(_embed_batcher.embed_from_thread, asyncio.get_running_loop())
                 )
 
                 # Formater la réponse
                 if result["status"] == "success":
+                    # Nouveau contenu: statistiques et recherches en cache périmées
+                    _database_stats.clear()
+                    _search_cache.clear()
+                    if _context_cache:
+                        _context_cache.clear()
+
                     output = []
                     output.append("✅ UPLOAD RÉUSSI")
                     output.append("=" * 70)
@@ -433,62 +594,36 @@ async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
                     if result.get('page_count'):
                         output.append(f"📄 Pages: {result['page_count']}")
 
-                    return [TextContent(
-                        type="text",
-                        text="\n".join(output)
-                    )]
+                    return _tc("\n".join(output))
                 else:
-                    return [TextContent(
-                        type="text",
-                        text=f"❌ Erreur lors de l'upload:\n{result.get('error', 'Erreur inconnue')}"
-                    )]
+                    return _tc(f"❌ Erreur lors de l'upload:\n{result.get('error', 'Erreur inconnue')}")
 
             except Exception as e:
-                logger.error(f"Erreur upload: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"Erreur upload: {e}")
 
-                return [TextContent(
-                    type="text",
-                    text=f"❌ Erreur lors de l'upload:\n{str(e)}"
-                )]
+                return _tc(f"❌ Erreur lors de l'upload:\n{str(e)}")
 
         elif name == "read_file":
             file_path = arguments.get("file_path")
             max_chars = arguments.get("max_chars", 10000)
 
             if not file_path:
-                return [TextContent(
-                    type="text",
-                    text="❌ Erreur: file_path est requis"
-                )]
+                return _tc("❌ Erreur: file_path est requis")
 
             logger.info(f"📖 Lecture du fichier: {file_path}")
 
             try:
-                import os
-                from pathlib import Path
-
-                # Vérifier que le fichier existe
-                if not os.path.exists(file_path):
-                    return [TextContent(
-                        type="text",
-                        text=f"❌ Erreur: Le fichier n'existe pas:\n{file_path}"
-                    )]
-
-                # Lire le fichier
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-
-                # Limiter la taille
-                truncated = False
-                if len(content) > max_chars:
-                    content = content[:max_chars]
-                    truncated = True
+                # Lire le début du fichier (dans un thread pour ne pas bloquer la boucle);
+                # l'existence est vérifiée par l'ouverture elle-même
+                try:
+                    content, truncated, file_size = await asyncio.to_thread(
+                        read_text_prefix, file_path, max_chars
+                    )
+                except FileNotFoundError:
+                    return _tc(f"❌ Erreur: Le fichier n'existe pas:\n{file_path}")
 
                 # Formater la réponse
                 file_name = Path(file_path).name
-                file_size = os.path.getsize(file_path)
                 file_size_kb = file_size / 1024
 
                 output = []
@@ -503,17 +638,11 @@ async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
                 output.append("")
                 output.append(content)
 
-                return [TextContent(
-                    type="text",
-                    text="\n".join(output)
-                )]
+                return _tc("\n".join(output))
 
             except Exception as e:
                 logger.error(f"Erreur lecture: {e}")
-                return [TextContent(
-                    type="text",
-                    text=f"❌ Erreur lors de la lecture:\n{str(e)}"
-                )]
+                return _tc(f"❌ Erreur lors de la lecture:\n{str(e)}")
 
         elif name == "write_file":
             file_path = arguments.get("file_path")
@@ -521,32 +650,19 @@ async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
             encoding = arguments.get("encoding", "utf-8")
 
             if not file_path or content is None:
-                return [TextContent(
-                    type="text",
-                    text="❌ Erreur: file_path et content sont requis"
-                )]
+                return _tc("❌ Erreur: file_path et content sont requis")
 
             logger.info(f"✍️ Écriture dans le fichier: {file_path}")
 
             try:
-                import os
-                from pathlib import Path
-
-                # Créer les dossiers parents si nécessaire
-                parent_dir = Path(file_path).parent
-                parent_dir.mkdir(parents=True, exist_ok=True)
-
-                # Vérifier si le fichier existe déjà
-                file_exists = os.path.exists(file_path)
+                # Écrire le fichier (dans un thread pour ne pas bloquer la boucle)
+                file_exists, file_size = await asyncio.to_thread(
+                    write_text_atomic, file_path, content, encoding
+                )
                 action = "modifié" if file_exists else "créé"
 
-                # Écrire le fichier
-                with open(file_path, 'w', encoding=encoding) as f:
-                    f.write(content)
-
                 # Confirmer
                 file_name = Path(file_path).name
-                file_size = os.path.getsize(file_path)
                 file_size_kb = file_size / 1024
 
                 output = []
@@ -559,20 +675,12 @@ async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
                 output.append(f"🔤 Encodage: {encoding}")
                 output.append(f"✨ Action: Fichier {action} avec succès")
 
-                return [TextContent(
-                    type="text",
-                    text="\n".join(output)
-                )]
+                return _tc("\n".join(output))
 
             except Exception as e:
-                logger.error(f"Erreur écriture: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"Erreur écriture: {e}")
 
-                return [TextContent(
-                    type="text",
-                    text=f"❌ Erreur lors de l'écriture:\n{str(e)}"
-                )]
+                return _tc(f"❌ Erreur lors de l'écriture:\n{str(e)}")
 
         elif name == "list_files":
             directory = arguments.get("directory")
@@ -580,101 +688,51 @@ async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
             recursive = arguments.get("recursive", False)
 
             if not directory:
-                return [TextContent(
-                    type="text",
-                    text="❌ Erreur: directory est requis"
-                )]
+                return _tc("❌ Erreur: directory est requis")
 
             logger.info(f"📂 Listage du dossier: {directory}")
 
             try:
-                import os
-                from pathlib import Path
-                import fnmatch
-
-                # Vérifier que le dossier existe
-                if not os.path.exists(directory):
-                    return [TextContent(
-                        type="text",
-                        text=f"❌ Erreur: Le dossier n'existe pas:\n{directory}"
-                    )]
-
-                if not os.path.isdir(directory):
-                    return [TextContent(
-                        type="text",
-                        text=f"❌ Erreur: Le chemin n'est pas un dossier:\n{directory}"
-                    )]
-
-                # Lister les fichiers
-                files = []
-                dir_path = Path(directory)
-
-                if recursive:
-                    # Recherche récursive
-                    for root, dirs, filenames in os.walk(directory):
-                        for filename in filenames:
-                            if fnmatch.fnmatch(filename, pattern):
-                                full_path = os.path.join(root, filename)
-                                rel_path = os.path.relpath(full_path, directory)
-                                files.append((rel_path, full_path))
-                else:
-                    # Recherche non-récursive
-                    for item in dir_path.iterdir():
-                        if item.is_file() and fnmatch.fnmatch(item.name, pattern):
-                            files.append((item.name, str(item)))
-
-                # Trier par nom
-                files.sort()
-
-                # Formater la réponse
-                output = []
-                output.append(f"📂 CONTENU DU DOSSIER")
-                output.append("=" * 70)
-                output.append(f"📍 Dossier: {directory}")
-                output.append(f"🔍 Pattern: {pattern}")
-                output.append(f"🔄 Récursif: {'Oui' if recursive else 'Non'}")
-                output.append(f"📊 Fichiers trouvés: {len(files)}")
-                output.append("=" * 70)
-                output.append("")
-
-                if files:
-                    for rel_path, full_path in files:
-                        try:
-                            size = os.path.getsize(full_path)
-                            size_kb = size / 1024
-                            output.append(f"📄 {rel_path} ({size_kb:.2f} KB)")
-                        except:
-                            output.append(f"📄 {rel_path}")
-                else:
-                    output.append("(Aucun fichier trouvé)")
+                # Lister les fichiers (parcours disque dans un thread); l'existence
+                # et le type du dossier sont vérifiés par le premier os.scandir
+                try:
+                    files = await asyncio.to_thread(list_directory, directory, pattern, recursive)
+                except FileNotFoundError:
+                    return _tc(f"❌ Erreur: Le dossier n'existe pas:\n{directory}")
+                except NotADirectoryError:
+                    return _tc(f"❌ Erreur: Le chemin n'est pas un dossier:\n{directory}")
 
-                return [TextContent(
-                    type="text",
-                    text="\n".join(output)
-                )]
+                return _tc(_format_file_listing(directory, pattern, recursive, files))
 
             except Exception as e:
                 logger.error(f"Erreur listage: {e}")
-                return [TextContent(
-                    type="text",
-                    text=f"❌ Erreur lors du listage:\n{str(e)}"
-                )]
+                return _tc(f"❌ Erreur lors du listage:\n{str(e)}")
 
         else:
-            return [TextContent(
-                type="text",
-                text=f"Outil inconnu: {name}"
-            )]
+            return _tc(f"Outil inconnu: {name}")
 
     except Exception as e:
-        logger.error(f"Erreur lors de l'exécution de {name}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Erreur lors de l'exécution de {name}: {e}")
+
+        return _tc(f"Erreur: {str(e)}")
+
+
+# Tâches lancées sans être attendues (voir main)
+_background_tasks: set = set()
 
-        return [TextContent(
-            type="text",
-            text=f"Erreur: {str(e)}"
-        )]
+
+async def _warmup() -> None:
+    """
+    Préchauffe les connexions OpenAI et Supabase (TLS, pool keep-alive) et le
+    cache des statistiques, pour que la première requête n'en paie pas le coût.
+    """
+    calls = [asyncio.to_thread(search_engine.embedding_generator.generate_embedding, "warmup")]
+    if uploader_v2:
+        calls.append(asyncio.to_thread(_database_stats))
+
+    for result in await asyncio.gather(*calls, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.warning(f"⚠️ Préchauffage incomplet: {result}")
 
 
 async def main():
@@ -684,6 +742,12 @@ async def main():
     logger.info("🚀 Démarrage du serveur MCP de recherche documentaire")
     logger.info("📚 Moteur de recherche sémantique initialisé")
 
+    # En tâche de fond: ne retarde pas la poignée de main MCP (référence
+    # conservée jusqu'à la fin, la boucle ne garde qu'une référence faible)
+    warmup = asyncio.create_task(_warmup())
+    _background_tasks.add(warmup)
+    warmup.add_done_callback(_background_tasks.discard)
+
     async with stdio_server() as (read_stream, write_stream):
         await app.run(
             read_stream,
@@ -693,11 +757,16 @@ async def main():
 
 
 if __name__ == "__main__":
+    # Boucle libuv (optionnelle) : surcoût par await plus faible que la boucle par défaut
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("🛑 Arrêt du serveur MCP")
     except Exception as e:
-        logger.error(f"❌ Erreur fatale: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Erreur fatale: {e}")
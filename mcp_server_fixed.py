@@ -3,11 +3,15 @@
 MCP Server corrigé pour Claude - accepte les requêtes POST sur /
 """
 import asyncio
+import importlib.util
 import json
 import os
 import logging
+from functools import partial
 from pathlib import Path
 
+import orjson
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -15,20 +19,27 @@ load_dotenv()
 from mcp.server.fastmcp import FastMCP
 
 # Modules locaux
-from src.semantic_search import SemanticSearchEngine
-from src.supabase_client import SupabaseUploader
-from src.embeddings import EmbeddingGenerator
-from src.supabase_client_v2 import SupabaseUploaderV2
-from src.azure_ocr import AzureOCRProcessor
+from src.clients import (
+    get_embedding_generator,
+    get_search_engine,
+    get_supabase_uploader,
+    get_supabase_uploader_v2,
+)
+from src.embedding_batcher import EmbeddingBatcher
+from src.file_processor import indent_lines, list_directory
+from src.stale_cache import stale_while_revalidate
 
 # ASGI / HTTP
 from starlette.applications import Starlette
-from starlette.routing import Route
-from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+from starlette.responses import Response
 from starlette.requests import Request
-from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 import uvicorn
 
+# Parseur HTTP en C si disponible (uvicorn[standard]), sinon h11
+HTTP_IMPLEMENTATION = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
 # -----------------------------------------------------------------------------
 # Logging
 # -----------------------------------------------------------------------------
@@ -36,87 +47,103 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 log = logging.getLogger("mcp_fixed")
 
 # -----------------------------------------------------------------------------
-# Initialisations
+# Composants: créés au premier usage et partagés (src.clients)
 # -----------------------------------------------------------------------------
-log.info("✅ Initialisation du moteur de recherche...")
-try:
-    search = SemanticSearchEngine()
-    log.info("✅ Moteur de recherche prêt")
-except Exception as e:
-    log.warning(f"⚠️ Search engine disabled: {e}")
-    search = None
-
-supabase = SupabaseUploader()
-
-try:
-    embedder = EmbeddingGenerator()
-    uploader_v2 = SupabaseUploaderV2()
-    log.info("✅ Embeddings + Uploader V2 prêts")
-except Exception as e:
-    log.warning(f"⚠️ Uploader V2 indisponible: {e}")
-    embedder = None
-    uploader_v2 = None
-
-try:
-    ocr = AzureOCRProcessor()
-    log.info("✅ Azure OCR prêt")
-except Exception as e:
-    log.warning(f"⚠️ Azure OCR indisponible: {e}")
-    ocr = None
+def _component(factory, label: str):
+    """Composant partagé, ou None (avec avertissement) s'il ne peut pas être créé."""
+    try:
+        return factory()
+    except Exception as e:
+        log.warning(f"⚠️ {label} indisponible: {e}")
+        return None
+
+# Statistiques de la base: fraîches 60 s, puis servies jusqu'à 10 min pendant
+# leur rafraîchissement en arrière-plan
+@stale_while_revalidate(ttl=60, max_stale=600)
+def _database_stats() -> dict:
+    """Statistiques de la base (stale-while-revalidate: 60 s / 10 min)."""
+    return get_supabase_uploader_v2().get_database_stats()
+
+# Embeddings des requêtes concurrentes regroupés (fenêtre de 15 ms, 32 requêtes)
+_query_batcher = EmbeddingBatcher(
+    lambda texts: get_embedding_generator().generate_embeddings_batch(texts, len(texts)),
+    max_items=32,
+    window=0.015,
+)
+
+
+def _embed_query(loop: asyncio.AbstractEventLoop, query: str) -> list:
+    """Embedding d'une requête via le batcher, depuis un thread de recherche."""
+    return _query_batcher.embed_from_thread(loop, [query])[0]
 
 # -----------------------------------------------------------------------------
 # MCP Server
 # -----------------------------------------------------------------------------
 mcp = FastMCP("documents-search-server")
 
+def _format_result(r: dict) -> str:
+    """Bloc texte d'un résultat de recherche (contenu limité à 800 caractères)."""
+    content = r["content"]
+    if len(content) > 800:
+        content = content[:800] + "..."
+    # Sauts de ligne normalisés (comme str.splitlines), lignes vides retirées,
+    # puis indentation en une passe
+    content = indent_lines(content)
+    lines = "\n" + content if content else ""
+    return (
+        f"\n#{r['rank']} - {r['file_name']}\n"
+        f"   Similarité: {r['similarity']:.2%}\n"
+        f"   Chunk: {r['chunk_index']}\n"
+        f"   Contenu:{lines}"
+    )
+
 # ---- TOOLS -------------------------------------------------------------------
 @mcp.tool()
-def search_documents(query: str, limit: int = 5, threshold: float = 0.3) -> str:
+async def search_documents(query: str, limit: int = 5, threshold: float = 0.3) -> str:
     """Recherche sémantique dans la base de documents."""
+    search = _component(get_search_engine, "Moteur de recherche")
     if not search:
         return "❌ Recherche indisponible: configurez OPENAI_API_KEY et SUPABASE_URL/SUPABASE_KEY."
     
     try:
-        results = search.search(query=query, limit=limit, threshold=threshold)
+        # Recherche dans un thread; l'embedding de la requête passe par le batcher
+        results = await asyncio.to_thread(
+            search.search, query, limit, threshold,
+            embed_query=partial(_embed_query, asyncio.get_running_loop()),
+        )
         if not results:
             return f"Aucun résultat pour: {query}"
         
-        lines = [f"🔍 Requête: {query}", f"📊 {len(results)} résultats", "=" * 60]
-        for r in results:
-            content = r["content"]
-            if len(content) > 800:
-                content = content[:800] + "..."
-            lines += [
-                f"\n#{r['rank']} - {r['file_name']}",
-                f"   Similarité: {r['similarity']:.2%}",
-                f"   Chunk: {r['chunk_index']}",
-                "   Contenu:",
-                *[f"   {ln}" for ln in content.splitlines() if ln.strip()],
-            ]
-        return "\n".join(lines)
+        header = f"🔍 Requête: {query}\n📊 {len(results)} résultats\n{'=' * 60}"
+        body = "\n".join(_format_result(r) for r in results)
+        return f"{header}\n{body}"
     except Exception as e:
         log.error(f"Erreur recherche: {e}")
         return f"❌ Erreur lors de la recherche: {str(e)}"
 
 @mcp.tool()
-def get_context_for_rag(query: str, limit: int = 5, threshold: float = 0.3) -> str:
+async def get_context_for_rag(query: str, limit: int = 5, threshold: float = 0.3) -> str:
     """Retourne un contexte formaté pour RAG."""
+    search = _component(get_search_engine, "Moteur de recherche")
     if not search:
         return "❌ RAG indisponible."
     
     try:
-        return search.get_context_for_rag(query=query, limit=limit, threshold=threshold)
+        return await asyncio.to_thread(
+            search.get_context_for_rag, query, limit, threshold,
+            embed_query=partial(_embed_query, asyncio.get_running_loop()),
+        )
     except Exception as e:
         return f"❌ Erreur RAG: {str(e)}"
 
 @mcp.tool()
-def get_database_stats() -> str:
+async def get_database_stats() -> str:
     """Statistiques de la base Supabase."""
-    if not uploader_v2:
+    if not _component(get_supabase_uploader_v2, "Uploader V2"):
         return "❌ Stats indisponibles."
     
     try:
-        stats = uploader_v2.get_database_stats()
+        stats = await asyncio.to_thread(_database_stats)
         return f"""📊 STATISTIQUES
 {'='*60}
 📁 Total documents : {stats.get('total_documents', 0)}
@@ -128,13 +155,19 @@ def get_database_stats() -> str:
         return f"❌ Erreur stats: {str(e)}"
 
 @mcp.tool()
-def list_files(directory: str = "/mnt/user-data/uploads") -> str:
+async def list_files(directory: str = "/mnt/user-data/uploads") -> str:
     """Liste les fichiers dans un répertoire."""
+    # Parcours disque ou requête Supabase: hors de la boucle d'événements
+    return await asyncio.to_thread(_list_files, directory)
+
+def _list_files(directory: str) -> str:
+    """Listage bloquant de list_files (dossier local, sinon documents Supabase)."""
     try:
         path = Path(directory)
         if not path.exists():
             # Si le dossier n'existe pas, lister les documents de Supabase
-            if uploader_v2:
+            supabase = _component(get_supabase_uploader, "Supabase")
+            if supabase:
                 try:
                     docs = supabase.client.table('documents_full').select('file_name,created_at').limit(20).execute()
                     if docs.data:
@@ -146,19 +179,12 @@ def list_files(directory: str = "/mnt/user-data/uploads") -> str:
                     pass
             return f"❌ Le dossier {directory} n'existe pas"
         
-        files = []
-        for item in path.rglob("*"):
-            if item.is_file():
-                rel = str(item.relative_to(path))
-                files.append((rel, str(item)))
-        
-        files.sort()
+        files = list_directory(directory, recursive=True)
         out = [f"📂 {directory} | {len(files)} fichier(s)\n"]
-        for rel, full in files:
-            try:
-                size_kb = os.path.getsize(full) / 1024
-                out.append(f"📄 {rel} ({size_kb:.2f} KB)")
-            except:
+        for rel, size in files:
+            if size is not None:
+                out.append(f"📄 {rel} ({size / 1024:.2f} KB)")
+            else:
                 out.append(f"📄 {rel}")
         return "\n".join(out)
     except Exception as e:
@@ -167,51 +193,100 @@ def list_files(directory: str = "/mnt/user-data/uploads") -> str:
 # -----------------------------------------------------------------------------
 # Application Starlette avec routes personnalisées
 # -----------------------------------------------------------------------------
-async def handle_mcp_request(request: Request):
-    """Gère les requêtes MCP sur toutes les routes"""
-    # Obtenir le handler MCP
-    mcp_handler = mcp.get_asgi_handler()
-    
-    # Passer la requête au handler MCP
-    return await mcp_handler(request.scope, request.receive, request.send)
+# Réponses constantes: sérialisées une seule fois à l'import
+_HEALTH_BYTES = orjson.dumps({"status": "healthy", "service": "mcp-server"})
+_ROOT_INFO_BYTES = orjson.dumps({
+    "service": "MCP Document Search Server",
+    "version": "1.0",
+    "status": "running",
+    "endpoints": {
+        "/": "Service info",
+        "/health": "Health check",
+        "/mcp": "MCP endpoint"
+    }
+})
+# Transport MCP streamable HTTP, construit une seule fois. Son gestionnaire de
+# sessions doit tourner pendant toute la vie du serveur: monté sous Mount, son
+# lifespan ne serait pas exécuté, il est donc confié à l'application externe.
+mcp_http = mcp.streamable_http_app()
+_MCP_PATH = mcp.settings.streamable_http_path
+
+async def mcp_asgi(scope, receive, send):
+    """Requêtes MCP (/mcp ou POST direct sur un autre chemin) vers le transport."""
+    await mcp_http(dict(scope, path=_MCP_PATH), receive, send)
 
 async def health_check(request: Request):
     """Endpoint de santé"""
-    return JSONResponse({"status": "healthy", "service": "mcp-server"})
+    return Response(_HEALTH_BYTES, media_type="application/json")
 
 async def root_info(request: Request):
     """Info sur le service"""
-    return JSONResponse({
-        "service": "MCP Document Search Server",
-        "version": "1.0",
-        "status": "running",
-        "endpoints": {
-            "/": "Service info",
-            "/health": "Health check",
-            "/mcp": "MCP endpoint"
-        }
-    })
+    return Response(_ROOT_INFO_BYTES, media_type="application/json")
 
 # Routes
 routes = [
     Route("/", endpoint=root_info, methods=["GET"]),
     Route("/health", endpoint=health_check, methods=["GET"]),
-    Route("/mcp", endpoint=handle_mcp_request, methods=["GET", "POST", "OPTIONS"]),
-    # Route catch-all pour les requêtes MCP directes
-    Route("/{path:path}", endpoint=handle_mcp_request, methods=["POST", "OPTIONS"]),
+    # Tout le reste (/mcp et requêtes MCP directes) va au handler MCP, sans wrapper
+    Mount("/", app=mcp_asgi),
 ]
 
-app = Starlette(routes=routes)
-
-# CORS pour Claude/ChatGPT
-app = CORSMiddleware(
-    app,
-    allow_origins=["*"],
-    allow_methods=["GET", "POST", "OPTIONS", "HEAD"],
-    allow_headers=["*"],
-    expose_headers=["*"],
+# Réponses JSON-RPC volumineuses (résultats de recherche) compressées;
+# les flux text/event-stream sont exclus par GZipMiddleware
+starlette_app = GZipMiddleware(
+    Starlette(routes=routes, lifespan=lambda _app: mcp.session_manager.run()),
+    minimum_size=1024,
+    compresslevel=5,
 )
 
+# CORS pour Claude/ChatGPT (toutes origines): la réponse au preflight est
+# constante, donc pré-construite; les autres réponses reçoivent seulement
+# les en-têtes Access-Control-*.
+_CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-expose-headers", b"*"),
+]
+_PREFLIGHT_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS, HEAD"),
+    (b"access-control-max-age", b"600"),
+    (b"content-length", b"0"),
+]
+_PREFLIGHT_START = {
+    "type": "http.response.start",
+    "status": 204,
+    "headers": _PREFLIGHT_HEADERS + [(b"access-control-allow-headers", b"*")],
+}
+_PREFLIGHT_BODY = {"type": "http.response.body", "body": b""}
+
+async def app(scope, receive, send):
+    """Application ASGI: CORS ouvert autour de l'application Starlette."""
+    if scope["type"] != "http":
+        await starlette_app(scope, receive, send)
+        return
+
+    if scope["method"] == "OPTIONS":
+        # En-têtes demandés renvoyés tels quels ("*" n'autorise pas Authorization)
+        start = _PREFLIGHT_START
+        for name, value in scope["headers"]:
+            if name == b"access-control-request-headers":
+                start = {
+                    "type": "http.response.start",
+                    "status": 204,
+                    "headers": _PREFLIGHT_HEADERS + [(b"access-control-allow-headers", value)],
+                }
+                break
+        await send(start)
+        await send(_PREFLIGHT_BODY)
+        return
+
+    async def send_with_cors(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", ()), *_CORS_HEADERS]}
+        await send(message)
+
+    await starlette_app(scope, receive, send_with_cors)
+
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
@@ -224,12 +299,20 @@ async def main():
         app=app, 
         host="0.0.0.0", 
         port=port, 
-        log_level="info"
+        log_level="info",
+        http=HTTP_IMPLEMENTATION,
     )
     server = uvicorn.Server(config)
     await server.serve()
 
 if __name__ == "__main__":
+    # Boucle libuv (optionnelle, hors Windows) : surcoût par await plus faible
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
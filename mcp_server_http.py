@@ -9,12 +9,16 @@ Serveur MCP avec transport HTTP/SSE pour ChatGPT (Developer Mode) et Claude Desk
 """
 
 import asyncio
+import importlib.util
 import logging
-import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Any, Sequence
 
+import orjson
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -24,20 +28,25 @@ from mcp.server.sse import SseServerTransport
 from mcp.types import Resource, Tool, TextContent
 
 # Tes modules applicatifs
-from src.semantic_search import SemanticSearchEngine
-from src.supabase_client import SupabaseUploader
-from src.embeddings import EmbeddingGenerator
-from src.supabase_client_v2 import SupabaseUploaderV2
-from src.azure_ocr import AzureOCRProcessor
+from src.clients import (
+    get_embedding_generator,
+    get_ocr_processor,
+    get_search_engine,
+    get_supabase_uploader_v2,
+)
+from src.file_processor import indent_lines, list_directory, read_text_prefix, write_text_atomic
+from src.stale_cache import stale_while_revalidate
 
 # HTTP layer
-from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse, RedirectResponse
 from starlette.applications import Starlette
-from starlette.routing import Route, Mount
-from starlette.responses import PlainTextResponse
+from starlette.requests import Request
+from starlette.routing import Route
+from starlette.responses import RedirectResponse, Response
 import uvicorn
 
+# Parseur HTTP en C si disponible (uvicorn[standard]), sinon h11
+HTTP_IMPLEMENTATION = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
 # -----------------------------------------------------------------------------
 # Logging
 # -----------------------------------------------------------------------------
@@ -48,27 +57,22 @@ logging.basicConfig(
 logger = logging.getLogger("mcp_server_http")
 
 # -----------------------------------------------------------------------------
-# Initialisations applicatives
+# Composants applicatifs: créés au premier usage et partagés (src.clients)
 # -----------------------------------------------------------------------------
-logger.info("✅ Moteur de recherche sémantique initialisé")
-search_engine = SemanticSearchEngine()
-supabase = SupabaseUploader()
-
-try:
-    embedding_gen = EmbeddingGenerator()
-    uploader_v2 = SupabaseUploaderV2()
-    logger.info("✅ Générateur d'embeddings et uploader V2 initialisés")
-except Exception as e:
-    logger.warning(f"⚠️ Impossible d'initialiser l'uploader V2: {e}")
-    embedding_gen = None
-    uploader_v2 = None
-
-try:
-    ocr_processor = AzureOCRProcessor()
-    logger.info("✅ Azure OCR initialisé")
-except Exception as e:
-    logger.warning(f"⚠️ Azure OCR non disponible: {e}")
-    ocr_processor = None
+def _component(factory, label: str):
+    """Composant partagé, ou None (avec avertissement) s'il ne peut pas être créé."""
+    try:
+        return factory()
+    except Exception as e:
+        logger.warning(f"⚠️ {label} non disponible: {e}")
+        return None
+
+# Statistiques de la base: fraîches 60 s, puis servies jusqu'à 10 min pendant
+# leur rafraîchissement en arrière-plan
+@stale_while_revalidate(ttl=60, max_stale=600)
+def _database_stats() -> dict:
+    """Statistiques de la base (stale-while-revalidate: 60 s / 10 min)."""
+    return get_supabase_uploader_v2().get_database_stats()
 
 # -----------------------------------------------------------------------------
 # Serveur MCP (SDK)
@@ -78,8 +82,8 @@ mcp_server = Server("documents-search-server")
 @mcp_server.list_resources()
 async def list_resources() -> list[Resource]:
     try:
-        if uploader_v2:
-            stats = uploader_v2.get_database_stats()
+        if _component(get_supabase_uploader_v2, "Uploader V2"):
+            stats = await asyncio.to_thread(_database_stats)
         else:
             stats = {"total_documents": 0, "total_chunks": 0}
         return [
@@ -102,19 +106,19 @@ async def list_resources() -> list[Resource]:
 async def read_resource(uri: str) -> str:
     if uri == "supabase://documents/stats":
         try:
-            if uploader_v2:
-                stats = uploader_v2.get_database_stats()
+            if _component(get_supabase_uploader_v2, "Uploader V2"):
+                stats = await asyncio.to_thread(_database_stats)
             else:
                 stats = {
                     "total_documents": 0,
                     "total_chunks": 0,
                     "error": "Uploader V2 non initialise",
                 }
-            return json.dumps(stats, indent=2)
+            return orjson.dumps(stats, option=orjson.OPT_INDENT_2).decode()
         except Exception as e:
             logger.error(f"Erreur read_resource: {e}")
-            return json.dumps({"error": str(e)})
-    return json.dumps({"error": "Resource not found"})
+            return orjson.dumps({"error": str(e)}).decode()
+    return orjson.dumps({"error": "Resource not found"}).decode()
 
 @mcp_server.list_tools()
 async def list_tools() -> list[Tool]:
@@ -199,247 +203,262 @@ async def list_tools() -> list[Tool]:
         ),
     ]
 
-@mcp_server.call_tool()
-async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
+def _format_result(r: dict) -> str:
+    """Bloc texte d'un résultat de recherche (contenu limité à 800 caractères)."""
+    content = r["content"]
+    if len(content) > 800:
+        content = content[:800] + "..."
+    # Lignes vides retirées, puis indentation en une passe
+    content = indent_lines(content, normalise_breaks=False)
+    lines = "\n" + content if content else ""
+    return (
+        f"\n#{r['rank']} - {r['file_name']}\n"
+        f"   Similarité: {r['similarity']:.2%}\n"
+        f"   Chunk: {r['chunk_index']}\n"
+        f"   Contenu:{lines}"
+    )
+
+# ---- Outils: un handler par outil, aiguillés par _DISPATCH ----------------
+def _tc(text: str) -> list[TextContent]:
+    """Réponse texte d'un outil, sans validation Pydantic (champs toujours valides)."""
+    return [TextContent.model_construct(type="text", text=text)]
+
+async def _t_search(arguments: Any) -> Sequence[TextContent]:
+    query = arguments.get("query")
+    limit = arguments.get("limit", 5)
+    threshold = arguments.get("threshold", 0.3)
+    logger.info(f"🔍 Recherche: {query} (limit={limit}, threshold={threshold})")
+    results = get_search_engine().search(query=query, limit=limit, threshold=threshold)
+    if not results:
+        return _tc("Aucun résultat trouvé.")
+    header = f"🔍 Requête: {query}\n📊 {len(results)} résultats\n\n{'=' * 70}"
+    body = "\n".join(_format_result(r) for r in results)
+    return _tc(f"{header}\n{body}")
+
+async def _t_rag(arguments: Any) -> Sequence[TextContent]:
+    query = arguments.get("query")
+    limit = arguments.get("limit", 5)
+    threshold = arguments.get("threshold", 0.3)
+    logger.info(f"📚 Contexte RAG pour: {query}")
+    context = get_search_engine().get_context_for_rag(query=query, limit=limit, threshold=threshold)
+    return _tc(context)
+
+async def _t_stats(arguments: Any) -> Sequence[TextContent]:
+    logger.info("📊 Stats DB")
+    if _component(get_supabase_uploader_v2, "Uploader V2"):
+        stats = await asyncio.to_thread(_database_stats)
+    else:
+        return _tc("❌ Uploader V2 non initialisé.")
+    text = (
+        f"📊 STATISTIQUES DE LA BASE\n{'=' * 70}\n"
+        f"📁 Total documents : {stats.get('total_documents', 0)}\n"
+        f"📦 Total chunks    : {stats.get('total_chunks', 0)}\n"
+        f"📊 Moy. chunks/doc : {stats.get('avg_chunks_per_document', 0):.1f}\n"
+        f"📏 Taille moyenne  : {stats.get('avg_chunk_size', 0):.0f} caractères\n"
+        f"🕐 Date            : {stats.get('timestamp', 'N/A')}"
+    )
+    return _tc(text)
+
+async def _t_upload(arguments: Any) -> Sequence[TextContent]:
+    file_path = arguments.get("file_path")
+    if not file_path:
+        return _tc("❌ file_path est requis")
+    embedding_gen = _component(get_embedding_generator, "Générateur d'embeddings")
+    uploader_v2 = _component(get_supabase_uploader_v2, "Uploader V2")
+    if embedding_gen is None or uploader_v2 is None:
+        return _tc("❌ Composants d'upload non initialisés")
+    logger.info(f"📤 Upload: {file_path}")
+    try:
+        from process_v2 import process_single_file
+        result = process_single_file(
+            file_path=file_path,
+            embedding_gen=embedding_gen,
+            uploader=uploader_v2,
+            ocr_processor=_component(get_ocr_processor, "Azure OCR"),
+            upload=True,
+        )
+    except Exception as e:
+        logger.exception("Erreur upload")
+        return _tc(f"❌ Erreur upload:\n{str(e)}")
+
+    if result["status"] != "success":
+        return _tc(f"❌ Erreur upload:\n{result.get('error', 'Inconnue')}")
+
+    # Nouveau contenu: statistiques et recherches en cache périmées. L'upload
+    # a réussi: un échec ici ne doit pas être signalé comme un échec d'upload
     try:
-        if name == "search_documents":
-            query = arguments.get("query")
-            limit = arguments.get("limit", 5)
-            threshold = arguments.get("threshold", 0.3)
-            logger.info(f"🔍 Recherche: {query} (limit={limit}, threshold={threshold})")
-            results = search_engine.search(query=query, limit=limit, threshold=threshold)
-            if not results:
-                return [TextContent(type="text", text="Aucun résultat trouvé.")]
-            lines: list[str] = []
-            lines.append(f"🔍 Requête: {query}")
-            lines.append(f"📊 {len(results)} résultats\n")
-            lines.append("=" * 70)
-            for r in results:
-                lines.append(f"\n#{r['rank']} - {r['file_name']}")
-                lines.append(f"   Similarité: {r['similarity']:.2%}")
-                lines.append(f"   Chunk: {r['chunk_index']}")
-                lines.append("   Contenu:")
-                content = r["content"]
-                if len(content) > 800:
-                    content = content[:800] + "..."
-                for line in content.split("\n"):
-                    if line.strip():
-                        lines.append(f"   {line}")
-            return [TextContent(type="text", text="\n".join(lines))]
-
-        elif name == "get_context_for_rag":
-            query = arguments.get("query")
-            limit = arguments.get("limit", 5)
-            threshold = arguments.get("threshold", 0.3)
-            logger.info(f"📚 Contexte RAG pour: {query}")
-            context = search_engine.get_context_for_rag(query=query, limit=limit, threshold=threshold)
-            return [TextContent(type="text", text=context)]
-
-        elif name == "get_database_stats":
-            logger.info("📊 Stats DB")
-            if uploader_v2:
-                stats = uploader_v2.get_database_stats()
+        _database_stats.clear()
+        get_search_engine().cache.clear()
+    except Exception as e:
+        logger.warning(f"⚠️ Invalidation des caches après upload échouée: {e}")
+
+    out = []
+    out.append("✅ UPLOAD RÉUSSI")
+    out.append("=" * 70)
+    out.append(f"📄 Fichier             : {result['file_name']}")
+    out.append(f"📝 Texte extrait       : {result['full_text_length']} caractères")
+    out.append(f"🔢 Chunks créés        : {result['chunks_count']}")
+    out.append(f"🧠 Embeddings générés  : {result['embeddings_count']}")
+    out.append(f"⚙️ Méthode             : {result['method']}")
+    if result.get("page_count"):
+        out.append(f"📄 Pages               : {result['page_count']}")
+    return _tc("\n".join(out))
+
+async def _t_read(arguments: Any) -> Sequence[TextContent]:
+    file_path = arguments.get("file_path")
+    max_chars = arguments.get("max_chars", 10000)
+    if not file_path:
+        return _tc("❌ file_path est requis")
+    logger.info(f"📖 Lecture: {file_path}")
+    try:
+        # Lecture bornée dans un thread (ne bloque pas les autres clients SSE)
+        try:
+            content, truncated, file_size = await asyncio.to_thread(
+                read_text_prefix, file_path, max_chars
+            )
+        except FileNotFoundError:
+            return _tc(f"❌ Fichier introuvable: {file_path}")
+        file_name = Path(file_path).name
+        size_kb = file_size / 1024
+        out = []
+        out.append(f"📖 {file_name}")
+        out.append("=" * 70)
+        out.append(f"📍 {file_path}")
+        out.append(f"📊 {size_kb:.2f} KB")
+        out.append(f"📝 {len(content)} caractères")
+        if truncated:
+            out.append(f"⚠️ Contenu tronqué à {max_chars} caractères")
+        out.append("")
+        out.append(content)
+        return _tc("\n".join(out))
+    except Exception as e:
+        logger.exception("Erreur lecture")
+        return _tc(f"❌ Erreur lecture:\n{str(e)}")
+
+async def _t_write(arguments: Any) -> Sequence[TextContent]:
+    file_path = arguments.get("file_path")
+    content = arguments.get("content")
+    encoding = arguments.get("encoding", "utf-8")
+    if not file_path or content is None:
+        return _tc("❌ file_path et content sont requis")
+    logger.info(f"✍️ Écriture: {file_path}")
+    try:
+        # Écriture atomique dans un thread
+        _, file_size = await asyncio.to_thread(write_text_atomic, file_path, content, encoding)
+        size_kb = file_size / 1024
+        out = []
+        out.append("✅ FICHIER ÉCRIT")
+        out.append("=" * 70)
+        out.append(f"📄 {Path(file_path).name}")
+        out.append(f"📍 {file_path}")
+        out.append(f"📊 {size_kb:.2f} KB")
+        out.append(f"📝 {len(content)} caractères")
+        out.append(f"🔤 {encoding}")
+        return _tc("\n".join(out))
+    except Exception as e:
+        logger.exception("Erreur écriture")
+        return _tc(f"❌ Erreur écriture:\n{str(e)}")
+
+async def _t_list(arguments: Any) -> Sequence[TextContent]:
+    directory = arguments.get("directory")
+    pattern = arguments.get("pattern", "*")
+    recursive = arguments.get("recursive", False)
+    if not directory:
+        return _tc("❌ directory est requis")
+    logger.info(f"📂 Listage: {directory} (pattern={pattern}, recursive={recursive})")
+    try:
+        # Parcours os.scandir dans un thread (existence vérifiée par le premier scandir)
+        try:
+            files = await asyncio.to_thread(list_directory, directory, pattern, recursive)
+        except FileNotFoundError:
+            return _tc(f"❌ Dossier introuvable: {directory}")
+        except NotADirectoryError:
+            return _tc(f"❌ Chemin non dossier: {directory}")
+        out = []
+        out.append("📂 CONTENU")
+        out.append("=" * 70)
+        out.append(f"📍 {directory}")
+        out.append(f"🔍 {pattern}")
+        out.append(f"🔄 Récursif: {'Oui' if recursive else 'Non'}")
+        out.append(f"📊 {len(files)} fichier(s)")
+        out.append("")
+        for rel, size in files:
+            if size is not None:
+                out.append(f"📄 {rel} ({size / 1024:.2f} KB)")
             else:
-                return [TextContent(type="text", text="❌ Uploader V2 non initialisé.")]
-            out = []
-            out.append("📊 STATISTIQUES DE LA BASE")
-            out.append("=" * 70)
-            out.append(f"📁 Total documents : {stats.get('total_documents', 0)}")
-            out.append(f"📦 Total chunks    : {stats.get('total_chunks', 0)}")
-            out.append(f"📊 Moy. chunks/doc : {stats.get('avg_chunks_per_document', 0):.1f}")
-            out.append(f"📏 Taille moyenne  : {stats.get('avg_chunk_size', 0):.0f} caractères")
-            out.append(f"🕐 Date            : {stats.get('timestamp', 'N/A')}")
-            return [TextContent(type="text", text="\n".join(out))]
-
-        elif name == "upload_document":
-            file_path = arguments.get("file_path")
-            if not file_path:
-                return [TextContent(type="text", text="❌ file_path est requis")]
-            if embedding_gen is None or uploader_v2 is None:
-                return [TextContent(type="text", text="❌ Composants d'upload non initialisés")]
-            logger.info(f"📤 Upload: {file_path}")
-            try:
-                from process_v2 import process_single_file
-                result = process_single_file(
-                    file_path=file_path,
-                    embedding_gen=embedding_gen,
-                    uploader=uploader_v2,
-                    ocr_processor=ocr_processor,
-                    upload=True,
-                )
-                if result["status"] == "success":
-                    out = []
-                    out.append("✅ UPLOAD RÉUSSI")
-                    out.append("=" * 70)
-                    out.append(f"📄 Fichier             : {result['file_name']}")
-                    out.append(f"📝 Texte extrait       : {result['full_text_length']} caractères")
-                    out.append(f"🔢 Chunks créés        : {result['chunks_count']}")
-                    out.append(f"🧠 Embeddings générés  : {result['embeddings_count']}")
-                    out.append(f"⚙️ Méthode             : {result['method']}")
-                    if result.get("page_count"):
-                        out.append(f"📄 Pages               : {result['page_count']}")
-                    return [TextContent(type="text", text="\n".join(out))]
-                else:
-                    return [TextContent(type="text", text=f"❌ Erreur upload:\n{result.get('error', 'Inconnue')}")]
-            except Exception as e:
-                logger.exception("Erreur upload")
-                return [TextContent(type="text", text=f"❌ Erreur upload:\n{str(e)}")]
-
-        elif name == "read_file":
-            file_path = arguments.get("file_path")
-            max_chars = arguments.get("max_chars", 10000)
-            if not file_path:
-                return [TextContent(type="text", text="❌ file_path est requis")]
-            logger.info(f"📖 Lecture: {file_path}")
-            try:
-                if not os.path.exists(file_path):
-                    return [TextContent(type="text", text=f"❌ Fichier introuvable: {file_path}")]
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-                truncated = False
-                if len(content) > max_chars:
-                    content = content[:max_chars]
-                    truncated = True
-                file_name = Path(file_path).name
-                size_kb = os.path.getsize(file_path) / 1024
-                out = []
-                out.append(f"📖 {file_name}")
-                out.append("=" * 70)
-                out.append(f"📍 {file_path}")
-                out.append(f"📊 {size_kb:.2f} KB")
-                out.append(f"📝 {len(content)} caractères")
-                if truncated:
-                    out.append(f"⚠️ Contenu tronqué à {max_chars} caractères")
-                out.append("")
-                out.append(content)
-                return [TextContent(type="text", text="\n".join(out))]
-            except Exception as e:
-                logger.exception("Erreur lecture")
-                return [TextContent(type="text", text=f"❌ Erreur lecture:\n{str(e)}")]
-
-        elif name == "write_file":
-            file_path = arguments.get("file_path")
-            content = arguments.get("content")
-            encoding = arguments.get("encoding", "utf-8")
-            if not file_path or content is None:
-                return [TextContent(type="text", text="❌ file_path et content sont requis")]
-            logger.info(f"✍️ Écriture: {file_path}")
-            try:
-                Path(file_path).parent.mkdir(parents=True, exist_ok=True)
-                with open(file_path, "w", encoding=encoding) as f:
-                    f.write(content)
-                size_kb = os.path.getsize(file_path) / 1024
-                out = []
-                out.append("✅ FICHIER ÉCRIT")
-                out.append("=" * 70)
-                out.append(f"📄 {Path(file_path).name}")
-                out.append(f"📍 {file_path}")
-                out.append(f"📊 {size_kb:.2f} KB")
-                out.append(f"📝 {len(content)} caractères")
-                out.append(f"🔤 {encoding}")
-                return [TextContent(type="text", text="\n".join(out))]
-            except Exception as e:
-                logger.exception("Erreur écriture")
-                return [TextContent(type="text", text=f"❌ Erreur écriture:\n{str(e)}")]
-
-        elif name == "list_files":
-            directory = arguments.get("directory")
-            pattern = arguments.get("pattern", "*")
-            recursive = arguments.get("recursive", False)
-            if not directory:
-                return [TextContent(type="text", text="❌ directory est requis")]
-            logger.info(f"📂 Listage: {directory} (pattern={pattern}, recursive={recursive})")
-            try:
-                import fnmatch
-                if not os.path.exists(directory):
-                    return [TextContent(type="text", text=f"❌ Dossier introuvable: {directory}")]
-                if not os.path.isdir(directory):
-                    return [TextContent(type="text", text=f"❌ Chemin non dossier: {directory}")]
-                files: list[tuple[str, str]] = []
-                base = Path(directory)
-                if recursive:
-                    for root, _dirs, names in os.walk(directory):
-                        for name in names:
-                            if fnmatch.fnmatch(name, pattern):
-                                full = os.path.join(root, name)
-                                rel = os.path.relpath(full, directory)
-                                files.append((rel, full))
-                else:
-                    for item in base.iterdir():
-                        if item.is_file() and fnmatch.fnmatch(item.name, pattern):
-                            files.append((item.name, str(item)))
-                files.sort()
-                out = []
-                out.append("📂 CONTENU")
-                out.append("=" * 70)
-                out.append(f"📍 {directory}")
-                out.append(f"🔍 {pattern}")
-                out.append(f"🔄 Récursif: {'Oui' if recursive else 'Non'}")
-                out.append(f"📊 {len(files)} fichier(s)")
-                out.append("")
-                for rel, full in files:
-                    try:
-                        size_kb = os.path.getsize(full) / 1024
-                        out.append(f"📄 {rel} ({size_kb:.2f} KB)")
-                    except Exception:
-                        out.append(f"📄 {rel}")
-                return [TextContent(type="text", text="\n".join(out))]
-            except Exception as e:
-                logger.exception("Erreur listage")
-                return [TextContent(type="text", text=f"❌ Erreur listage:\n{str(e)}")]
+                out.append(f"📄 {rel}")
+        return _tc("\n".join(out))
+    except Exception as e:
+        logger.exception("Erreur listage")
+        return _tc(f"❌ Erreur listage:\n{str(e)}")
+
+_DISPATCH = {
+    "search_documents": _t_search,
+    "get_context_for_rag": _t_rag,
+    "get_database_stats": _t_stats,
+    "upload_document": _t_upload,
+    "read_file": _t_read,
+    "write_file": _t_write,
+    "list_files": _t_list,
+}
 
-        else:
-            return [TextContent(type="text", text=f"Outil inconnu: {name}")]
+@mcp_server.call_tool()
+async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
+    handler = _DISPATCH.get(name)
+    if handler is None:
+        return _tc(f"Outil inconnu: {name}")
+    try:
+        return await handler(arguments)
     except Exception as e:
         logger.exception("Erreur call_tool")
-        return [TextContent(type="text", text=f"Erreur: {str(e)}")]
+        return _tc(f"Erreur: {str(e)}")
 
 # -----------------------------------------------------------------------------
-# HTTP app (FastAPI) + SSE (Starlette)
+# HTTP app (Starlette): endpoints utilitaires + SSE
 # -----------------------------------------------------------------------------
-http_app = FastAPI()
-http_app.router.redirect_slashes = False  # ne pas réécrire /mcp -> /mcp/
+# Réponses constantes, construites une seule fois
+_CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "*",
+    "Access-Control-Allow-Methods": "GET,POST,HEAD,OPTIONS",
+}
+_HEAD_RESPONSE = Response(status_code=200)
+_PREFLIGHT_RESPONSE = Response(status_code=204, headers=_CORS_HEADERS)
+_ROOT_REDIRECT = RedirectResponse(url="/mcp/", status_code=307)
+_HEALTH_RESPONSE = Response(orjson.dumps({"ok": True}), media_type="application/json")
+_MCP_ENTRY_RESPONSES = {
+    path: Response(orjson.dumps({"ok": True, "endpoint": path}), media_type="application/json")
+    for path in ("/mcp", "/mcp/")
+}
+_SSE_PREFLIGHT_RESPONSE = Response(
+    status_code=204,
+    headers={**_CORS_HEADERS, "Access-Control-Max-Age": "600"},
+)
+# Indique que l'endpoint est vivant; le flux SSE utilise GET
+_SSE_HEAD_RESPONSE = Response(status_code=200, headers={"Content-Type": "text/event-stream"})
 
-@http_app.api_route("/mcp", methods=["GET", "POST", "HEAD", "OPTIONS"])
-async def mcp_entry(request: Request):
-    if request.method == "HEAD":
-        return Response(status_code=200)
-    if request.method == "OPTIONS":
-        return Response(
-            status_code=204,
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*",
-                "Access-Control-Allow-Methods": "GET,POST,HEAD,OPTIONS",
-            },
-        )
-    return JSONResponse({"ok": True, "endpoint": "/mcp"})
 
-@http_app.api_route("/mcp/", methods=["GET", "POST", "HEAD", "OPTIONS"])
-async def mcp_entry_slash(request: Request):
+async def mcp_entry(request: Request):
     if request.method == "HEAD":
-        return Response(status_code=200)
+        return _HEAD_RESPONSE
     if request.method == "OPTIONS":
-        return Response(
-            status_code=204,
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*",
-                "Access-Control-Allow-Methods": "GET,POST,HEAD,OPTIONS",
-            },
-        )
-    return JSONResponse({"ok": True, "endpoint": "/mcp/"})
+        return _PREFLIGHT_RESPONSE
+    return _MCP_ENTRY_RESPONSES[request.url.path]
 
-@http_app.api_route("/", methods=["GET", "POST", "HEAD", "OPTIONS"])
-async def root_redirect():
-    return RedirectResponse(url="/mcp/", status_code=307)
+async def root_redirect(_: Request):
+    return _ROOT_REDIRECT
 
-@http_app.get("/health")
-def health():
-    return {"ok": True}
+async def health(_: Request):
+    return _HEALTH_RESPONSE
 
 # Transport SSE MCP
-async def handle_sse(request):
+async def handle_sse(request: Request):
+    # OPTIONS/HEAD pour les clients stricts (Claude Desktop, certains proxies)
+    if request.method == "OPTIONS":
+        return _SSE_PREFLIGHT_RESPONSE
+    if request.method == "HEAD":
+        return _SSE_HEAD_RESPONSE
+
     async with SseServerTransport("/messages") as transport:
         await mcp_server.run(
             transport.read_stream,
@@ -448,37 +467,55 @@ async def handle_sse(request):
         )
     return Response(status_code=200)
 
-# OPTIONS/HEAD for /sse for stricter clients (Claude Desktop, some proxies)
-@http_app.api_route("/sse", methods=["OPTIONS"])
-async def sse_options(_: Request):
-    return Response(
-        status_code=204,
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "*",
-            "Access-Control-Allow-Methods": "GET,POST,HEAD,OPTIONS",
-            "Access-Control-Max-Age": "600",
-        },
-    )
+def _warm_search_engine() -> None:
+    """Crée le moteur de recherche et ouvre la connexion OpenAI (TLS, keep-alive)."""
+    get_search_engine().embedding_generator.generate_embedding("warmup")
+
+
+async def _warmup() -> None:
+    """
+    Préchauffe le moteur de recherche et le cache des statistiques, pour que le
+    premier list_resources / search_documents n'en paie pas le coût.
+    """
+    calls = [asyncio.to_thread(_warm_search_engine)]
+    if _component(get_supabase_uploader_v2, "Uploader V2"):
+        calls.append(asyncio.to_thread(_database_stats))
 
-@http_app.api_route("/sse", methods=["HEAD"])
-async def sse_head(_: Request):
-    # Indique que l'endpoint est vivant; le flux SSE utilise GET
-    return Response(status_code=200, headers={"Content-Type": "text/event-stream"})
+    for result in await asyncio.gather(*calls, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.warning(f"⚠️ Préchauffage incomplet: {result}")
+
+
+@asynccontextmanager
+async def lifespan(_: Starlette):
+    # En tâche de fond: le serveur accepte les connexions sans attendre
+    warmup = asyncio.create_task(_warmup())
+    yield
+    warmup.cancel()
+
+_ALL_METHODS = ["GET", "POST", "HEAD", "OPTIONS"]
 
-# ASGI composite: /sse (SSE) + / (FastAPI)
 starlette_app = Starlette(
+    lifespan=lifespan,
     routes=[
-        Route("/sse", handle_sse),
-        Mount("/", app=http_app),
+        Route("/sse", handle_sse, methods=["GET", "HEAD", "OPTIONS"]),
+        Route("/mcp", mcp_entry, methods=_ALL_METHODS),
+        Route("/mcp/", mcp_entry, methods=_ALL_METHODS),
+        Route("/health", health, methods=["GET"]),
+        Route("/", root_redirect, methods=_ALL_METHODS),
     ]
 )
+starlette_app.router.redirect_slashes = False  # ne pas réécrire /mcp -> /mcp/
 
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
 async def main():
     logger.info("🚀 Démarrage du serveur MCP HTTP/SSE de recherche documentaire")
+    # Pool borné pour les appels bloquants (fichiers, stats) lancés via asyncio.to_thread
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=32, thread_name_prefix="mcp-io")
+    )
     port = int(os.getenv("PORT", "3000"))
     logger.info(f"🌐 Transport: SSE (/sse) + HTTP utilitaires (/mcp, /health) sur le port {port}")
     config = uvicorn.Config(
@@ -486,11 +523,19 @@ async def main():
         host="0.0.0.0",
         port=port,
         log_level="info",
+        http=HTTP_IMPLEMENTATION,
     )
     server = uvicorn.Server(config)
     await server.serve()
 
 if __name__ == "__main__":
+    # Boucle libuv (optionnelle, hors Windows) : surcoût par await plus faible
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 import asyncio
+import io
 import json
 import os
 import logging
 from pathlib import Path
 from typing import Any, Dict
 
+import orjson
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -18,6 +21,7 @@ from src.supabase_client import SupabaseUploader
 from src.embeddings import EmbeddingGenerator
 from src.supabase_client_v2 import SupabaseUploaderV2
 from src.azure_ocr import AzureOCRProcessor
+from src.file_processor import indent_lines, list_directory, read_text_prefix
 from src.ultimate_tools import UltimateTools
 from src.mcp_real_estate import (
     AgenticRAGRouter,
@@ -31,7 +35,6 @@ from src.mcp_real_estate import (
 # ASGI / HTTP
 from starlette.applications import Starlette
 from starlette.routing import Mount
-from starlette.responses import JSONResponse
 from starlette.requests import Request
 from starlette.responses import Response
 from starlette.middleware.cors import CORSMiddleware
@@ -92,19 +95,24 @@ def search_documents(query: str, limit: int = 5, threshold: float = 0.3) -> str:
     results = search.search(query=query, limit=limit, threshold=threshold)
     if not results:
         return "Aucun résultat."
-    lines = [f"🔍 Requête: {query}", f"📊 {len(results)} résultats", "=" * 60]
+    # Un seul tampon; lignes vides retirées et contenu indenté par regex
+    buf = io.StringIO()
+    write = buf.write
+    write(f"🔍 Requête: {query}\n📊 {len(results)} résultats\n{'=' * 60}")
     for r in results:
         content = r["content"]
         if len(content) > 800:
             content = content[:800] + "..."
-        lines += [
-            f"\n#{r['rank']} - {r['file_name']}",
-            f"   Similarité: {r['similarity']:.2%}",
-            f"   Chunk: {r['chunk_index']}",
-            "   Contenu:",
-            *[f"   {ln}" for ln in content.splitlines() if ln.strip()],
-        ]
-    return "\n".join(lines)
+        content = indent_lines(content)
+        write(
+            f"\n\n#{r['rank']} - {r['file_name']}\n"
+            f"   Similarité: {r['similarity']:.2%}\n"
+            f"   Chunk: {r['chunk_index']}\n"
+            "   Contenu:"
+        )
+        if content:
+            write("\n" + content)
+    return buf.getvalue()
 
 @mcp.tool()
 def get_context_for_rag(query: str, limit: int = 5, threshold: float = 0.3) -> str:
@@ -166,15 +174,13 @@ def read_file(file_path: str, max_chars: int = 10000) -> str:
     """Lecture (aperçu) d'un fichier texte."""
     if not file_path:
         return "❌ file_path requis"
-    if not os.path.exists(file_path):
+    try:
+        # Lecture bornée: seuls les premiers octets utiles sont lus
+        content, is_truncated, file_size = read_text_prefix(file_path, max_chars)
+    except FileNotFoundError:
         return f"❌ Fichier introuvable: {file_path}"
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        content = f.read()
-    truncated = ""
-    if len(content) > max_chars:
-        content = content[:max_chars]
-        truncated = f"\n⚠️ Contenu tronqué à {max_chars} caractères"
-    size_kb = os.path.getsize(file_path) / 1024
+    truncated = f"\n⚠️ Contenu tronqué à {max_chars} caractères" if is_truncated else ""
+    size_kb = file_size / 1024
     return f"📖 {Path(file_path).name} ({size_kb:.2f} KB){truncated}\n\n{content}"
 
 @mcp.tool()
@@ -196,31 +202,18 @@ def list_files(directory: str, pattern: str = "*", recursive: bool = False) -> s
     """Liste les fichiers d'un dossier (pattern + récursif)."""
     if not directory:
         return "❌ directory requis"
-    import fnmatch
-    if not os.path.exists(directory):
+    try:
+        # Un seul parcours os.scandir: taille issue du stat du DirEntry
+        files = list_directory(directory, pattern, recursive)
+    except FileNotFoundError:
         return f"❌ Dossier introuvable: {directory}"
-    if not os.path.isdir(directory):
+    except NotADirectoryError:
         return f"❌ Chemin non dossier: {directory}"
-    files = []
-    base = Path(directory)
-    if recursive:
-        for root, _dirs, names in os.walk(directory):
-            for name in names:
-                if fnmatch.fnmatch(name, pattern):
-                    full = os.path.join(root, name)
-                    rel = os.path.relpath(full, directory)
-                    files.append((rel, full))
-    else:
-        for item in base.iterdir():
-            if item.is_file() and fnmatch.fnmatch(item.name, pattern):
-                files.append((item.name, str(item)))
-    files.sort()
     out = [f"📂 {directory} | {len(files)} fichier(s)\n"]
-    for rel, full in files:
-        try:
-            size_kb = os.path.getsize(full) / 1024
-            out.append(f"📄 {rel} ({size_kb:.2f} KB)")
-        except Exception:
+    for rel, size in files:
+        if size is not None:
+            out.append(f"📄 {rel} ({size / 1024:.2f} KB)")
+        else:
             out.append(f"📄 {rel}")
     return "\n".join(out)
 
@@ -229,7 +222,8 @@ def list_files(directory: str, pattern: str = "*", recursive: bool = False) -> s
 # -----------------------------------------------------------------------------
 
 def format_result(result: Dict[str, Any]) -> str:
-    return json.dumps(result, ensure_ascii=False, indent=2)
+    # orjson: JSON équivalent à json.dumps(ensure_ascii=False, indent=2), sérialisé en C
+    return orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
 
 
 def _merge_params(payload: Any, kwargs: Dict[str, Any]) -> Dict[str, Any]:
@@ -590,15 +584,19 @@ for placeholder_name in PLACEHOLDER_METHODS:
 # -----------------------------------------------------------------------------
 app = mcp.streamable_http_app()
 
+# Réponses constantes: sérialisées une seule fois à l'import
+_HEALTH_BYTES = orjson.dumps({"ok": True})
+_ROOT_BYTES = orjson.dumps({"ok": True, "endpoint": "/mcp"})
+
 # Ajouter /health et / directement sur l'app MCP (sans sous-app/mount -> garde lifespan)
 try:
     @app.route("/health")
     async def health(_: Request):
-        return JSONResponse({"ok": True})
+        return Response(_HEALTH_BYTES, media_type="application/json")
 
     @app.route("/", methods=["GET", "HEAD"])
     async def root_ok(_: Request):
-        return JSONResponse({"ok": True, "endpoint": "/mcp"})
+        return Response(_ROOT_BYTES, media_type="application/json")
 except Exception:
     # Si l'objet retourné ne supporte pas .route, on ignore (le /mcp reste fonctionnel)
     pass
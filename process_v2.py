@@ -11,7 +11,7 @@ import sys
 import argparse
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
@@ -119,11 +119,16 @@ def process_single_file(
     embedding_gen: EmbeddingGenerator,
     uploader: SupabaseUploaderV2,
     ocr_processor: Optional[AzureOCRProcessor] = None,
-    upload: bool = True
+    upload: bool = True,
+    embed_texts: Optional[Callable[[List[str]], List[List[float]]]] = None
 ) -> Dict:
     """
     Traite un seul fichier avec la nouvelle architecture.
 
+    Args:
+        embed_texts: Fonction d'embedding à utiliser à la place de
+            embedding_gen.generate_embeddings_batch (ex. batcher partagé du serveur MCP)
+
     Returns:
         Dict avec les résultats du traitement
     """
@@ -151,7 +156,10 @@ def process_single_file(
 
         # 3. Génération des embeddings
         print(f"🧠 Génération de {len(chunks)} embeddings...")
-        embeddings = embedding_gen.generate_embeddings_batch(chunks, batch_size=100)
+        if embed_texts is not None:
+            embeddings = embed_texts(chunks)
+        else:
+            embeddings = embedding_gen.generate_embeddings_batch(chunks, batch_size=100)
 
         print(f"✅ {len(embeddings)} embeddings générés")
 
@@ -39,6 +39,9 @@ RETURNS TABLE (
     importance_score numeric
 )
 LANGUAGE plpgsql
+STABLE
+SET hnsw.iterative_scan = relaxed_order
+SET hnsw.ef_search = 100
 AS $$
 BEGIN
     RETURN QUERY
@@ -70,7 +73,7 @@ BEGIN
     INNER JOIN
         documents_full d ON c.document_id = d.id
     WHERE
-        1 - (c.embedding <=> query_embedding) > match_threshold
+        (c.embedding <=> query_embedding) < 1 - match_threshold
         AND (filter_type_document IS NULL OR d.type_document = filter_type_document)
         AND (filter_categorie IS NULL OR d.categorie = filter_categorie)
         AND (filter_commune IS NULL OR d.commune = filter_commune)
@@ -79,8 +82,7 @@ BEGIN
         AND (min_date IS NULL OR d.date_document >= min_date)
         AND (max_date IS NULL OR d.date_document <= max_date)
     ORDER BY
-        similarity DESC,
-        c.importance_score DESC NULLS LAST
+        c.embedding <=> query_embedding
     LIMIT match_count;
 END;
 $$;
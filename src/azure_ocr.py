@@ -3,18 +3,51 @@ Module pour l'extraction de texte via Azure OCR
 """
 
 import os
+import asyncio
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple
 from pathlib import Path
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from azure.ai.formrecognizer import DocumentAnalysisClient
+from azure.ai.formrecognizer.aio import DocumentAnalysisClient as AsyncDocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
 from PIL import Image
 import pdf2image
 
 logger = logging.getLogger(__name__)
 
+SUPPORTED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'}
+SUPPORTED_EXTENSIONS = ('.pdf',) + tuple(sorted(SUPPORTED_IMAGE_EXTENSIONS))
+
+
+def iter_supported(root: str, exts: Tuple[str, ...] = SUPPORTED_EXTENSIONS) -> Iterator[str]:
+    """
+    Parcourt récursivement un répertoire et renvoie les chemins des fichiers
+    dont l'extension est supportée.
+
+    Utilise os.scandir (le type d'entrée vient du répertoire, sans stat() par
+    fichier) et filtre sur le nom, sans construire d'objets Path.
+
+    Args:
+        root: Répertoire racine
+        exts: Extensions acceptées (en minuscules)
+
+    Yields:
+        Chemins des fichiers trouvés
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(exts):
+                        yield entry.path
+        except OSError as e:
+            logger.warning(f"Répertoire illisible ignoré: {e}")
+
 
 class AzureOCRProcessor:
     """
@@ -81,38 +114,7 @@ class AzureOCRProcessor:
         result = poller.result()
         logger.info("Réponse Azure reçue !")
 
-        # Extraire le texte complet et nettoyer les caractères null
-        full_text = result.content
-        if full_text:
-            full_text = full_text.replace('\u0000', '').replace('\x00', '')
-
-        # Extraire les pages et leurs contenus
-        pages = []
-        for page in result.pages:
-            page_data = {
-                "page_number": page.page_number,
-                "width": page.width,
-                "height": page.height,
-                "unit": page.unit,
-                "lines": []
-            }
-
-            # Extraire les lignes de texte
-            if hasattr(page, 'lines'):
-                for line in page.lines:
-                    page_data["lines"].append({
-                        "content": line.content,
-                        "polygon": line.polygon if hasattr(line, 'polygon') else None
-                    })
-
-            pages.append(page_data)
-
-        return {
-            "file_path": image_path,
-            "full_text": full_text,
-            "pages": pages,
-            "page_count": len(pages)
-        }
+        return self._build_result(image_path, result, include_unit=True)
 
     def extract_text_from_pdf(
         self,
@@ -145,21 +147,43 @@ class AzureOCRProcessor:
         result = poller.result()
         logger.info("Réponse Azure reçue !")
 
+        return self._build_result(pdf_path, result)
+
+    @staticmethod
+    def _build_result(
+        file_path: str,
+        result,
+        include_unit: bool = False
+    ) -> Dict[str, any]:
+        """
+        Convertit un résultat Azure (AnalyzeResult) en dict.
+
+        Args:
+            file_path: Chemin du fichier analysé
+            result: Résultat renvoyé par le poller Azure
+            include_unit: Inclure l'unité de mesure des pages (images)
+
+        Returns:
+            Dict contenant le texte extrait et les métadonnées
+        """
         # Extraire le texte complet et nettoyer les caractères null
         full_text = result.content
         if full_text:
             full_text = full_text.replace('\u0000', '').replace('\x00', '')
 
-        # Extraire les pages
+        # Extraire les pages et leurs contenus
         pages = []
         for page in result.pages:
             page_data = {
                 "page_number": page.page_number,
                 "width": page.width,
                 "height": page.height,
-                "lines": []
             }
+            if include_unit:
+                page_data["unit"] = page.unit
+            page_data["lines"] = []
 
+            # Extraire les lignes de texte
             if hasattr(page, 'lines'):
                 for line in page.lines:
                     page_data["lines"].append({
@@ -170,7 +194,7 @@ class AzureOCRProcessor:
             pages.append(page_data)
 
         return {
-            "file_path": pdf_path,
+            "file_path": file_path,
             "full_text": full_text,
             "pages": pages,
             "page_count": len(pages)
@@ -201,11 +225,109 @@ class AzureOCRProcessor:
 
         if ext == '.pdf':
             return self.extract_text_from_pdf(file_path, model_id=model_id)
-        elif ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']:
+        elif ext in SUPPORTED_IMAGE_EXTENSIONS:
             return self.extract_text_from_image(file_path, model_id=model_id)
         else:
             raise ValueError(f"Type de fichier non supporté: {ext}")
 
+    def async_client(self) -> AsyncDocumentAnalysisClient:
+        """
+        Crée un client Azure asynchrone.
+
+        À utiliser comme context manager (`async with`) à l'intérieur de la
+        boucle asyncio, et à partager entre toutes les analyses concurrentes.
+        """
+        return AsyncDocumentAnalysisClient(
+            endpoint=self.endpoint,
+            credential=AzureKeyCredential(self.key)
+        )
+
+    async def process_file_async(
+        self,
+        file_path: str,
+        client: Optional[AsyncDocumentAnalysisClient] = None,
+        model_id: str = "prebuilt-read"
+    ) -> Dict[str, any]:
+        """
+        Version asynchrone de `process_file`: l'attente du poller Azure ne
+        bloque pas la boucle, plusieurs fichiers peuvent être analysés en
+        parallèle via `asyncio.gather`.
+
+        Args:
+            file_path: Chemin vers le fichier
+            client: Client asynchrone partagé (un client temporaire sinon)
+            model_id: Modèle Azure à utiliser
+
+        Returns:
+            Dict contenant le texte extrait et les métadonnées
+        """
+        path = Path(file_path)
+
+        if not path.exists():
+            raise FileNotFoundError(f"Fichier non trouvé: {file_path}")
+
+        ext = path.suffix.lower()
+        if ext != '.pdf' and ext not in SUPPORTED_IMAGE_EXTENSIONS:
+            raise ValueError(f"Type de fichier non supporté: {ext}")
+
+        if client is None:
+            async with self.async_client() as client:
+                return await self._analyze_async(client, file_path, model_id, ext != '.pdf')
+
+        return await self._analyze_async(client, file_path, model_id, ext != '.pdf')
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def _analyze_async(
+        self,
+        client: AsyncDocumentAnalysisClient,
+        file_path: str,
+        model_id: str,
+        include_unit: bool
+    ) -> Dict[str, any]:
+        """Envoie un fichier à Azure et attend le résultat sans bloquer la boucle."""
+        logger.debug(f"Extraction OCR (async) de: {file_path}")
+        with open(file_path, "rb") as f:
+            poller = await client.begin_analyze_document(
+                model_id=model_id,
+                document=f
+            )
+            result = await poller.result()
+
+        return self._build_result(file_path, result, include_unit=include_unit)
+
+    async def process_files_async(
+        self,
+        file_paths: List[str],
+        concurrency: int = 4,
+        model_id: str = "prebuilt-read"
+    ) -> List[Optional[Dict[str, any]]]:
+        """
+        Analyse plusieurs fichiers en parallèle avec un seul client asynchrone.
+
+        Args:
+            file_paths: Chemins des fichiers
+            concurrency: Nombre maximal d'analyses Azure simultanées
+            model_id: Modèle Azure à utiliser
+
+        Returns:
+            Résultats OCR alignés sur `file_paths` (None en cas d'erreur)
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async with self.async_client() as client:
+            async def run(file_path: str) -> Optional[Dict[str, any]]:
+                async with semaphore:
+                    try:
+                        return await self.process_file_async(file_path, client, model_id)
+                    except Exception as e:
+                        logger.error(f"Erreur lors du traitement de {file_path}: {e}")
+                        return None
+
+            return await asyncio.gather(*(run(file_path) for file_path in file_paths))
+
     def process_directory(
         self,
         directory_path: str,
@@ -226,19 +348,9 @@ class AzureOCRProcessor:
         if not directory.exists() or not directory.is_dir():
             raise ValueError(f"Répertoire invalide: {directory_path}")
 
-        supported_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'}
-        files = [
-            f for f in directory.rglob('*')
-            if f.is_file() and f.suffix.lower() in supported_extensions
-        ]
-
-        results = []
-        for file_path in files:
-            try:
-                result = self.process_file(str(file_path), model_id=model_id)
-                results.append(result)
-                logger.info(f"Traité avec succès: {file_path}")
-            except Exception as e:
-                logger.error(f"Erreur lors du traitement de {file_path}: {e}")
-
-        return results
+        files = list(iter_supported(str(directory)))
+
+        # Analyses Azure en parallèle (les erreurs sont journalisées)
+        results = asyncio.run(self.process_files_async(files, model_id=model_id))
+
+        return [result for result in results if result is not None]
@@ -0,0 +1,96 @@
+"""
+Fabriques de clients partagés (OCR, embeddings, Supabase, recherche)
+
+Chaque client est créé une seule fois par processus et réutilisé, afin de
+ne pas refaire l'authentification et les handshakes TLS à chaque usage.
+Le module OCR (SDK Azure, Pillow, pdf2image) n'est importé qu'au premier
+appel de get_ocr_processor: les processus qui ne font que de la recherche
+n'en paient ni le temps de chargement ni la mémoire.
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+import httpx
+
+from .embeddings import EmbeddingGenerator
+from .semantic_cache import SemanticCache
+from .semantic_search import SemanticSearchEngine
+from .supabase_client import SupabaseUploader
+from .supabase_client_v2 import SupabaseUploaderV2
+
+if TYPE_CHECKING:
+    from .azure_ocr import AzureOCRProcessor
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """
+    Client httpx partagé: HTTP/2 et pool de connexions keep-alive. Les
+    connexions inactives restent ouvertes 60 s (5 s par défaut dans httpx),
+    pour que des appels MCP espacés ne refassent pas le handshake TLS.
+    """
+    return httpx.Client(
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=64,
+            max_keepalive_connections=32,
+            keepalive_expiry=60.0
+        )
+    )
+
+
+@lru_cache(maxsize=1)
+def get_ocr_processor(
+    endpoint: Optional[str] = None,
+    key: Optional[str] = None
+) -> "AzureOCRProcessor":
+    """Processeur OCR Azure partagé (module importé au premier appel)."""
+    from .azure_ocr import AzureOCRProcessor
+    return AzureOCRProcessor(endpoint=endpoint, key=key)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_generator(
+    api_key: Optional[str] = None,
+    model: str = "text-embedding-3-small"
+) -> EmbeddingGenerator:
+    """Générateur d'embeddings partagé (client OpenAI sur le client httpx commun)."""
+    return EmbeddingGenerator(
+        api_key=api_key,
+        model=model,
+        http_client=get_http_client()
+    )
+
+
+@lru_cache(maxsize=1)
+def get_supabase_uploader(
+    url: Optional[str] = None,
+    key: Optional[str] = None
+) -> SupabaseUploader:
+    """Client Supabase partagé."""
+    return SupabaseUploader(url=url, key=key)
+
+
+@lru_cache(maxsize=1)
+def get_supabase_uploader_v2(
+    url: Optional[str] = None,
+    key: Optional[str] = None
+) -> SupabaseUploaderV2:
+    """Client Supabase V2 partagé (documents_full + chunks)."""
+    return SupabaseUploaderV2(url=url, key=key)
+
+
+@lru_cache(maxsize=1)
+def get_search_engine() -> SemanticSearchEngine:
+    """
+    Moteur de recherche partagé, sur les clients embeddings et Supabase communs.
+    Les résultats des requêtes identiques ou quasi identiques (cosinus >= 0.98)
+    sont réutilisés pendant 5 minutes.
+    """
+    return SemanticSearchEngine(
+        embedding_generator=get_embedding_generator(),
+        supabase_uploader=get_supabase_uploader(),
+        cache=SemanticCache(maxsize=256, similarity=0.98, ttl=300)
+    )
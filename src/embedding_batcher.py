@@ -0,0 +1,112 @@
+"""
+Regroupement des demandes d'embeddings concurrentes
+
+Les textes soumis en même temps (requêtes de recherche, chunks de plusieurs
+uploads) sont collectés pendant une courte fenêtre puis envoyés en un seul
+appel d'embeddings: N appels OpenAI deviennent ceil(N / max_items).
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Batcher d'embeddings sur la boucle asyncio.
+
+    La tâche de fond est créée au premier appel de `embed`, sur la boucle
+    courante. Chaque texte reçoit son embedding via une Future; les textes
+    vides ne sont pas envoyés et reçoivent `[]` (résultats alignés sur
+    l'entrée, comme `generate_embeddings_batch`).
+
+    Les appels d'embeddings passent par des threads dédiés et non par l'exécuteur
+    par défaut: des appelants bloqués dans `embed_from_thread` peuvent occuper
+    tous les threads de ce dernier, et le batch ne partirait jamais.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        max_items: int = 128,
+        window: float = 0.02
+    ):
+        """
+        Args:
+            embed_batch: Fonction bloquante qui encode une liste de textes
+                (exécutée dans un thread)
+            max_items: Nombre maximum de textes par appel
+            window: Durée maximale d'attente des textes suivants (secondes)
+        """
+        self.embed_batch = embed_batch
+        self.max_items = max_items
+        self.window = window
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="embed-batch")
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Envoie des textes au batcher et attend leurs embeddings."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(self._queue))
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in texts]
+        for text, future in zip(texts, futures):
+            if text and text.strip():
+                self._queue.put_nowait((text, future))
+            else:
+                future.set_result([])
+
+        return list(await asyncio.gather(*futures))
+
+    def embed_from_thread(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        texts: List[str]
+    ) -> List[List[float]]:
+        """Version bloquante de `embed`, pour du code exécuté dans un thread."""
+        return asyncio.run_coroutine_threadsafe(self.embed(texts), loop).result()
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        """
+        Regroupe les textes en attente pendant au plus `window` secondes ou
+        `max_items` textes, les trie par longueur décroissante et les encode
+        en un seul appel.
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            items = [await queue.get()]
+            deadline = loop.time() + self.window
+
+            while len(items) < self.max_items:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items.sort(key=lambda item: len(item[0]), reverse=True)
+            texts = [text for text, _ in items]
+
+            try:
+                embeddings = await loop.run_in_executor(self._executor, self.embed_batch, texts)
+                if len(embeddings) != len(items):
+                    raise RuntimeError(f"{len(embeddings)} embeddings reçus pour {len(items)} textes")
+            except Exception as e:
+                logger.error(f"❌ Erreur batch d'embeddings: {e}")
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(items, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
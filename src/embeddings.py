@@ -3,16 +3,217 @@ Module pour générer des embeddings via OpenAI
 """
 
 import os
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Iterable, Tuple
 import time
 from tenacity import retry, stop_after_attempt, wait_exponential
 
-from openai import OpenAI
+import httpx
+import numpy as np
+import orjson
+from openai import AsyncOpenAI, OpenAI
 from .chunking_config import chunking_manager, get_chunking_params
+from .semantic_cache import CACHE_DIR
 
 logger = logging.getLogger(__name__)
 
+# Limites de l'endpoint embeddings d'OpenAI (entrées et tokens par requête)
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 250_000
+MAX_TEXT_LENGTH = 8000
+
+
+DEFAULT_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or str(CACHE_DIR / "embeddings.sqlite3")
+
+
+def approx_tokens(text: str) -> int:
+    """Estimation grossière du nombre de tokens (~4 caractères par token)."""
+    return len(text) // 4 + 1
+
+
+def to_halfvec_literal(vector: List[float]) -> Optional[str]:
+    """
+    Convertit un embedding en littéral pgvector `halfvec` (float16).
+
+    Chaque composante est arrondie en float16 et écrite sous sa forme la plus
+    courte: environ deux fois moins d'octets sur le réseau qu'en float32.
+
+    Args:
+        vector: Embedding float32
+
+    Returns:
+        Littéral '[x1,x2,...]' ou None si l'embedding est vide
+    """
+    if not vector:
+        return None
+    half = np.asarray(vector, dtype=np.float32).astype(np.float16)
+    return "[" + ",".join(map(str, half)) + "]"
+
+
+def save_embeddings(output_dir: str, stem: str, embeddings_data: List[Dict]) -> Tuple[Path, Path]:
+    """
+    Sauvegarde les résultats d'un document en deux fichiers: les métadonnées
+    (`{stem}.meta.json`) et les vecteurs float32 (`{stem}.vecs.npz`).
+
+    Args:
+        output_dir: Répertoire de sortie
+        stem: Nom de base des fichiers
+        embeddings_data: Résultats de `EmbeddingGenerator.build_results`
+
+    Returns:
+        Tuple (chemin des métadonnées, chemin des vecteurs)
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    meta_file = output_path / f"{stem}.meta.json"
+    vecs_file = output_path / f"{stem}.vecs.npz"
+
+    meta = [{k: v for k, v in item.items() if k != "embedding"} for item in embeddings_data]
+    meta_file.write_bytes(orjson.dumps(meta))
+
+    # Les embeddings en échec ([]) sont remplacés par des zéros et marqués invalides
+    dim = next((len(item["embedding"]) for item in embeddings_data if len(item["embedding"])), 0)
+    vecs = np.zeros((len(embeddings_data), dim), dtype=np.float32)
+    valid = np.zeros(len(embeddings_data), dtype=bool)
+    for i, item in enumerate(embeddings_data):
+        if len(item["embedding"]):
+            vecs[i] = item["embedding"]
+            valid[i] = True
+    np.savez_compressed(vecs_file, vecs=vecs, valid=valid)
+
+    return meta_file, vecs_file
+
+
+def load_embeddings(output_dir: str, stem: str) -> List[Dict]:
+    """
+    Relit les résultats écrits par `save_embeddings`.
+
+    Args:
+        output_dir: Répertoire de sortie
+        stem: Nom de base des fichiers
+
+    Returns:
+        Liste de dicts avec texte et embeddings ([] pour les embeddings invalides)
+    """
+    output_path = Path(output_dir)
+    meta = orjson.loads((output_path / f"{stem}.meta.json").read_bytes())
+
+    with np.load(output_path / f"{stem}.vecs.npz") as data:
+        vecs, valid = data["vecs"], data["valid"]
+
+    for item, vector, ok in zip(meta, vecs, valid):
+        item["embedding"] = vector.tolist() if ok else []
+
+    return meta
+
+
+def _cache_key(model: str, text: str) -> str:
+    """Clé de cache: SHA-256 de (modèle, texte)."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache persistant des embeddings (SQLite), indexé par le hash du texte
+    et du modèle. Les vecteurs sont stockés en float32.
+
+    Une couche en mémoire évite de relire SQLite pour les chunks répétés
+    pendant une même exécution.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, memory_size: int = 10_000):
+        """
+        Initialise le cache.
+
+        Args:
+            path: Chemin de la base SQLite
+            memory_size: Nombre maximal de vecteurs gardés en mémoire
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.memory_size = memory_size
+        self._memory: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Retourne les embeddings en cache pour les textes donnés.
+
+        Args:
+            model: Modèle d'embedding
+            texts: Textes recherchés
+
+        Returns:
+            Dict texte -> embedding (uniquement les textes trouvés)
+        """
+        found: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+
+        with self._lock:
+            for text in texts:
+                key = _cache_key(model, text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    found[text] = vector
+                else:
+                    missing[key] = text
+
+            keys = list(missing)
+            # Limite SQLite sur le nombre de paramètres par requête
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    self._remember(key, vector)
+                    found[missing[key]] = vector
+
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]) -> None:
+        """
+        Enregistre des embeddings dans le cache.
+
+        Args:
+            model: Modèle d'embedding
+            items: Couples (texte, embedding)
+        """
+        rows = []
+        with self._lock:
+            for text, vector in items:
+                if not vector:
+                    continue
+                key = _cache_key(model, text)
+                self._remember(key, vector)
+                rows.append((key, np.asarray(vector, dtype=np.float32).tobytes()))
+
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    rows
+                )
+                self._conn.commit()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        """Ajoute un vecteur à la couche mémoire (éviction FIFO)."""
+        if len(self._memory) >= self.memory_size:
+            self._memory.pop(next(iter(self._memory)))
+        self._memory[key] = vector
+
+
 def chunk_text(text: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None) -> List[str]:
     """
     Version fonctionnelle de chunk_text pour éviter d'exiger une clé OpenAI.
@@ -61,7 +262,10 @@ class EmbeddingGenerator:
     def __init__(
         self,
         api_key: Optional[str] = None,
-        model: str = "text-embedding-3-small"
+        model: str = "text-embedding-3-small",
+        cache: Optional[EmbeddingCache] = None,
+        use_cache: bool = True,
+        http_client=None
     ):
         """
         Initialise le générateur d'embeddings.
@@ -69,6 +273,10 @@ class EmbeddingGenerator:
         Args:
             api_key: Clé API OpenAI
             model: Modèle d'embedding à utiliser
+            cache: Cache d'embeddings (par défaut un cache SQLite dans le dossier
+                .cache du dépôt; désactivé s'il ne peut pas être ouvert)
+            use_cache: Si False, désactive le cache
+            http_client: Client httpx partagé (pool de connexions keep-alive)
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
@@ -79,7 +287,17 @@ class EmbeddingGenerator:
                 "ou la variable d'environnement OPENAI_API_KEY"
             )
 
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = OpenAI(api_key=self.api_key, http_client=http_client)
+        self.cache = (cache or self._open_default_cache()) if use_cache else None
+
+    @staticmethod
+    def _open_default_cache() -> Optional[EmbeddingCache]:
+        """Ouvre le cache SQLite par défaut, ou None (ex. dossier en lecture seule)."""
+        try:
+            return EmbeddingCache()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ Cache d'embeddings désactivé ({DEFAULT_CACHE_PATH}): {e}")
+            return None
 
     @retry(
         stop=stop_after_attempt(3),
@@ -172,6 +390,190 @@ class EmbeddingGenerator:
 
         return embeddings
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Un appel API pour une liste de textes (ordre préservé)."""
+        response = self.client.embeddings.create(input=texts, model=self.model)
+        return [item.embedding for item in response.data]
+
+    def embed_texts_batch(
+        self,
+        texts: List[str],
+        max_batch_size: int = MAX_INPUTS_PER_REQUEST,
+        max_tokens: int = MAX_TOKENS_PER_REQUEST
+    ) -> List[List[float]]:
+        """
+        Génère les embeddings d'une liste de textes (éventuellement issus de
+        plusieurs fichiers) avec le moins d'appels API possible.
+
+        Les textes sont regroupés en requêtes de `max_batch_size` entrées au
+        plus, sans dépasser environ `max_tokens` tokens par requête.
+
+        Args:
+            texts: Liste de textes à encoder
+            max_batch_size: Nombre maximal d'entrées par requête
+            max_tokens: Budget approximatif de tokens par requête
+
+        Returns:
+            Liste d'embeddings alignée sur `texts` ([] pour les textes vides
+            ou en cas d'erreur)
+        """
+        embeddings, positions, hits, batches = self._plan_batches(texts, max_batch_size, max_tokens)
+
+        for batch_texts in batches:
+            try:
+                vectors = self._create_embeddings(batch_texts)
+                self._store_vectors(embeddings, positions, batch_texts, vectors)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'embedding de {len(batch_texts)} textes: {e}")
+
+        logger.info(
+            f"Généré {sum(1 for e in embeddings if e)} embeddings pour {len(texts)} textes "
+            f"({len(positions)} uniques, {len(hits)} depuis le cache)"
+        )
+        return embeddings
+
+    async def embed_texts_batch_async(
+        self,
+        texts: List[str],
+        max_batch_size: int = MAX_INPUTS_PER_REQUEST,
+        max_tokens: int = MAX_TOKENS_PER_REQUEST,
+        concurrency: int = 4,
+        client: Optional[AsyncOpenAI] = None
+    ) -> List[List[float]]:
+        """
+        Version asynchrone de `embed_texts_batch`: les requêtes sont envoyées
+        en parallèle, multiplexées sur une seule connexion HTTP/2.
+
+        Args:
+            texts: Liste de textes à encoder
+            max_batch_size: Nombre maximal d'entrées par requête
+            max_tokens: Budget approximatif de tokens par requête
+            concurrency: Nombre maximal de requêtes simultanées
+            client: Client asynchrone partagé (voir `async_client`); un client
+                temporaire est créé sinon
+
+        Returns:
+            Liste d'embeddings alignée sur `texts` ([] pour les textes vides
+            ou en cas d'erreur)
+        """
+        if client is None:
+            async with self.async_client() as client:
+                return await self.embed_texts_batch_async(
+                    texts, max_batch_size, max_tokens, concurrency, client
+                )
+
+        embeddings, positions, hits, batches = self._plan_batches(texts, max_batch_size, max_tokens)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(batch_texts: List[str]) -> None:
+            async with semaphore:
+                try:
+                    vectors = await self._create_embeddings_async(client, batch_texts)
+                    self._store_vectors(embeddings, positions, batch_texts, vectors)
+                except Exception as e:
+                    logger.error(f"Erreur lors de l'embedding de {len(batch_texts)} textes: {e}")
+
+        await asyncio.gather(*(send(batch_texts) for batch_texts in batches))
+
+        logger.info(
+            f"Généré {sum(1 for e in embeddings if e)} embeddings pour {len(texts)} textes "
+            f"({len(positions)} uniques, {len(hits)} depuis le cache)"
+        )
+        return embeddings
+
+    def async_client(self) -> AsyncOpenAI:
+        """
+        Crée un client OpenAI asynchrone sur une connexion HTTP/2.
+
+        À utiliser comme context manager (`async with`) à l'intérieur de la
+        boucle asyncio, et à partager entre les appels concurrents.
+        """
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            http_client=httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(60.0, connect=5.0),
+                limits=httpx.Limits(max_connections=32)
+            )
+        )
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def _create_embeddings_async(self, client: AsyncOpenAI, texts: List[str]) -> List[List[float]]:
+        """Un appel API asynchrone pour une liste de textes (ordre préservé)."""
+        response = await client.embeddings.create(input=texts, model=self.model)
+        return [item.embedding for item in response.data]
+
+    def _plan_batches(
+        self,
+        texts: List[str],
+        max_batch_size: int,
+        max_tokens: int
+    ) -> Tuple[List[List[float]], Dict[str, List[int]], Dict[str, List[float]], List[List[str]]]:
+        """
+        Prépare l'encodage d'une liste de textes: déduplication, lecture du
+        cache et découpage des textes restants en requêtes.
+
+        Returns:
+            Tuple (embeddings alignés sur `texts`, positions de chaque texte
+            unique, textes trouvés en cache, batches de textes à envoyer)
+        """
+        embeddings: List[List[float]] = [[] for _ in texts]
+
+        # Dédupliquer les textes identiques (chunks répétés entre fichiers)
+        positions: Dict[str, List[int]] = {}
+        for idx, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            positions.setdefault(text[:MAX_TEXT_LENGTH], []).append(idx)
+
+        # Servir depuis le cache ce qui a déjà été encodé
+        hits = self.cache.get_many(self.model, positions) if self.cache else {}
+        for text, vector in hits.items():
+            for idx in positions[text]:
+                embeddings[idx] = vector
+
+        batches: List[List[str]] = []
+        batch_texts: List[str] = []
+        batch_tokens = 0
+
+        for text in positions:
+            if text in hits:
+                continue
+            tokens = approx_tokens(text)
+            if batch_texts and (
+                len(batch_texts) >= max_batch_size or batch_tokens + tokens > max_tokens
+            ):
+                batches.append(batch_texts)
+                batch_texts, batch_tokens = [], 0
+            batch_texts.append(text)
+            batch_tokens += tokens
+
+        if batch_texts:
+            batches.append(batch_texts)
+
+        return embeddings, positions, hits, batches
+
+    def _store_vectors(
+        self,
+        embeddings: List[List[float]],
+        positions: Dict[str, List[int]],
+        batch_texts: List[str],
+        vectors: List[List[float]]
+    ) -> None:
+        """Répartit les vecteurs d'un batch sur toutes les occurrences et les met en cache."""
+        for text, vector in zip(batch_texts, vectors):
+            for idx in positions[text]:
+                embeddings[idx] = vector
+        if self.cache:
+            self.cache.put_many(self.model, zip(batch_texts, vectors))
+
     def chunk_text(
         self,
         text: str,
@@ -227,7 +629,7 @@ class EmbeddingGenerator:
             else:
                 start = end  # Fin du texte
 
-        logger.info(f"Texte découpé en {len(chunks)} chunks")
+        logger.debug(f"Texte découpé en {len(chunks)} chunks")
         return chunks
 
     def process_ocr_result(
@@ -247,6 +649,32 @@ class EmbeddingGenerator:
         Returns:
             Liste de dicts avec texte et embeddings
         """
+        chunks = self.chunk_ocr_result(ocr_result, chunk_size, overlap)
+        if not chunks:
+            return []
+
+        # Générer les embeddings (chunks déjà en cache non renvoyés à l'API)
+        embeddings = self.embed_texts_batch(chunks)
+
+        return self.build_results(ocr_result, chunks, embeddings)
+
+    def chunk_ocr_result(
+        self,
+        ocr_result: Dict[str, any],
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None
+    ) -> List[str]:
+        """
+        Découpe le texte d'un résultat OCR en chunks.
+
+        Args:
+            ocr_result: Résultat OCR du module azure_ocr
+            chunk_size: Taille des chunks de texte (utilise la configuration globale si None)
+            overlap: Chevauchement entre chunks (utilise la configuration globale si None)
+
+        Returns:
+            Liste de chunks de texte
+        """
         # Utiliser la configuration globale si non spécifié
         if chunk_size is None or overlap is None:
             default_chunk_size, default_overlap = get_chunking_params()
@@ -258,13 +686,25 @@ class EmbeddingGenerator:
             logger.warning(f"Pas de texte dans {ocr_result.get('file_path', 'unknown')}")
             return []
 
-        # Découper le texte
-        chunks = self.chunk_text(full_text, chunk_size, overlap)
+        return self.chunk_text(full_text, chunk_size, overlap)
 
-        # Générer les embeddings
-        embeddings = self.generate_embeddings_batch(chunks)
+    @staticmethod
+    def build_results(
+        ocr_result: Dict[str, any],
+        chunks: List[str],
+        embeddings: List[List[float]]
+    ) -> List[Dict[str, any]]:
+        """
+        Assemble les chunks d'un résultat OCR et leurs embeddings.
+
+        Args:
+            ocr_result: Résultat OCR du module azure_ocr
+            chunks: Chunks de texte du document
+            embeddings: Embeddings alignés sur `chunks`
 
-        # Créer les résultats
+        Returns:
+            Liste de dicts avec texte et embeddings
+        """
         results = []
         for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
             results.append({
@@ -279,5 +719,5 @@ class EmbeddingGenerator:
                 }
             })
 
-        logger.info(f"Généré {len(results)} embeddings pour {ocr_result.get('file_path')}")
+        logger.debug(f"Généré {len(results)} embeddings pour {ocr_result.get('file_path')}")
         return results
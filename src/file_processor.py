@@ -1,6 +1,11 @@
+import contextlib
+import fnmatch
 import os
+import re
+import shutil
+import uuid
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
 def _read_text_file(file_path: str, encoding: str = "utf-8") -> str:
     with open(file_path, "r", encoding=encoding, errors="ignore") as f:
@@ -44,3 +49,119 @@ def extract_text_from_file(file_path: str) -> str:
         return ""
 
 
+def list_directory(directory: str, pattern: str = "*", recursive: bool = False) -> List[Tuple[str, Optional[int]]]:
+    """
+    Liste les fichiers correspondant au pattern: [(chemin relatif, taille ou None)] triés.
+
+    Parcours os.scandir (taille lue via le stat mis en cache du DirEntry) et
+    pattern compilé une seule fois. Les liens symboliques vers des dossiers
+    ne sont pas suivis; un dossier racine absent ou qui n'est pas un dossier
+    lève FileNotFoundError / NotADirectoryError.
+    """
+    # "*" accepte tout nom: pas de regex à évaluer
+    if pattern == "*":
+        matches = None
+    else:
+        flags = re.IGNORECASE if os.name == 'nt' else 0
+        matches = re.compile(fnmatch.translate(pattern), flags).match
+
+    files = []
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if recursive and entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and (matches is None or matches(entry.name)):
+                        try:
+                            size = entry.stat().st_size
+                        except OSError:
+                            size = None
+                        rel_path = os.path.relpath(entry.path, directory) if recursive else entry.name
+                        files.append((rel_path, size))
+        except OSError:
+            # Comme os.walk: sous-dossiers illisibles ignorés
+            if current == directory:
+                raise
+
+    # Trier par nom
+    files.sort(key=lambda item: item[0])
+    return files
+
+
+def read_text_prefix(file_path: str, max_chars: int) -> Tuple[str, bool, int]:
+    """
+    Lit au plus `max_chars` caractères d'un fichier texte UTF-8 (caractères
+    invalides ignorés) sans charger le reste du fichier: 4 octets max par
+    caractère, plus une marge.
+
+    Returns:
+        (contenu, tronqué, taille du fichier en octets)
+    """
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        raw = f.read(max_chars * 4 + 1024)
+
+    content = raw.decode('utf-8', errors='ignore')
+    truncated = len(content) > max_chars or file_size > len(raw)
+    return content[:max_chars], truncated, file_size
+
+
+def write_text_atomic(file_path: str, content: str, encoding: str = "utf-8") -> Tuple[bool, int]:
+    """
+    Écrit un fichier texte de façon atomique (fichier temporaire dans le même
+    dossier puis os.replace): un arrêt en cours d'écriture ne laisse jamais
+    un fichier tronqué.
+
+    Returns:
+        (existait déjà, taille en octets)
+    """
+    # Créer les dossiers parents si nécessaire
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    file_exists = os.path.exists(file_path)
+
+    # Nom unique par appel: deux écritures concurrentes du même fichier (même
+    # processus, threads différents) ne partagent pas leur fichier temporaire.
+    # open() (et non mkstemp, toujours en 0600) applique l'umask du processus.
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "x", encoding=encoding) as f:
+            f.write(content)
+        if file_exists:
+            # Conserver les permissions du fichier remplacé
+            shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+    return file_exists, len(content.encode(encoding))
+
+
+# Sauts de ligne reconnus par str.splitlines, lignes vides et fin blanche
+_LINE_BREAKS = re.compile("\r\n|[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+_BLANK_LINES = re.compile(r"^[^\S\n]*\n", re.MULTILINE)
+_TRAILING_BLANK = re.compile(r"(?:^|\n)[^\S\n]*\Z")
+
+
+def indent_lines(text: str, prefix: str = "   ", normalise_breaks: bool = True) -> str:
+    """
+    Retire les lignes vides d'un texte et préfixe chaque ligne restante
+    (regex en une passe, sans découper le texte en liste).
+
+    Args:
+        text: Texte à indenter
+        prefix: Préfixe ajouté à chaque ligne
+        normalise_breaks: Si True, tous les sauts de ligne de str.splitlines
+            sont reconnus; sinon seul "\\n" sépare les lignes
+
+    Returns:
+        Lignes indentées séparées par "\\n" ("" s'il ne reste aucune ligne)
+    """
+    if normalise_breaks:
+        text = _LINE_BREAKS.sub("\n", text)
+    text = _TRAILING_BLANK.sub("", _BLANK_LINES.sub("", text))
+    return prefix + text.replace("\n", "\n" + prefix) if text else ""
@@ -2,8 +2,11 @@
 Configuration du logging pour l'application
 """
 
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 try:
@@ -16,7 +19,8 @@ except ImportError:
 def setup_logger(
     name: str = "embeddings",
     level: int = logging.INFO,
-    log_file: str = None
+    log_file: str = None,
+    use_queue: bool = False
 ) -> logging.Logger:
     """
     Configure et retourne un logger.
@@ -25,6 +29,9 @@ def setup_logger(
         name: Nom du logger
         level: Niveau de logging
         log_file: Fichier de log optionnel
+        use_queue: Si True, les threads ne font que déposer les messages dans
+            une file; un thread dédié les écrit (pas de contention sur les
+            verrous des handlers en traitement parallèle)
 
     Returns:
         Logger configuré
@@ -73,4 +80,12 @@ def setup_logger(
         file_handler.setFormatter(file_formatter)
         logger.addHandler(file_handler)
 
+    if use_queue:
+        log_queue = queue.Queue(-1)
+        listener = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+        logger.handlers = [QueueHandler(log_queue)]
+        listener.start()
+        # Vider la file avant la sortie du programme
+        atexit.register(listener.stop)
+
     return logger
@@ -0,0 +1,193 @@
+"""
+Module pour le transfert d'embeddings directement vers Postgres (Supabase)
+
+Alternative à SupabaseUploader: une seule connexion réutilisée et des
+INSERT pipelinés via `executemany`, au lieu d'une requête REST par batch.
+"""
+
+import os
+import logging
+from typing import List, Dict, Optional, Any
+from datetime import datetime
+
+from .embeddings import to_halfvec_literal
+
+try:  # Dépendance optionnelle pour l'accès Postgres direct
+    import psycopg
+    from psycopg import sql
+    from psycopg.types.json import Jsonb
+except ImportError:  # pragma: no cover - géré à l'exécution
+    psycopg = None
+    sql = None
+    Jsonb = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_database_url() -> Optional[str]:
+    """Retourne la chaîne de connexion Postgres définie dans l'environnement."""
+    return (
+        os.getenv("DATABASE_URL")
+        or os.getenv("SUPABASE_DATABASE_URL")
+        or os.getenv("POSTGRES_URL")
+        or os.getenv("PG_DSN")
+    )
+
+
+def pg_upload_available(database_url: Optional[str] = None) -> bool:
+    """True si psycopg est installé et qu'une chaîne de connexion est disponible."""
+    return psycopg is not None and bool(database_url or get_database_url())
+
+
+class PGUploader:
+    """
+    Client pour uploader des embeddings vers Postgres via psycopg.
+    Expose la même interface que SupabaseUploader pour l'upload.
+    """
+
+    def __init__(self, database_url: Optional[str] = None):
+        """
+        Initialise la connexion Postgres (ouverte au premier upload).
+
+        Args:
+            database_url: Chaîne de connexion Postgres
+        """
+        if psycopg is None:
+            raise RuntimeError(
+                "Le module psycopg n'est pas installé. Installez-le avec "
+                "`pip install psycopg[binary]` pour activer l'upload direct."
+            )
+
+        self.database_url = database_url or get_database_url()
+
+        if not self.database_url:
+            raise ValueError(
+                "DATABASE_URL (ou SUPABASE_DATABASE_URL) est manquant. "
+                "Définissez la chaîne de connexion Postgres."
+            )
+
+        self._conn = None
+
+    @property
+    def conn(self):
+        """Connexion Postgres, ouverte une seule fois et réutilisée."""
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg.connect(self.database_url, autocommit=True)
+        return self._conn
+
+    def close(self) -> None:
+        """Ferme la connexion Postgres."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def upload_embeddings(
+        self,
+        table_name: str,
+        embeddings_data: List[Dict[str, Any]],
+        batch_size: int = 500,
+        vector_type: str = "vector"
+    ) -> List[Dict[str, Any]]:
+        """
+        Upload des embeddings vers Postgres avec métadonnées.
+
+        Args:
+            table_name: Nom de la table
+            embeddings_data: Liste de dicts avec embeddings et métadonnées
+            batch_size: Nombre de lignes par transaction
+            vector_type: "vector" (float32) ou "halfvec" (float16)
+
+        Returns:
+            Liste des entrées insérées
+        """
+        created_at = datetime.utcnow().isoformat()
+        prepared_data = [
+            {
+                "content": item.get("chunk_text", ""),
+                "embedding": item.get("embedding", []),
+                "metadata": {
+                    "file_path": item.get("file_path", ""),
+                    "chunk_index": item.get("chunk_index", 0),
+                    "page_count": item.get("page_count", 0),
+                    **item.get("metadata", {})
+                },
+                "created_at": created_at
+            }
+            for item in embeddings_data
+        ]
+
+        logger.info(f"Préparation de {len(prepared_data)} entrées pour upload (Postgres)")
+
+        if vector_type == "halfvec":
+            to_literal = to_halfvec_literal
+        else:
+            def to_literal(vector):
+                return "[" + ",".join(map(str, vector)) + "]" if vector else None
+
+        query = sql.SQL(
+            "INSERT INTO {} (content, embedding, metadata, created_at) "
+            "VALUES (%s, %s::{}, %s, %s)"
+        ).format(sql.Identifier(table_name), sql.SQL("halfvec" if vector_type == "halfvec" else "vector"))
+
+        results = []
+
+        for i in range(0, len(prepared_data), batch_size):
+            batch = prepared_data[i:i + batch_size]
+            rows = [
+                (
+                    entry["content"],
+                    to_literal(entry["embedding"]),
+                    Jsonb(entry["metadata"]),
+                    entry["created_at"]
+                )
+                for entry in batch
+            ]
+
+            try:
+                # executemany est pipeliné par psycopg: un aller-retour par batch
+                with self.conn.transaction():
+                    with self.conn.cursor() as cur:
+                        cur.executemany(query, rows)
+                results.extend(batch)
+
+                logger.info(
+                    f"Batch {i // batch_size + 1} uploadé avec succès "
+                    f"({len(batch)} documents)"
+                )
+
+            except Exception as e:
+                logger.error(f"Erreur lors de l'upload du batch {i // batch_size + 1}: {e}")
+                # Continuer avec le prochain batch
+                continue
+
+        return results
+
+    def get_table_stats(self, table_name: str) -> Dict[str, Any]:
+        """
+        Récupère des statistiques sur une table.
+
+        Args:
+            table_name: Nom de la table
+
+        Returns:
+            Dict avec les statistiques
+        """
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(table_name))
+                )
+                total = cur.fetchone()[0]
+
+            return {
+                "table_name": table_name,
+                "total_documents": total,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des stats: {e}")
+            return {
+                "table_name": table_name,
+                "error": str(e)
+            }
@@ -0,0 +1,378 @@
+"""
+Cache des résultats de recherche sémantique
+
+Deux niveaux:
+1. Correspondance exacte sur (requête, limite, seuil) - LRU
+2. Correspondance sémantique: une requête dont l'embedding est très proche
+   (cosinus >= similarity) d'une requête déjà servie réutilise son résultat.
+   Un hachage LSH par projections aléatoires (signatures 64 bits) présélectionne
+   les candidats avant le produit scalaire.
+
+ContextCache conserve sur disque (SQLite) les contextes RAG déjà formatés,
+indexés par la signature LSH de l'embedding de la requête et confirmés par
+le cosinus avec l'embedding stocké.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LSH_BITS = 64
+# Dossier des caches disque: ancré à la racine du dépôt (et non au répertoire
+# courant, qui peut être en lecture seule quand un client MCP lance le serveur)
+CACHE_DIR = Path(os.getenv("EMBEDDINGSALL_CACHE_DIR") or Path(__file__).resolve().parent.parent / ".cache")
+DEFAULT_CONTEXT_CACHE_PATH = os.getenv("RAG_CONTEXT_CACHE_PATH") or str(CACHE_DIR / "rag_context.sqlite3")
+
+# Popcount vectorisé (NumPy >= 2.0), sinon repli sur np.unpackbits
+_bitwise_count = getattr(np, "bitwise_count", None)
+
+
+def normalise(embedding: List[float]) -> np.ndarray:
+    """Embedding en float32 de norme 1 (le cosinus devient un produit scalaire)."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def lsh_projection(dim: int, seed: int = 0) -> np.ndarray:
+    """Matrice de projections aléatoires (dim, LSH_BITS), fixée par la graine."""
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((dim, LSH_BITS)).astype(np.float32)
+
+
+def hamming_distances(signatures: np.ndarray, signature: np.uint64) -> np.ndarray:
+    """
+    Distances de Hamming entre des signatures LSH (uint64) et une signature.
+    np.bitwise_count (NumPy >= 2.0) compte les bits par instruction popcount;
+    sinon les octets sont dépliés en bits (8 fois plus de mémoire).
+    """
+    xor = signatures ^ signature
+    if _bitwise_count is not None:
+        return _bitwise_count(xor)
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def lsh_signatures(vectors: np.ndarray, projection: np.ndarray) -> np.ndarray:
+    """Signatures LSH: signes des projections, empaquetés en uint64."""
+    bits = (vectors @ projection) > 0
+    return np.packbits(bits, axis=1).view(">u8").astype(np.uint64).ravel()
+
+
+class SemanticCache:
+    """
+    Cache LRU exact + sémantique pour les résultats de recherche.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 512,
+        similarity: float = 0.95,
+        max_hamming: int = 16,
+        ttl: Optional[float] = None,
+        seed: int = 0
+    ):
+        """
+        Initialise le cache.
+
+        Args:
+            maxsize: Nombre maximal d'entrées (par niveau)
+            similarity: Similarité cosinus minimale pour un hit sémantique
+            max_hamming: Distance de Hamming maximale entre signatures LSH
+                pour qu'une entrée soit candidate
+            ttl: Durée de vie des entrées en secondes (None = illimitée)
+            seed: Graine des projections aléatoires
+        """
+        self.maxsize = maxsize
+        self.similarity = similarity
+        self.max_hamming = max_hamming
+        self.ttl = ttl
+        self._seed = seed
+        self._lock = threading.Lock()
+
+        self._exact: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+        # Niveau sémantique: lignes alignées entre la matrice, les signatures
+        # et les listes (scope, horodatage, résultat)
+        self._projection: Optional[np.ndarray] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._signatures = np.zeros(0, dtype=np.uint64)
+        self._scopes: List[Hashable] = []
+        self._times: List[float] = []
+        self._payloads: List[Any] = []
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Recherche exacte.
+
+        Args:
+            key: Clé de la requête, ex. (requête, limite, seuil)
+
+        Returns:
+            Résultat en cache ou None
+        """
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is None or self._expired(entry[0]):
+                return None
+            self._exact.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_similar(self, embedding: List[float], scope: Hashable = None) -> Optional[Any]:
+        """
+        Recherche sémantique: résultat d'une requête proche de `embedding`.
+
+        Args:
+            embedding: Embedding de la requête
+            scope: Paramètres qui doivent être identiques (ex. (limite, seuil))
+
+        Returns:
+            Résultat en cache ou None
+        """
+        with self._lock:
+            if self._matrix is None or not len(self._payloads):
+                self.misses += 1
+                return None
+
+            query = normalise(embedding)
+            if query.shape[0] != self._matrix.shape[1]:
+                self.misses += 1
+                return None
+
+            # Présélection LSH (distance de Hamming), puis cosinus exact
+            signature = self._signature(query[None, :])[0]
+            distances = hamming_distances(self._signatures, signature)
+            candidates = np.flatnonzero(distances <= self.max_hamming)
+            candidates = [
+                i for i in candidates
+                if self._scopes[i] == scope and not self._expired(self._times[i])
+            ]
+
+            if candidates:
+                scores = self._matrix[candidates] @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    self.semantic_hits += 1
+                    return self._payloads[candidates[best]]
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        key: Hashable,
+        payload: Any,
+        embedding: Optional[List[float]] = None,
+        scope: Hashable = None
+    ) -> None:
+        """
+        Enregistre un résultat.
+
+        Args:
+            key: Clé exacte de la requête
+            payload: Résultat à mettre en cache
+            embedding: Embedding de la requête (active le niveau sémantique)
+            scope: Paramètres qui doivent être identiques pour un hit sémantique
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            self._exact[key] = (now, payload)
+            self._exact.move_to_end(key)
+            if len(self._exact) > self.maxsize:
+                self._exact.popitem(last=False)
+
+            if not embedding:
+                return
+
+            vector = normalise(embedding)
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                self._reset_semantic(vector.shape[0])
+
+            # Éviction FIFO de la plus ancienne entrée sémantique
+            if len(self._payloads) >= self.maxsize:
+                self._matrix = self._matrix[1:]
+                self._signatures = self._signatures[1:]
+                del self._scopes[0], self._times[0], self._payloads[0]
+
+            self._matrix = np.vstack([self._matrix, vector[None, :]])
+            self._signatures = np.concatenate([self._signatures, self._signature(vector[None, :])])
+            self._scopes.append(scope)
+            self._times.append(now)
+            self._payloads.append(payload)
+
+    def clear(self) -> None:
+        """Vide les deux niveaux (ex. après l'ajout de documents)."""
+        with self._lock:
+            self._exact.clear()
+            if self._matrix is not None:
+                self._reset_semantic(self._matrix.shape[1])
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def _expired(self, timestamp: float) -> bool:
+        return self.ttl is not None and time.monotonic() - timestamp > self.ttl
+
+    def _reset_semantic(self, dim: int) -> None:
+        self._projection = lsh_projection(dim, self._seed)
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._signatures = np.zeros(0, dtype=np.uint64)
+        self._scopes, self._times, self._payloads = [], [], []
+
+    def _signature(self, vectors: np.ndarray) -> np.ndarray:
+        return lsh_signatures(vectors, self._projection)
+
+
+class ContextCache:
+    """
+    Cache persistant (SQLite) des contextes RAG formatés.
+
+    Clé: (signature LSH 64 bits de l'embedding de la requête, top-k, seuil).
+    L'embedding normalisé est stocké avec le contexte: un hit exige un
+    cosinus >= `similarity`, deux requêtes différentes de même signature ne
+    partagent donc pas leur contexte. Éviction: TTL, puis entrées les moins
+    servies et les plus anciennement utilisées au-delà de `maxsize`.
+
+    Le TTL borne aussi la péremption après un upload fait par un autre
+    processus (CLI, API REST), qui ne vide pas ce cache.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CONTEXT_CACHE_PATH,
+        maxsize: int = 2048,
+        ttl: Optional[float] = 300,
+        similarity: float = 0.95,
+        seed: int = 0
+    ):
+        """
+        Initialise le cache.
+
+        Args:
+            path: Chemin de la base SQLite
+            maxsize: Nombre maximal de contextes conservés
+            ttl: Durée de vie d'un contexte en secondes (None = illimitée)
+            similarity: Cosinus minimal entre la requête et la requête en cache
+            seed: Graine des projections aléatoires (doit rester stable d'une
+                exécution à l'autre pour réutiliser les signatures)
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self._seed = seed
+        self._projection: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Ancien schéma sans embedding: ses entrées ne sont pas vérifiables
+        self._conn.execute("DROP TABLE IF EXISTS rag_context")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rag_context_v2 ("
+            "sig BLOB NOT NULL, top_k INTEGER NOT NULL, threshold REAL NOT NULL, "
+            "created REAL NOT NULL, used REAL NOT NULL, hit_count INTEGER NOT NULL DEFAULT 0, "
+            "embedding BLOB NOT NULL, context TEXT NOT NULL, PRIMARY KEY (sig, top_k, threshold))"
+        )
+        self._conn.commit()
+
+    def get(self, embedding: List[float], limit: int, threshold: float) -> Optional[str]:
+        """
+        Retourne le contexte en cache pour une requête, ou None.
+
+        Args:
+            embedding: Embedding de la requête
+            limit: Nombre de chunks demandés
+            threshold: Seuil de similarité
+        """
+        vector = normalise(embedding)
+        key = self._key(vector, limit, threshold)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created, embedding, context FROM rag_context_v2 "
+                "WHERE sig = ? AND top_k = ? AND threshold = ?",
+                key
+            ).fetchone()
+            if row is None:
+                return None
+
+            if self.ttl is not None and now - row[0] > self.ttl:
+                self._conn.execute(
+                    "DELETE FROM rag_context_v2 WHERE sig = ? AND top_k = ? AND threshold = ?", key
+                )
+                self._conn.commit()
+                return None
+
+            # Collision de signature entre requêtes différentes: pas de hit
+            cached = np.frombuffer(row[1], dtype=np.float32)
+            if cached.shape != vector.shape or float(cached @ vector) < self.similarity:
+                return None
+
+            self._conn.execute(
+                "UPDATE rag_context_v2 SET used = ?, hit_count = hit_count + 1 "
+                "WHERE sig = ? AND top_k = ? AND threshold = ?",
+                (now, *key)
+            )
+            self._conn.commit()
+            return row[2]
+
+    def put(self, embedding: List[float], limit: int, threshold: float, context: str) -> None:
+        """
+        Enregistre le contexte d'une requête.
+
+        Args:
+            embedding: Embedding de la requête
+            limit: Nombre de chunks demandés
+            threshold: Seuil de similarité
+            context: Contexte RAG formaté
+        """
+        vector = normalise(embedding)
+        key = self._key(vector, limit, threshold)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rag_context_v2 "
+                "(sig, top_k, threshold, created, used, embedding, context) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, now, now, vector.tobytes(), context)
+            )
+
+            if self.ttl is not None:
+                self._conn.execute("DELETE FROM rag_context_v2 WHERE created < ?", (now - self.ttl,))
+
+            excess = self._conn.execute("SELECT COUNT(*) FROM rag_context_v2").fetchone()[0] - self.maxsize
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM rag_context_v2 WHERE rowid IN ("
+                    "SELECT rowid FROM rag_context_v2 ORDER BY hit_count, used LIMIT ?)",
+                    (excess,)
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Vide le cache (ex. après l'ajout de documents)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM rag_context_v2")
+            self._conn.commit()
+
+    def _key(self, vector: np.ndarray, limit: int, threshold: float) -> Tuple[bytes, int, float]:
+        if self._projection is None or self._projection.shape[0] != vector.shape[0]:
+            self._projection = lsh_projection(vector.shape[0], self._seed)
+        signature = lsh_signatures(vector[None, :], self._projection)[0]
+        return signature.tobytes(), limit, round(threshold, 2)
@@ -4,10 +4,11 @@ Combine génération d'embeddings et recherche vectorielle
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, Dict, List, Optional
 from pathlib import Path
 
 from src.embeddings import EmbeddingGenerator
+from src.semantic_cache import SemanticCache
 from src.supabase_client import SupabaseUploader
 
 try:
@@ -30,7 +31,8 @@ class SemanticSearchEngine:
     def __init__(
         self,
         embedding_generator: Optional[EmbeddingGenerator] = None,
-        supabase_uploader: Optional[SupabaseUploader] = None
+        supabase_uploader: Optional[SupabaseUploader] = None,
+        cache: Optional[SemanticCache] = None
     ):
         """
         Initialise le moteur de recherche sémantique.
@@ -38,9 +40,12 @@ class SemanticSearchEngine:
         Args:
             embedding_generator: Générateur d'embeddings (créé si None)
             supabase_uploader: Client Supabase (créé si None)
+            cache: Cache des résultats (requêtes identiques ou quasi identiques);
+                aucun cache si None
         """
         self.embedding_generator = embedding_generator or EmbeddingGenerator()
         self.supabase_uploader = supabase_uploader or SupabaseUploader()
+        self.cache = cache
 
         logger.info("✅ Moteur de recherche sémantique initialisé")
 
@@ -49,7 +54,8 @@ class SemanticSearchEngine:
         query: str,
         limit: int = 5,
         threshold: float = 0.3,
-        table_name: str = "documents"
+        table_name: str = "documents",
+        embed_query: Optional[Callable[[str], List[float]]] = None
     ) -> List[Dict[str, Any]]:
         """
         Recherche sémantique dans la base de données.
@@ -59,14 +65,27 @@ class SemanticSearchEngine:
             limit: Nombre maximum de résultats
             threshold: Seuil de similarité (0-1, défaut: 0.3 car chunks courts)
             table_name: Nom de la table à interroger
+            embed_query: Fonction d'embedding de la requête (ex. batcher
+                partagé); par défaut, un appel direct au générateur
 
         Returns:
             Liste de résultats avec contenu et métadonnées
         """
         logger.info(f"🔍 Recherche: '{query}'")
 
+        # 0. Requête identique déjà servie: ni embedding ni recherche
+        scope = (limit, round(threshold, 2), table_name)
+        key = (query, *scope)
+        if self.cache is not None:
+            results = self.cache.get(key)
+            if results is not None:
+                return results
+
         # 1. Générer l'embedding de la requête
-        query_embedding = self.embedding_generator.generate_embedding(query)
+        if embed_query is not None and query.strip():
+            query_embedding = embed_query(query)
+        else:
+            query_embedding = self.embedding_generator.generate_embedding(query)
 
         if not query_embedding:
             logger.error("❌ Impossible de générer l'embedding de la requête")
@@ -74,7 +93,39 @@ class SemanticSearchEngine:
 
         logger.info(f"✅ Embedding généré ({len(query_embedding)} dimensions)")
 
-        # 2. Rechercher dans Supabase
+        # 2. Requête quasi identique récente: résultat réutilisé
+        if self.cache is not None:
+            results = self.cache.get_similar(query_embedding, scope)
+            if results is not None:
+                logger.info(f"♻️ Résultat réutilisé (requête similaire) pour: '{query}'")
+                self.cache.put(key, results)
+                return results
+
+        results = self.search_by_embedding(query_embedding, limit, threshold, table_name)
+        if self.cache is not None and results:
+            self.cache.put(key, results, query_embedding, scope)
+        return results
+
+    def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        threshold: float = 0.3,
+        table_name: str = "documents"
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche vectorielle à partir d'un embedding déjà calculé.
+
+        Args:
+            query_embedding: Embedding de la requête
+            limit: Nombre maximum de résultats
+            threshold: Seuil de similarité
+            table_name: Nom de la table à interroger
+
+        Returns:
+            Liste de résultats avec contenu et métadonnées
+        """
+        # Rechercher dans Supabase
         try:
             results = self.supabase_uploader.search_similar(
                 table_name=table_name,
@@ -85,7 +136,7 @@ class SemanticSearchEngine:
 
             logger.info(f"✅ {len(results)} résultats trouvés")
 
-            # 3. Post-traiter les résultats
+            # Post-traiter les résultats
             processed_results = []
             for i, result in enumerate(results, 1):
                 processed_results.append({
@@ -157,7 +208,8 @@ class SemanticSearchEngine:
         self,
         query: str,
         limit: int = 5,
-        threshold: float = 0.3
+        threshold: float = 0.3,
+        embed_query: Optional[Callable[[str], List[float]]] = None
     ) -> str:
         """
         Récupère le contexte pour RAG (Retrieval Augmented Generation).
@@ -166,12 +218,24 @@ class SemanticSearchEngine:
             query: Question ou requête
             limit: Nombre de chunks à récupérer
             threshold: Seuil de similarité
+            embed_query: Fonction d'embedding de la requête (voir `search`)
 
         Returns:
             Contexte concaténé des meilleurs résultats
         """
-        results = self.search(query, limit, threshold)
+        return self.format_context(self.search(query, limit, threshold, embed_query=embed_query))
+
+    @staticmethod
+    def format_context(results: List[Dict[str, Any]]) -> str:
+        """
+        Construit le contexte RAG à partir de résultats de recherche.
 
+        Args:
+            results: Résultats de `search`
+
+        Returns:
+            Contexte concaténé des résultats
+        """
         if not results:
             return "Aucun contexte trouvé dans la base de données."
 
@@ -0,0 +1,83 @@
+"""
+Cache "stale-while-revalidate" pour des valeurs coûteuses et lentement variables
+
+Une valeur fraîche (âge < ttl) est servie telle quelle. Une valeur périmée
+mais encore acceptable (âge < max_stale) est servie immédiatement pendant
+qu'un thread la recalcule. Au-delà, ou sans valeur, l'appel attend le calcul.
+"""
+
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class StaleWhileRevalidate:
+    """
+    Enveloppe une fonction sans argument (ex. statistiques de la base).
+    Thread-safe: au plus un rafraîchissement en arrière-plan à la fois.
+    """
+
+    def __init__(self, func: Callable[[], Any], ttl: float = 60, max_stale: float = 600):
+        """
+        Args:
+            func: Fonction (bloquante) qui calcule la valeur
+            ttl: Âge en secondes au-delà duquel la valeur est rafraîchie
+            max_stale: Âge maximal en secondes d'une valeur servie périmée
+        """
+        self.func = func
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        self._value: Any = _MISSING
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._generation = 0
+        functools.update_wrapper(self, func)
+
+    def __call__(self) -> Any:
+        with self._lock:
+            value, age = self._value, time.monotonic() - self._fetched_at
+            if value is not _MISSING and self.ttl <= age < self.max_stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+        if value is not _MISSING and age < self.max_stale:
+            return value
+        return self._refresh()
+
+    def clear(self) -> None:
+        """Oublie la valeur: le prochain appel attend un calcul frais."""
+        with self._lock:
+            self._value = _MISSING
+            self._generation += 1
+
+    def _refresh(self) -> Any:
+        generation = self._generation
+        value = self.func()
+        with self._lock:
+            # Un calcul commencé avant clear() ne doit pas être conservé
+            if generation == self._generation:
+                self._value, self._fetched_at = value, time.monotonic()
+        return value
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self._refresh()
+        except Exception as e:
+            logger.warning(f"⚠️ Rafraîchissement en arrière-plan échoué: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+def stale_while_revalidate(ttl: float = 60, max_stale: float = 600):
+    """Décorateur: `@stale_while_revalidate(ttl=60, max_stale=600)`."""
+    def decorator(func: Callable[[], Any]) -> StaleWhileRevalidate:
+        return StaleWhileRevalidate(func, ttl=ttl, max_stale=max_stale)
+    return decorator
@@ -3,13 +3,17 @@ Module pour le transfert de données vers Supabase
 """
 
 import os
+import queue
 import logging
+import threading
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 
 from supabase import create_client, Client
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from .embeddings import to_halfvec_literal
+
 logger = logging.getLogger(__name__)
 
 
@@ -120,7 +124,8 @@ class SupabaseUploader:
         self,
         table_name: str,
         embeddings_data: List[Dict[str, Any]],
-        batch_size: int = 100
+        batch_size: int = 100,
+        vector_type: str = "vector"
     ) -> List[Dict[str, Any]]:
         """
         Upload des embeddings vers Supabase avec métadonnées.
@@ -129,6 +134,8 @@ class SupabaseUploader:
             table_name: Nom de la table
             embeddings_data: Liste de dicts avec embeddings et métadonnées
             batch_size: Taille des batches
+            vector_type: "vector" (float32) ou "halfvec" (float16, colonne
+                migrée avec supabase_migration_halfvec.sql)
 
         Returns:
             Liste des réponses de Supabase
@@ -137,10 +144,14 @@ class SupabaseUploader:
         prepared_data = []
 
         for item in embeddings_data:
+            embedding = item.get("embedding", [])
+            if vector_type == "halfvec":
+                embedding = to_halfvec_literal(embedding)
+
             # Créer l'entrée pour Supabase
             entry = {
                 "content": item.get("chunk_text", ""),
-                "embedding": item.get("embedding", []),
+                "embedding": embedding,
                 "metadata": {
                     "file_path": item.get("file_path", ""),
                     "chunk_index": item.get("chunk_index", 0),
@@ -295,3 +306,96 @@ class SupabaseUploader:
         except Exception as e:
             logger.error(f"Erreur lors de la suppression: {e}")
             raise
+
+
+class EmbeddingUploadStream:
+    """
+    Upload progressif des embeddings: les résultats sont ajoutés au fur et à
+    mesure et envoyés par batches depuis un thread dédié, au lieu d'un seul
+    upload final de tous les embeddings.
+
+    La mémoire n'est pas constante: elle est bornée par le buffer et les
+    `max_pending_batches` batches en attente (plus, côté appelant, le lot
+    d'embeddings en cours), mais ne croît plus avec le nombre de fichiers.
+
+    Fonctionne avec tout uploader exposant `upload_embeddings`
+    (SupabaseUploader, PGUploader).
+    """
+
+    def __init__(
+        self,
+        uploader,
+        table_name: str,
+        batch_size: int = 100,
+        vector_type: str = "vector",
+        max_pending_batches: int = 8
+    ):
+        """
+        Démarre le thread d'upload.
+
+        Args:
+            uploader: Uploader utilisé pour chaque batch
+            table_name: Nom de la table
+            batch_size: Nombre d'entrées par batch
+            vector_type: "vector" ou "halfvec"
+            max_pending_batches: Batches en attente avant de bloquer `add`
+        """
+        self.uploader = uploader
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.vector_type = vector_type
+        self.total_uploaded = 0
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._queue: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(max_pending_batches)
+        self._thread = threading.Thread(target=self._run, name="embedding-upload", daemon=True)
+        self._thread.start()
+
+    def add(self, embeddings_data: List[Dict[str, Any]]) -> None:
+        """
+        Ajoute des embeddings; chaque batch complet part vers le thread d'upload.
+
+        Args:
+            embeddings_data: Liste de dicts avec embeddings et métadonnées
+        """
+        self._buffer.extend(embeddings_data)
+
+        while len(self._buffer) >= self.batch_size:
+            batch = self._buffer[:self.batch_size]
+            self._buffer = self._buffer[self.batch_size:]
+            self._queue.put(batch)
+
+    def flush(self) -> int:
+        """
+        Envoie le dernier batch partiel et attend la fin des uploads.
+
+        Returns:
+            Nombre total d'entrées uploadées
+        """
+        if self._buffer:
+            self._queue.put(self._buffer)
+            self._buffer = []
+
+        self._queue.put(None)
+        self._thread.join()
+
+        return self.total_uploaded
+
+    def _run(self) -> None:
+        """Boucle du thread d'upload."""
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                break
+
+            try:
+                results = self.uploader.upload_embeddings(
+                    table_name=self.table_name,
+                    embeddings_data=batch,
+                    batch_size=len(batch),
+                    vector_type=self.vector_type
+                )
+                self.total_uploaded += len(results)
+
+            except Exception as e:
+                logger.error(f"Erreur lors de l'upload d'un batch de {len(batch)} entrées: {e}")
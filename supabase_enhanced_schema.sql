@@ -380,49 +380,60 @@ RETURNS TABLE (
     importance_score numeric
 )
 LANGUAGE plpgsql
+STABLE
+-- Parcours itératif (pgvector >= 0.8): l'index continue tant que les filtres
+-- n'ont pas fourni match_count lignes
+SET hnsw.iterative_scan = relaxed_order
+SET hnsw.ef_search = 100
 AS $$
 BEGIN
+    -- relaxed_order peut rendre des lignes légèrement hors ordre: les
+    -- match_count lignes sont matérialisées puis re-triées (rang fiable)
     RETURN QUERY
-    SELECT
-        c.id AS chunk_id,
-        c.document_id,
-        d.file_name,
-        d.file_path,
-        c.chunk_index,
-        c.chunk_content,
-        c.context_before,
-        c.context_after,
-        c.section_title,
-        c.page_number,
-        d.full_content AS full_document_content,
-        1 - (c.embedding <=> query_embedding) AS similarity,
-        c.chunk_metadata,
-        d.metadata AS document_metadata,
-        d.type_document,
-        d.categorie,
-        d.commune,
-        d.canton,
-        d.date_document,
-        d.montant_principal,
-        d.tags,
-        c.importance_score
-    FROM
-        document_chunks c
-    INNER JOIN
-        documents_full d ON c.document_id = d.id
-    WHERE
-        1 - (c.embedding <=> query_embedding) > match_threshold
-        AND (filter_type_document IS NULL OR d.type_document = filter_type_document)
-        AND (filter_categorie IS NULL OR d.categorie = filter_categorie)
-        AND (filter_commune IS NULL OR d.commune = filter_commune)
-        AND (filter_canton IS NULL OR d.canton = filter_canton)
-        AND (filter_tags IS NULL OR d.tags && filter_tags)  -- Overlap operator
-        AND (min_date IS NULL OR d.date_document >= min_date)
-        AND (max_date IS NULL OR d.date_document <= max_date)
-    ORDER BY
-        similarity DESC,
-        c.importance_score DESC NULLS LAST
-    LIMIT match_count;
+    WITH ranked AS MATERIALIZED (
+        SELECT
+            c.id AS chunk_id,
+            c.document_id,
+            d.file_name,
+            d.file_path,
+            c.chunk_index,
+            c.chunk_content,
+            c.context_before,
+            c.context_after,
+            c.section_title,
+            c.page_number,
+            d.full_content AS full_document_content,
+            1 - (c.embedding <=> query_embedding) AS similarity,
+            c.chunk_metadata,
+            d.metadata AS document_metadata,
+            d.type_document,
+            d.categorie,
+            d.commune,
+            d.canton,
+            d.date_document,
+            d.montant_principal,
+            d.tags,
+            c.importance_score
+        FROM
+            document_chunks c
+        INNER JOIN
+            documents_full d ON c.document_id = d.id
+        WHERE
+            c.embedding IS NOT NULL
+            AND (c.embedding <=> query_embedding) < 1 - match_threshold
+            AND (filter_type_document IS NULL OR d.type_document = filter_type_document)
+            AND (filter_categorie IS NULL OR d.categorie = filter_categorie)
+            AND (filter_commune IS NULL OR d.commune = filter_commune)
+            AND (filter_canton IS NULL OR d.canton = filter_canton)
+            AND (filter_tags IS NULL OR d.tags && filter_tags)  -- Overlap operator
+            AND (min_date IS NULL OR d.date_document >= min_date)
+            AND (max_date IS NULL OR d.date_document <= max_date)
+        -- Tri sur la distance elle-même: seule forme servie par l'index HNSW
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT match_count
+    )
+    SELECT * FROM ranked r
+    ORDER BY r.similarity DESC;
 END;
 $$;
 
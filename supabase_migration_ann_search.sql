@@ -0,0 +1,112 @@
+-- =============================================================================
+-- Migration: Recherche enrichie servie par l'index HNSW (au lieu d'un scan complet)
+-- Prérequis: pgvector >= 0.8.0, index HNSW idx_chunks_embedding (étape 5)
+--
+-- match_document_chunks_enhanced triait sur "similarity DESC" (une expression
+-- calculée): PostgreSQL ne peut alors pas utiliser l'index vectoriel et calcule
+-- la distance de chaque chunk de la base avant de trier. Trier directement sur
+-- "embedding <=> requête" permet un parcours approché (ANN) de l'index HNSW,
+-- qui ne lit que quelques centaines de vecteurs.
+--
+-- Les filtres (type, commune, dates...) sont appliqués pendant le parcours
+-- itératif de l'index. L'ordre secondaire par importance_score est abandonné:
+-- il ne départageait que des similarités strictement égales.
+--
+-- match_document_chunks (recherche principale) trie déjà sur la distance.
+-- =============================================================================
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.match_document_chunks_enhanced(
+    query_embedding vector(1536),
+    match_threshold float DEFAULT 0.7,
+    match_count int DEFAULT 10,
+    filter_type_document text DEFAULT NULL,
+    filter_categorie text DEFAULT NULL,
+    filter_commune text DEFAULT NULL,
+    filter_canton text DEFAULT NULL,
+    filter_tags text[] DEFAULT NULL,
+    min_date date DEFAULT NULL,
+    max_date date DEFAULT NULL
+)
+RETURNS TABLE (
+    chunk_id bigint,
+    document_id bigint,
+    file_name text,
+    file_path text,
+    chunk_index integer,
+    chunk_content text,
+    context_before text,
+    context_after text,
+    section_title text,
+    page_number integer,
+    full_document_content text,
+    similarity float,
+    chunk_metadata jsonb,
+    document_metadata jsonb,
+    type_document text,
+    categorie text,
+    commune text,
+    canton text,
+    date_document date,
+    montant_principal numeric,
+    tags text[],
+    importance_score numeric
+)
+LANGUAGE plpgsql
+STABLE
+-- Parcours itératif (pgvector >= 0.8): l'index continue tant que les filtres
+-- n'ont pas fourni match_count lignes
+SET hnsw.iterative_scan = relaxed_order
+SET hnsw.ef_search = 100
+AS $$
+BEGIN
+    -- relaxed_order peut rendre des lignes légèrement hors ordre: les
+    -- match_count lignes sont matérialisées puis re-triées (rang fiable)
+    RETURN QUERY
+    WITH ranked AS MATERIALIZED (
+        SELECT
+            c.id AS chunk_id,
+            c.document_id,
+            d.file_name,
+            d.file_path,
+            c.chunk_index,
+            c.chunk_content,
+            c.context_before,
+            c.context_after,
+            c.section_title,
+            c.page_number,
+            d.full_content AS full_document_content,
+            (1 - (c.embedding <=> query_embedding))::float AS similarity,
+            c.chunk_metadata,
+            d.metadata AS document_metadata,
+            d.type_document,
+            d.categorie,
+            d.commune,
+            d.canton,
+            d.date_document,
+            d.montant_principal,
+            d.tags,
+            c.importance_score
+        FROM public.document_chunks c
+        INNER JOIN public.documents_full d ON c.document_id = d.id
+        WHERE
+            c.embedding IS NOT NULL
+            AND (c.embedding <=> query_embedding) < 1 - match_threshold
+            AND (filter_type_document IS NULL OR d.type_document = filter_type_document)
+            AND (filter_categorie IS NULL OR d.categorie = filter_categorie)
+            AND (filter_commune IS NULL OR d.commune = filter_commune)
+            AND (filter_canton IS NULL OR d.canton = filter_canton)
+            AND (filter_tags IS NULL OR d.tags && filter_tags)
+            AND (min_date IS NULL OR d.date_document >= min_date)
+            AND (max_date IS NULL OR d.date_document <= max_date)
+        -- Tri sur la distance elle-même: seule forme servie par l'index HNSW
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT match_count
+    )
+    SELECT * FROM ranked r
+    ORDER BY r.similarity DESC;
+END;
+$$;
+
+COMMIT;
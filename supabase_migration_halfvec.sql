@@ -0,0 +1,58 @@
+-- =============================================================================
+-- Migration: Stocker les embeddings de la table documents en halfvec (float16)
+-- Prérequis: pgvector >= 0.7.0
+--
+-- Divise par deux la taille des vecteurs (6 Ko -> 3 Ko pour 1536 dimensions),
+-- sur disque, dans l'index et sur le réseau. Le classement par similarité
+-- cosinus est pratiquement inchangé.
+--
+-- Après migration, définir EMBEDDING_VECTOR_TYPE=halfvec dans le .env pour
+-- que main.py envoie directement des vecteurs float16.
+-- =============================================================================
+
+BEGIN;
+
+-- 1. Supprimer l'index vectoriel existant (lié au type vector)
+DROP INDEX IF EXISTS documents_embedding_idx;
+
+-- 2. Convertir la colonne
+ALTER TABLE documents
+    ALTER COLUMN embedding TYPE halfvec(1536)
+    USING embedding::halfvec(1536);
+
+-- 3. Recréer l'index sur la colonne halfvec
+CREATE INDEX IF NOT EXISTS documents_embedding_idx
+ON documents
+USING ivfflat (embedding halfvec_cosine_ops)
+WITH (lists = 100);
+
+-- 4. Fonction de recherche: la requête reste en VECTOR(1536), convertie en halfvec
+CREATE OR REPLACE FUNCTION match_documents (
+  query_embedding VECTOR(1536),
+  match_threshold FLOAT DEFAULT 0.7,
+  match_count INT DEFAULT 10
+)
+RETURNS TABLE (
+  id BIGINT,
+  content TEXT,
+  metadata JSONB,
+  similarity FLOAT,
+  created_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE SQL STABLE
+AS $$
+  SELECT
+    id,
+    content,
+    metadata,
+    1 - (embedding <=> query_embedding::halfvec(1536)) AS similarity,
+    created_at
+  FROM documents
+  -- Seuil exprimé en distance et tri sur la distance elle-même: seule forme
+  -- servie par l'index ivfflat (trier sur "similarity" force un scan complet)
+  WHERE (embedding <=> query_embedding::halfvec(1536)) < 1 - match_threshold
+  ORDER BY embedding <=> query_embedding::halfvec(1536)
+  LIMIT match_count;
+$$;
+
+COMMIT;
@@ -0,0 +1,46 @@
+-- =============================================================================
+-- Migration: Flux documents + mentions d'entités pour improvement_phase2.py
+-- Prérequis: tables documents_full, entity_mentions, entities
+--
+-- build_phase2_feed(after_id, page_size) renvoie une page de documents triés
+-- par id (pagination par clé: id > after_id), chacun avec ses mentions
+-- agrégées en JSONB. Seuls les documents de la page sont joints aux mentions:
+-- l'agrégation n'est plus recalculée sur toute la base à chaque page, comme
+-- avec une pagination par offset sur la version sans argument.
+-- =============================================================================
+
+BEGIN;
+
+DROP FUNCTION IF EXISTS public.build_phase2_feed();
+
+CREATE OR REPLACE FUNCTION public.build_phase2_feed(
+    after_id BIGINT DEFAULT 0,
+    page_size INT DEFAULT 1000
+)
+RETURNS TABLE (id BIGINT, file_name TEXT, metadata JSONB, mentions JSONB)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        d.id,
+        d.file_name,
+        d.metadata,
+        COALESCE(
+            (
+                SELECT jsonb_agg(
+                    jsonb_build_object(
+                        'entity_type', e.entity_type,
+                        'value', COALESCE(NULLIF(e.entity_value, ''), m.mention_text)
+                    )
+                )
+                FROM public.entity_mentions m
+                JOIN public.entities e ON e.id = m.entity_id
+                WHERE m.document_id = d.id
+            ),
+            '[]'::jsonb
+        ) AS mentions
+    FROM public.documents_full d
+    WHERE d.id > after_id
+    ORDER BY d.id
+    LIMIT page_size;
+$$;
+
+COMMIT;
@@ -290,6 +290,11 @@ RETURNS TABLE (
     importance_score numeric
 )
 LANGUAGE plpgsql
+STABLE
+-- Parcours itératif (pgvector >= 0.8): l'index continue tant que les filtres
+-- n'ont pas fourni match_count lignes
+SET hnsw.iterative_scan = relaxed_order
+SET hnsw.ef_search = 100
 AS $$
 BEGIN
     RETURN QUERY
@@ -320,7 +325,7 @@ BEGIN
     INNER JOIN public.documents_full d ON c.document_id = d.id
     WHERE
         c.embedding IS NOT NULL
-        AND (1 - (c.embedding <=> query_embedding)) > match_threshold
+        AND (c.embedding <=> query_embedding) < 1 - match_threshold
         AND (filter_type_document IS NULL OR d.type_document = filter_type_document)
         AND (filter_categorie IS NULL OR d.categorie = filter_categorie)
         AND (filter_commune IS NULL OR d.commune = filter_commune)
@@ -328,7 +333,8 @@ BEGIN
         AND (filter_tags IS NULL OR d.tags && filter_tags)
         AND (min_date IS NULL OR d.date_document >= min_date)
         AND (max_date IS NULL OR d.date_document <= max_date)
-    ORDER BY similarity DESC, c.importance_score DESC NULLS LAST
+    -- Tri sur la distance elle-même: seule forme servie par l'index HNSW
+    ORDER BY c.embedding <=> query_embedding
     LIMIT match_count;
 END;
 $$;
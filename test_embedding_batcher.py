@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests du batcher d'embeddings (src/embedding_batcher.py), sans appel OpenAI.
+
+Usage: python test_embedding_batcher.py  (ou pytest test_embedding_batcher.py)
+"""
+
+import asyncio
+
+from src.embedding_batcher import EmbeddingBatcher
+
+
+def fake_embed(texts):
+    """Embedding factice: [longueur, code du premier caractère]."""
+    return [[float(len(t)), float(ord(t[0]))] for t in texts]
+
+
+def test_results_aligned_across_callers():
+    """Chaque appelant reçoit ses embeddings dans l'ordre de ses textes."""
+    calls = []
+
+    def embed(texts):
+        calls.append(len(texts))
+        return fake_embed(texts)
+
+    async def run():
+        batcher = EmbeddingBatcher(embed, max_items=64, window=0.05)
+        requests = [["a", "ccc", "bb"], ["dddd"], ["e", "ffffff"]]
+        return requests, await asyncio.gather(*(batcher.embed(r) for r in requests))
+
+    requests, results = asyncio.run(run())
+    for texts, vectors in zip(requests, results):
+        assert vectors == fake_embed(texts)
+    # Les trois appelants partagent un seul appel d'embeddings
+    assert calls == [6]
+
+
+def test_blank_texts_get_empty_embedding():
+    """Les textes vides reçoivent [] et ne sont pas envoyés."""
+    sent = []
+
+    def embed(texts):
+        sent.extend(texts)
+        return fake_embed(texts)
+
+    async def run():
+        return await EmbeddingBatcher(embed).embed(["x", "", "   ", "yy"])
+
+    assert asyncio.run(run()) == [fake_embed(["x"])[0], [], [], fake_embed(["yy"])[0]]
+    assert sorted(sent) == ["x", "yy"]
+
+
+def test_failure_fans_out_to_the_whole_window():
+    """Une erreur d'embedding est propagée à tous les appelants du batch, et
+    le batcher reste utilisable ensuite."""
+    fail = [True]
+
+    def embed(texts):
+        if fail[0]:
+            fail[0] = False
+            raise ValueError("quota")
+        return fake_embed(texts)
+
+    async def run():
+        batcher = EmbeddingBatcher(embed, window=0.05)
+        first = await asyncio.gather(
+            batcher.embed(["a"]), batcher.embed(["b", "c"]), return_exceptions=True
+        )
+        return first, await batcher.embed(["d"])
+
+    first, after = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in first)
+    assert after == fake_embed(["d"])
+
+
+def test_length_mismatch_is_an_error():
+    """Un nombre d'embeddings différent du nombre de textes échoue."""
+    async def run():
+        return await EmbeddingBatcher(lambda texts: fake_embed(texts)[:-1]).embed(["a", "b"])
+
+    try:
+        asyncio.run(run())
+    except RuntimeError:
+        return
+    raise AssertionError("RuntimeError attendue")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test de démarrage du serveur FastMCP (mcp_server_fixed.py), sans OpenAI ni
+Supabase: import du module, endpoints utilitaires et poignée de main MCP.
+
+Usage: python test_mcp_server_fixed.py  (ou pytest test_mcp_server_fixed.py)
+"""
+
+import pytest
+
+pytest.importorskip("mcp")
+from starlette.testclient import TestClient
+
+import mcp_server_fixed
+
+# Hôte local: accepté par la protection DNS rebinding du transport MCP
+BASE_URL = "http://localhost:10000"
+
+INITIALIZE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-03-26",
+        "capabilities": {},
+        "clientInfo": {"name": "test", "version": "1.0"},
+    },
+}
+MCP_HEADERS = {"Accept": "application/json, text/event-stream"}
+
+
+def test_utility_endpoints_and_mcp_handshake():
+    # Le context manager exécute le lifespan (gestionnaire de sessions MCP)
+    with TestClient(mcp_server_fixed.app, base_url=BASE_URL) as client:
+        assert client.get("/health").json()["status"] == "healthy"
+        assert client.get("/").json()["status"] == "running"
+
+        for path in ("/mcp", "/"):
+            resp = client.post(path, json=INITIALIZE, headers=MCP_HEADERS)
+            assert resp.status_code == 200, (path, resp.status_code, resp.text)
+            assert "documents-search-server" in resp.text
+            assert resp.headers["access-control-allow-origin"] == "*"
+
+
+if __name__ == "__main__":
+    test_utility_endpoints_and_mcp_handshake()
+    print("✅ test_utility_endpoints_and_mcp_handshake")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests des distances de Hamming LSH (src/semantic_cache.py), sans OpenAI.
+
+Usage: python test_semantic_cache.py  (ou pytest test_semantic_cache.py)
+"""
+
+import numpy as np
+
+from src import semantic_cache
+
+
+def reference_distances(signatures, signature):
+    return np.array([bin(int(s) ^ int(signature)).count("1") for s in signatures])
+
+
+def test_popcount_branches_agree():
+    """np.bitwise_count et le repli unpackbits donnent les mêmes distances."""
+    rng = np.random.default_rng(0)
+    signatures = rng.integers(0, 2**64, size=1000, dtype=np.uint64)
+    signatures[:3] = [0, np.iinfo(np.uint64).max, 1 << 63]
+    signature = np.uint64(rng.integers(0, 2**64, dtype=np.uint64))
+    expected = reference_distances(signatures, signature)
+
+    saved = semantic_cache._bitwise_count
+    try:
+        results = {}
+        for name, impl in (("bitwise_count", saved), ("unpackbits", None)):
+            if name == "bitwise_count" and impl is None:
+                continue  # NumPy < 2.0: seul le repli existe
+            semantic_cache._bitwise_count = impl
+            results[name] = semantic_cache.hamming_distances(signatures, signature)
+    finally:
+        semantic_cache._bitwise_count = saved
+
+    assert "unpackbits" in results
+    for distances in results.values():
+        np.testing.assert_array_equal(distances.astype(np.int64), expected)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
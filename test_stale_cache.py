@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests du cache stale-while-revalidate (src/stale_cache.py), sans Supabase.
+
+Usage: python test_stale_cache.py  (ou pytest test_stale_cache.py)
+"""
+
+import threading
+import time
+
+from src.stale_cache import StaleWhileRevalidate
+
+
+class SlowCounter:
+    """Fonction factice: renvoie 1, 2, 3... et bloque tant que `gate` est fermé."""
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        value = self.calls
+        self.started.set()
+        self.gate.wait(5)
+        return value
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "délai dépassé"
+        time.sleep(0.005)
+
+
+def test_fresh_value_is_cached():
+    func = SlowCounter()
+    cache = StaleWhileRevalidate(func, ttl=60, max_stale=600)
+    assert cache() == 1
+    assert cache() == 1
+    assert func.calls == 1
+
+
+def test_stale_value_served_with_single_background_refresh():
+    """Périmée: la valeur est servie tout de suite, un seul rafraîchissement part."""
+    func = SlowCounter()
+    cache = StaleWhileRevalidate(func, ttl=0.01, max_stale=60)
+    assert cache() == 1
+    time.sleep(0.02)
+
+    func.gate.clear()
+    func.started.clear()
+    # Plusieurs appels pendant le rafraîchissement: tous servis périmés
+    assert [cache() for _ in range(5)] == [1] * 5
+    assert func.started.wait(5)
+    assert func.calls == 2
+
+    func.gate.set()
+    wait_until(lambda: not cache._refreshing)
+    assert cache() == 2
+
+
+def test_clear_discards_in_flight_refresh():
+    """Un rafraîchissement commencé avant clear() n'est pas conservé."""
+    func = SlowCounter()
+    cache = StaleWhileRevalidate(func, ttl=0.01, max_stale=60)
+    assert cache() == 1
+    time.sleep(0.02)
+
+    func.gate.clear()
+    func.started.clear()
+    assert cache() == 1
+    assert func.started.wait(5)
+    cache.clear()
+    func.gate.set()
+    wait_until(lambda: not cache._refreshing)
+
+    # Le résultat du rafraîchissement (2) est ignoré: nouveau calcul (3)
+    assert cache() == 3
+
+
+def test_too_stale_value_waits_for_refresh():
+    func = SlowCounter()
+    cache = StaleWhileRevalidate(func, ttl=0.01, max_stale=0.02)
+    assert cache() == 1
+    time.sleep(0.03)
+    assert cache() == 2
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")